@@ -19,12 +19,22 @@ import numpy as np
 import pyqtgraph as pg
 from subprocess import call 
 from streamTest_T7 import DAQ
-import time
-from threading import Thread, Timer
+from dataFiles import HourlyCsvWriter, FileListTracker
+from ioWriter import IOWriter
+from scheduler import Scheduler
+from plotBridge import PlotBridge
+from decimation import minMaxEnvelope
+from daqDaemon import openBackend, serve
+from sharedRing import SharedRingReader, ringName
+from channelConfig import channelPlan
+import multiprocessing
+from instrumentation import profiler
+from replay import ArchiveIndex, Replay, speeds
+from archiveRotation import ArchiveRotator
+from dataFiles import dataRoot
 from datetime import datetime, date
 import os
 import csv
-from pandas import DataFrame
 
 
 
@@ -60,72 +70,72 @@ class MainWindow(QWidget):
     This is where the list initializations are made, the first lists of "AIN_" are a list of analog inputs connected to a type of sensor.
     for example "AINT" is a list of analog input connected to the temperature sensor, where "T" stands for temperature.
 
-    based on the number of elements within the AIN lists, a empty list will be appened to the dictionaries below, where each empty list corresponds to a 
-    individual sensor, and all data from that sensor is recorded in that list. 
+    based on the number of elements within the AIN lists, the DAQ's channel pipeline (see channelPipeline.py) gives each individual sensor
+    a place its data is recorded. the continuous data (Data) are ring buffers that hold a fixed amount of time, while the file lists are normal
+    lists since they are cleared every hour. each sensor gets a mean column plus min, max and std columns in the file lists.
     
-    For example: lets say 'AIN0' is connected to a MagCheck, after writing down AIN0 as a element of the list "AINM" a empty list will be appened to 
-    the dictionaries DataM, fileListM, lisM, and fieldnameM (functions of each list is explained further in this code and the "streamTest_T7 code"). 
-    This gives us a storage place for each sensors data, and combines sensors of the same type in a bundle or "dataframe".
+    For example: lets say 'AIN0' is connected to a MagCheck, after writing down AIN0 as a element of the list "AINM" the pipeline's
+    Data['Mag'] and filelist['Mag'] get an entry for it when the run starts. This gives us a storage place for each sensors data,
+    and combines sensors of the same type in a bundle or "dataframe".
 
-    these are then passed into the functions from streamTest later on in the code in the updatePlot functions
+    these are then handed to the graph and the files in updatePlots
     """
     AINT = ['AIN0','AIN4']
     AINP = ['AIN3']
     AINM = ['AIN2']
 
+    # serial numbers or IP addresses of the T7s to read, when there is more than one the inputs above are named after
+    # their device, like 'T7#470012345:AIN0' (see devicePool.py). left empty the first T7 found is used
+    devices = []
 
-# initializes each 2-D list
-    DataM = {}
-    filelistM = {}
-    listM = {}
+    # ChannelConfigs for inputs that shouldn't get the range and resolution of their sensor type, see channelConfig.py
+    channelConfigs = {}
 
-    
-        
-    # appends a new list to the 2D list for every sensor used in the magnetic field testing
-    for sensor in AINM:
-        DataM.update({sensor:[]})
-        filelistM.update({sensor:[]})
-        listM.update({sensor:[]})
+    # every input is read in one batched call each tick. pressure is processed every tick, temperature and
+    # magnetics are processed every "slowTicks" ticks (so about once a second)
+    tickPeriod = 1/3
+    slowTicks = 3
+
+    # how often each sensor type gets a new sample, used to size the ring buffers
+    pressPeriod = tickPeriod
+    tempPeriod = tickPeriod*slowTicks
+    magPeriod = tickPeriod*slowTicks
+
+    # when set (run with --stream <scans per second>) the T7 samples every input on its own clock at this rate and a
+    # block of scans is processed at a time instead of reading every input once a tick, see DAQ.startStream
+    scanRate = None
+
+    # when True every sample (not just the minute averages) is also kept in the hourly raw .npy archive
+    rawArchive = True
+
+    # when True the hourly and spike files are compressed once they are closed, see archiveRotation.py
+    compressArchive = True
+
+    # how many times a second the graph is redrawn, no matter how fast the sensors are read
+    plotFps = 20
+
+    # when True (run with --simulate) the sensors are read from a simulated T7 instead of a real one, see simulatedT7.py
+    simulate = False
+
+    # when True (run with --separate) the acquisition runs in its own process and the graph is drawn from shared
+    # memory (see sharedRing.py), so redrawing never holds up a read. "attachTo" (run with --attach <name>) views a
+    # daqDaemon started with --share <name> instead of starting one
+    separateProcess = False
+    attachTo = None
+    sharePrefix = 'labjackDAQ'
+    readers = {}
 
+    # the replay of archived files being shown instead of live data, see replay.py
+    replay = None
 
-    # initializes each 2-D list
-    # RECREATE ALL LISTS INTO ONE "NUMSENSOR" LIST AND THEN USE .COPY INSIDE 
-    DataT = {}
-    filelistT = {}
-    fileBufferListT = {}
-    derAvg = {}
-    derBufferList = {}
-    spikeDataT = {}
+    # combobox index -> how many seconds the view shows, for the views drawn from the tiered history
+    historyViews = {4: 60*60, 5: 60*60*24, 6: 60*60*24*7}
 
 
     #resistence values of wire corresponding connected to its respected input
     ResValues = {AINT[0]:1.080, AINT[1]:1.099}
-        
-    # appends a new list to the 2D list for every sensor used in the temperature testing
-    for sensor in AINT:
-        DataT.update({sensor:[]})
-        filelistT.update({sensor:[]})
-        fileBufferListT.update({sensor:[]})
-        derBufferList.update({sensor:[]})
-        derAvg.update({sensor:[]})
-        spikeDataT.update({sensor:[]})
-
-
-    # initializes each 2-D list
-    DataP = {}
-    filelistP = {}
-    listP = {}
-    spikeDataP = {}
-
-
-    # appends a new list to the 2D list for every sensor used in the pressure testing
-    for sensor in AINP:
-        DataP.update({sensor:[]})
-        filelistP.update({sensor:[]})
-        listP.update({sensor:[]})
-        spikeDataP.update({sensor:[]})
-  
-    
+
+
     #function to handle initialization - mainly calls a subfunction to create the user interface
     def __init__(self):
         super().__init__()
@@ -244,6 +254,9 @@ class MainWindow(QWidget):
         self.comboBox1.addItem('90 seconds')
         self.comboBox1.addItem('5 minutes')
         self.comboBox1.addItem('10 minutes')
+        self.comboBox1.addItem('1 hour')
+        self.comboBox1.addItem('1 day')
+        self.comboBox1.addItem('1 week')
         self.comboBox1.setToolTip("these are the timeframes on which you can view\n all the data")
         self.comboBox1.setFont(buttonFont)
         self.comboBox1.currentIndexChanged.connect(self.uiCombobox1Changed)
@@ -291,6 +304,83 @@ class MainWindow(QWidget):
         mainGrid.addWidget(self.startRunButton, r, 0, 1, 3)
         r += 2
         mainGrid.addWidget(self.stopRunButton, r, 0, 1, 3)
+        r += 1
+
+
+        ##############################################################
+        # HOT PATH STATS
+        ##############################################################
+
+        # the time each stage of a tick takes (see instrumentation.py), only timed while "Profile" is ticked
+        self.profileBox = QCheckBox('Profile')
+        self.profileBox.setFont(buttonFont)
+        self.profileBox.toggled.connect(self.uiProfileChanged)
+        mainGrid.addWidget(self.profileBox, r, 0, 1, 1)
+
+        self.exportStatsButton = QPushButton('Export stats')
+        self.exportStatsButton.setFont(buttonFont)
+        self.exportStatsButton.clicked.connect(self.exportStats)
+        mainGrid.addWidget(self.exportStatsButton, r, 1, 1, 2)
+        r += 1
+
+        self.statsLabel = QLabel(profiler.report())
+        self.statsLabel.setFont(QFont('Monospace', 8))
+        self.statsLabel.setStyleSheet('font-family: monospace')
+        mainGrid.addWidget(self.statsLabel, r, 0, 1, 3)
+        r += 1
+
+        # the panel is refreshed once a second on the GUI thread, reading the histograms is cheap next to that
+        self.statsTimer = QTimer(self)
+        self.statsTimer.timeout.connect(self.updateStats)
+        self.statsTimer.start(1000)
+
+        ##############################################################
+        # REPLAY
+        ##############################################################
+
+        # plays the hourly and spike files of a range of days back through the graph (see replay.py)
+        replayLabel = QLabel('Replay from / to (YYYY-MM-DD):')
+        replayLabel.setFont(buttonFont)
+        mainGrid.addWidget(replayLabel, r, 0, 1, 3)
+        r += 1
+
+        today = date.today().isoformat()
+        self.replayFrom = QLineEdit(today)
+        self.replayFrom.setFont(buttonFont)
+        mainGrid.addWidget(self.replayFrom, r, 0, 1, 1)
+        self.replayTo = QLineEdit(today)
+        self.replayTo.setFont(buttonFont)
+        mainGrid.addWidget(self.replayTo, r, 1, 1, 1)
+        self.replayButton = QPushButton('Replay')
+        self.replayButton.setFont(buttonFont)
+        self.replayButton.clicked.connect(self.startReplay)
+        mainGrid.addWidget(self.replayButton, r, 2, 1, 1)
+        r += 1
+
+        self.replaySpeed = QSpinBox()
+        self.replaySpeed.setRange(*speeds)
+        self.replaySpeed.setValue(60)
+        self.replaySpeed.setSuffix('x')
+        self.replaySpeed.setFont(buttonFont)
+        self.replaySpeed.setToolTip("How many times faster than real time the files are played back")
+        self.replaySpeed.valueChanged.connect(self.uiReplaySpeedChanged)
+        mainGrid.addWidget(self.replaySpeed, r, 0, 1, 1)
+        self.replayPauseButton = QPushButton('Pause')
+        self.replayPauseButton.setFont(buttonFont)
+        self.replayPauseButton.clicked.connect(self.uiReplayPause)
+        mainGrid.addWidget(self.replayPauseButton, r, 1, 1, 1)
+        self.replaySpikeButton = QPushButton('Next spike')
+        self.replaySpikeButton.setFont(buttonFont)
+        self.replaySpikeButton.clicked.connect(self.uiReplayNextSpike)
+        mainGrid.addWidget(self.replaySpikeButton, r, 2, 1, 1)
+        r += 1
+
+        # seeks anywhere in the range, in thousandths of it
+        self.replaySlider = QSlider(Qt.Orientation.Horizontal)
+        self.replaySlider.setRange(0, 1000)
+        self.replaySlider.sliderReleased.connect(self.uiReplaySeek)
+        mainGrid.addWidget(self.replaySlider, r, 0, 1, 3)
+        r += 1
 
 
         ##############################################################
@@ -304,7 +394,8 @@ class MainWindow(QWidget):
         self.lineProfile1.setLabel('bottom', 'Time', units = 'seconds')
         self.lineProfile1.setXRange(0, 120, padding=0.01)
         self.lineProfile1.setYRange(0, 50, padding=0.01)
-        self.lineProfile1.setLimits(xMin=0, minXRange=0,yMin=-1000,minYRange=0,yMax=119,maxYRange=119)
+        # times before 0 are from before midnight (or the start of the run), which the longer views go back to
+        self.lineProfile1.setLimits(minXRange=0,yMin=-1000,minYRange=0,yMax=119,maxYRange=119)
         self.lineProfile1.setBackground('w')
         
         
@@ -321,6 +412,10 @@ class MainWindow(QWidget):
 
 
         mainGrid.addWidget(self.lineProfile1, 2, 11, r-1, 1)
+
+        # the acquisition thread publishes new data here and the graph is redrawn from it on the GUI thread. the times
+        # from the DAQ are in nanoseconds and are plotted in seconds
+        self.bridge = PlotBridge(self.plotFps, self, xScale=1e9)
         #mainGrid.addWidget(self.lineProfile2, 1+int(r/2), 11, int(r/2), 1)
 
         #set the layout into the widget
@@ -340,14 +435,20 @@ class MainWindow(QWidget):
 
         colors = ['r', 'b', 'g' , 'y']
 
+        # the legend has to exist before the lines are made for them to show up in it
+        self.lineProfile1.addLegend()
+
         for i in range(len(self.AINM)):
-            self.linesM["line %s" %self.AINM[i]] = self.lineProfile1.plot(self.plotX, self.plotRight, pen=pg.mkPen(colors[i], width=1), name=self.AINM[i])
+            self.linesM["line %s" %self.AINM[i]] = self.lineProfile1.plot(self.plotX, self.plotRight, pen=pg.mkPen(colors[i % len(colors)], width=1), name=self.AINM[i])
 
         for i in range(len(self.AINT)):
-            self.linesT["line %s" %self.AINT[i]] = self.lineProfile1.plot(self.plotX, self.plotRight, pen=pg.mkPen(colors[i], width=1), name=self.AINT[i])
+            self.linesT["line %s" %self.AINT[i]] = self.lineProfile1.plot(self.plotX, self.plotRight, pen=pg.mkPen(colors[i % len(colors)], width=1), name=self.AINT[i])
         
         for i in range(len(self.AINP)):
-            self.linesP["line %s" %self.AINP[i]] = self.lineProfile1.plot(self.plotX, self.plotRight, pen=pg.mkPen(colors[i], width=1), name=self.AINP[i])
+            self.linesP["line %s" %self.AINP[i]] = self.lineProfile1.plot(self.plotX, self.plotRight, pen=pg.mkPen(colors[i % len(colors)], width=1), name=self.AINP[i])
+
+        # the radio button, lines and inputs of each sensor type, for updatePlots
+        self.plots = {'Mag': (self.radio1, self.linesM, self.AINM), 'Temp': (self.radio2, self.linesT, self.AINT), 'Pressure': (self.radio3, self.linesP, self.AINP)}
 
 
         
@@ -365,58 +466,285 @@ class MainWindow(QWidget):
         if self.e == True:
             print('Test has already begun!')
             return
+
+        if self.separateProcess or self.attachTo:
+            self.startViewer()
+            return
         
 
         self.numLines()
 
-        self.test = DAQ()
+        # everything that goes to disk is written on this thread so a slow disk never holds up the sampling
+        self.writer = IOWriter()
+        for type in ('Mag', 'Temp', 'Pressure'):
+            self.writer.addSink(type, HourlyCsvWriter(type))
+        self.writer.start()
+
+        # compresses the files of hours that are over on its own low priority thread
+        self.rotator = ArchiveRotator() if self.compressArchive else None
+        if self.rotator is not None:
+            self.rotator.start()
+
+        # a DevicePool has to be closed at the end of the run to give the devices back
+        backend = openBackend(self.AINT, self.AINP, self.AINM, self.devices, self.simulate)
+        self.pool = backend if self.devices else None
+        # a stream samples every input on every scan
+        periods = (1/self.scanRate,)*3 if self.scanRate else (self.tempPeriod, self.pressPeriod, self.magPeriod)
+        self.test = DAQ(*periods, writer=self.writer, backend=backend)
+        self.test.configureChannels(channelPlan(self.AINT, self.AINP, self.AINM, self.channelConfigs))
+
+        if self.rawArchive:
+            self.test.startArchive('Mag', self.AINM)
+            self.test.startArchive('Temp', self.AINT)
+            self.test.startArchive('Pressure', self.AINP)
+
+        self.test.startPipeline({'Mag': self.AINM, 'Temp': self.AINT, 'Pressure': self.AINP}, {'Temp': self.ResValues})
+        if self.scanRate:
+            self.test.startStream(scanRate=self.scanRate)
+
+        # keeps track of which rows of the file lists have already been sent to the writer
+        self.trackers = {type: FileListTracker() for type in ('Mag', 'Temp', 'Pressure')}
         self.e = True
-
-        
-        # starts the magnetic data graphing function that repeats periodically
-        self.MagTimer = Timer(0.95,self.updatePlot1)
-        self.MagTimer.start()
-
-
-        # starts the temp data graphing function that repeats periodically
-        self.TempTimer = Timer(0.95,self.updatePlot2)
-        self.TempTimer.start()
+        self.tick = 0
         self.now = datetime.now()
 
-       # starts the pressure data graphing function that repeats periodically
-        self.PressTimer = Timer((1/3),self.updatePlot3)
-        self.PressTimer.start()
+        # runs the function that reads every sensor and hands the voltages to each graphing function every tick,
+        # on fixed deadlines so the time a tick takes doesn't delay the next one
+        # in stream mode streamStep waits for its block, so the task runs once per block
+        self.scheduler = Scheduler()
+        period = self.test.scansPerRead/self.test.scanRate if self.scanRate else self.tickPeriod
+        self.scheduler.addTask('read', period, self.updatePlots)
+        self.scheduler.start()
+        self.bridge.start()
 
         print('Stream has started')
         x = 0
 
+    def startViewer(self):
+        """
+        starts the acquisition in its own process (or attaches to a daqDaemon that is already running) and draws the
+        graph from the shared memory rings it publishes to, at the frame rate, on the GUI thread. the files are written
+        by the acquisition process.
+        """
+        self.acquisition = None
+        prefix = self.attachTo
+        if prefix is None:
+            prefix = '%s_%s' %(self.sharePrefix, os.getpid())
+            self.stopping = multiprocessing.Event()
+            settings = dict(AINT=self.AINT, AINP=self.AINP, AINM=self.AINM, ResValues=self.ResValues, tickPeriod=self.tickPeriod,
+                            slowTicks=self.slowTicks, rawArchive=self.rawArchive, devices=self.devices, simulate=self.simulate,
+                            channels=self.channelConfigs, compress=self.compressArchive, scanRate=self.scanRate)
+            self.acquisition = multiprocessing.Process(target=serve, args=(prefix, self.stopping), kwargs=settings, name='Acquisition', daemon=True)
+            self.acquisition.start()
+
+        # the ring of each sensor type, the inputs on the graph are the ones the acquisition has
+        self.readers = {}
+        for type in ('Mag', 'Temp', 'Pressure'):
+            try:
+                self.readers[type] = SharedRingReader(ringName(prefix, type), timeout=10 if self.acquisition is not None else 1)
+            except (FileNotFoundError, ValueError):
+                continue
+        if not self.readers:
+            print('Nothing is being published under %s' %prefix)
+            self.stopViewer()
+            return
+
+        self.AINM = self.readers['Mag'].columns if 'Mag' in self.readers else []
+        self.AINT = self.readers['Temp'].columns if 'Temp' in self.readers else []
+        self.AINP = self.readers['Pressure'].columns if 'Pressure' in self.readers else []
+        self.numLines()
+
+        self.test = None
+        self.e = True
+        self.viewerTimer = QTimer(self)
+        self.viewerTimer.timeout.connect(self.drawShared)
+        self.viewerTimer.start(max(1, int(1000/self.plotFps)))
+        print('Viewing %s' %prefix)
+
+    def drawShared(self):
+        """
+        draws every sensor type that has new rows in its ring, straight from the shared memory
+        """
+        for type, radio, lines in (('Mag', self.radio1, self.linesM), ('Temp', self.radio2, self.linesT), ('Pressure', self.radio3, self.linesP)):
+            reader = self.readers.get(type)
+            if reader is None:
+                continue
+            if reader.refresh() or not radio.isChecked():
+                self.drawLines(type, radio, lines, reader.columns, reader.timeData, reader.Data)
+
+            # the acquisition went round the ring while this frame was being drawn, the next refresh draws it again
+            if not reader.valid():
+                reader.retry()
+
+        if all(reader.closed() for reader in self.readers.values()):
+            print('The acquisition has stopped')
+            self.stopRun()
+
+    def stopViewer(self):
+        """
+        stops drawing from shared memory, and the acquisition process if this window started it
+        """
+        self.e = False
+        if getattr(self, 'viewerTimer', None) is not None:
+            self.viewerTimer.stop()
+            self.viewerTimer = None
+
+        if self.acquisition is not None:
+            # the acquisition writes out everything queued before it exits
+            self.stopping.set()
+            self.acquisition.join(30)
+            self.acquisition = None
+
+        for type, reader in self.readers.items():
+            if reader.lost:
+                print('%s: %s rows went by before they could be drawn' %(type, reader.lost))
+            reader.close()
+        self.readers = {}
+
+        for lines in (self.linesM, self.linesT, self.linesP):
+            for line in lines.values():
+                line.clear()
+                self.bridge.forget(line)
+
+    def startReplay(self):
+        """
+        plays the archived files of the days in the replay boxes back through the graph instead of live data. the files
+        are only parsed as the replay gets to them, the buffers are filled with the week before the start straight away
+        """
+        if self.e == True:
+            print('Stop the test before replaying files')
+            return
+
+        try:
+            first = date.fromisoformat(self.replayFrom.text().strip())
+            last = date.fromisoformat(self.replayTo.text().strip())
+            index = ArchiveIndex(dataRoot, first, last)
+        except ValueError as error:
+            print('Can not replay that range: %s' %error)
+            return
+        if not len(index):
+            print('There are no files from %s to %s' %(first, last))
+            return
+
+        self.replay = Replay(index, self.replaySpeed.value())
+        self.AINM = self.replay.AIN['Mag']
+        self.AINT = self.replay.AIN['Temp']
+        self.AINP = self.replay.AIN['Pressure']
+        self.numLines()
+
+        # minute averages are too far apart for the 90 second to 10 minute views
+        self.comboBox1.setCurrentIndex(4)
+
+        self.test = None
+        self.e = True
+        self.replay.seek(index.start)
+        self.replay.play()
+        self.replayPauseButton.setText('Pause')
+        self.replayTimer = QTimer(self)
+        self.replayTimer.timeout.connect(self.drawReplay)
+        self.replayTimer.start(max(1, int(1000/self.plotFps)))
+        print('Replaying %s files from %s to %s' %(len(index), first, last))
+
+    def drawReplay(self, force: bool = False):
+        """
+        moves the replay on and draws the sensor types that got new rows
+        """
+        changed = self.replay.advance()
+        for type, radio, lines in (('Mag', self.radio1, self.linesM), ('Temp', self.radio2, self.linesT), ('Pressure', self.radio3, self.linesP)):
+            if force or type in changed or not radio.isChecked():
+                self.drawLines(type, radio, lines, self.replay.AIN[type], self.replay.timeData[type], self.replay.Data[type])
+
+        if not self.replaySlider.isSliderDown():
+            self.replaySlider.setValue(int(1000*self.replay.fraction()))
+        if self.replay.finished():
+            self.replayPauseButton.setText('Play')
+
+    def uiReplaySpeedChanged(self, speed: int):
+        if self.replay is not None:
+            self.replay.setSpeed(speed)
+
+    def uiReplayPause(self):
+        if self.replay is None:
+            return
+        if self.replay.playing:
+            self.replay.pause()
+            self.replayPauseButton.setText('Play')
+        else:
+            # playing again from the end starts over
+            if self.replay.finished():
+                self.replay.seek(self.replay.index.start)
+            self.replay.play()
+            self.replayPauseButton.setText('Pause')
+
+    def uiReplaySeek(self):
+        if self.replay is not None:
+            self.replay.seekFraction(self.replaySlider.value()/1000)
+            self.drawReplay(force=True)
+
+    def uiReplayNextSpike(self):
+        if self.replay is None:
+            return
+        spike = self.replay.nextSpike()
+        if spike is None:
+            print('No more spikes in the replay')
+            return
+        # a little after the spike, so the samples around it are on the graph
+        self.replay.seek(spike + 2*60*10**9)
+        self.drawReplay(force=True)
+
+    def stopReplay(self):
+        self.e = False
+        if getattr(self, 'replayTimer', None) is not None:
+            self.replayTimer.stop()
+            self.replayTimer = None
+        print('Replay parsed %s files' %self.replay.index.parsed)
+        self.replay = None
+
+        # back to the inputs a live test reads
+        self.AINM, self.AINT, self.AINP = MainWindow.AINM, MainWindow.AINT, MainWindow.AINP
+
+        for lines in (self.linesM, self.linesT, self.linesP):
+            for line in lines.values():
+                line.clear()
+                self.bridge.forget(line)
+
     def stopRun(self):
         """
         This function stops the graphing and logging data function by setting the parameter "e" equal to false, meaning the timers
         will no longer reset at the end of each funciton. it also resets the stored Data in each sensor in case the user presses start again.
         """
-        if self.e ==True:
+        if self.e == True and self.replay is not None:
+            self.stopReplay()
+
+        elif self.e == True and self.readers:
+            self.stopViewer()
+
+        elif self.e ==True:
             self.e = False
+
+            # waits for a tick that is part way through to finish before anything is torn down
+            self.scheduler.stop()
+            self.bridge.stop()
+            print('Scheduler: %s' %self.scheduler.stats())
+
             self.test.stopRun()
+            for lines in (self.linesM, self.linesT, self.linesP):
+                for line in lines.values():
+                    line.clear()
 
-            self.MagTimer.cancel()
-            for sensor in self.AINM:
-                self.linesM['line %s' %sensor].clear()
-                self.DataM[sensor].clear()
-                #self.filelistM[sensor].clear()
-            
+            # writes out whatever is still queued and closes the files
+            self.writer.close()
+            print('File writer: %s' %self.writer.stats())
 
-            self.TempTimer.cancel()
-            for sensor in self.AINT:
-                self.linesT['line %s' %sensor].clear()
-                self.DataT[sensor].clear()
-                #self.filelistT[sensor].clear()
+            if self.rotator is not None:
+                self.rotator.stop()
+                print('Archive rotation: %s' %self.rotator.stats())
+                self.rotator = None
 
-            self.PressTimer.cancel()
-            for sensor in self.AINP:
-                self.linesP['line %s' %sensor].clear()
-                self.DataP[sensor].clear()
-                #self.filelistP[sensor].clear()
+            if self.pool is not None:
+                print('Device pool: largest skew between devices %.3f ms' %(self.pool.maxSkew/1e6))
+                self.pool.close()
+                self.pool = None
 
 
 
@@ -425,212 +753,118 @@ class MainWindow(QWidget):
 
 
     """
-    Each update plot function is almost identical in how it is run, on intervals given in the startrun function, it will grab data from its respective
-    function from the DAQ module, assigning it to 2D-Lists that account for each sensor and data in each sensor.
+    on intervals given in the startrun function, updatePlots has the DAQ read every sensor in one go and run the readings through its
+    channel pipeline, which converts them and keeps the Data and file lists of every sensor type (see channelPipeline.py).
 
     Then using the line-dictionary created by the numLines function, we assign each sensors data to a line of a specific color and name whihc then get plotted to the graph. However
-    if the correct radio button isnt pressed then the lines will not appear on the graph.
+    if the correct radio button isnt pressed then the lines will not appear on the graph. since updatePlots runs on the scheduler thread it doesn't draw anything itself,
+    it hands the data to the plot bridge and drawLines does the drawing on the GUI thread at the next frame.
 
     we then use the fileWriter function to write the data from the file list to a file. the fileList is also 2 dimentional, so we can properly seperate each sensors data and plot it.
-
-    Lastly, the function is set to loop if the parameter "e" is set to true.
     """
 
 
-    def updatePlot1(self):
-        # the time now is used display the time on the file list
-        now = datetime.now()
-
+    def updatePlots(self):
         """
-        DataM - the collection of magnetic field data taken each second from each sensor (2D)
-        xData - the collection of time when each piece of data was taken in seconds (1D)
-        filelistx - the collection of time when each piece of data was taken in minutes (1D)
-        filelistM - the colleciton of a average of Data over that minute appended to a list (2D)
+        reads every analog input with one call to the labjack and processes pressure every tick, and magnetics and temperature every
+        "slowTicks" ticks. each sensor type that got new data is queued to be graphed and its new minute rows written to file.
+        since this is the only thread using the device the three sensor types no longer fight over the same handle.
+        in stream mode it processes the next block of scans instead.
+
+        xData - the collection of time when each piece of data was taken, in nanoseconds on the DAQ's clock (1D)
+        Data - the collection of data taken from each sensor (2D)
+        filelist - the colleciton of a average of Data over each minute, with the time of each minute in 'Time' (2D)
         """
-        xData, self.DataM, fileListx, self.filelistM = self.test.MData(
-
-        self.AINM,
-        self.DataM,
-        self.filelistM,
-        self.listM,
-    )
+        if self.e == False:
+            return
 
-        self.filelistM.update({'Time':fileListx})
+        self.tick += 1
+        if self.scanRate:
+            processed = self.test.streamStep()[0]
+        else:
+            processed = self.test.step(self.tick)
+        pipeline = self.test.pipeline
 
-        # this is the part that actually graphs the line using xData and DataM
-        if self.radio1.isChecked() == True:
-            #makes sure relevant data is visible
-            if len(xData)>=1:
-                self.imageUpdate1(xData)
+        # the wall clock time of this tick picks the file the rows go in, so it always matches the file lists
+        now = self.test.stop
 
-            # sets data to their lines
-            for sensor in self.AINM:
-                self.lineProfile1.addLegend()
-                self.linesM['line %s' %sensor].setData(xData,self.DataM[sensor])
-                
+        for type in processed:
+            radio, lines, AIN = self.plots[type]
 
-        else:
-            for sensor in self.AINM:
-                self.linesM['line %s' %sensor].clear()
-                
-        # writes data to file
-        self.fileWriter(
-            self.filelistM,
-            'Mag',
-            now
-        )
- 
-        #restarts the function if "e" is true
-        if self.e == True:
-            self.MagTimer = Timer(0.95,self.updatePlot1)
-            self.MagTimer.start()
+            # queues the lines to be graphed, the newest data replaces anything not drawn yet
+            self.bridge.call(type, self.drawLines, type, radio, lines, AIN, pipeline.timeData[type], pipeline.Data[type])
 
+            # writes data to file, only a type that got a minute row this tick (or has rows the writer couldn't take
+            # last time) has anything new
+            if type in pipeline.stored or self.trackers[type].pending:
+                self.fileWriter(pipeline.filelist[type], type, now)
 
-    def updatePlot2(self):
-        # the time now is used display the time on the file list
-        
-        now = datetime.now()
 
+    def drawLines(self, type: str, radio, lines: dict, AIN: list, xData, Data: dict):
         """
-        DataT - the collection of temperature data taken each second from each sensor (2D)
-        xData - the collection of time when each piece of data was taken in seconds (1D)
-        filelistx - the collection of time when each piece of data was taken in minutes (1D)
-        filelistM - the colleciton of a average of Data over that minute appended to a list (2D)
-        """
-        
-        xData, self.DataT, fileListx, self.filelistT = self.test.TData(
-
-        self.AINT,
-        self.DataT,
-        self.ResValues,
-        self.spikeDataT,
-        self.derAvg,
-        self.filelistT,
-        self.fileBufferListT,
-        )
+        graphs one sensor type, this runs on the GUI thread through the plot bridge.
 
-        self.filelistT.update({'Time':fileListx})
-       
-        ############################    
-        # MAPPING TO PLOT
-        ############################
+        if the radio button of the sensor type is pressed the graph is moved to show the newest data and each sensors line
+        is set to its data, otherwise its lines are cleared off the graph.
 
-
-        # this is the part that actually graphs the line using xData and DataT
-        if self.radio2.isChecked() == True:
+        the lines only get the min and max of the samples in each pixel column of the visible range, so the 5 and 10
+        minute windows don't send any more points to the graph than the 90 second one.
+        """
+        if radio.isChecked() == True:
             #makes sure relevant data is visible
             if len(xData)>=1:
-                self.imageUpdate1(xData)
-
-            # sets data to their lines
-            for sensor in self.AINT:
-                self.lineProfile1.addLegend()
-                self.linesT['line %s' %sensor].setData(xData,self.DataT[sensor])
+                self.imageUpdate1(xData[-1]/1e9)
+
+            timer = profiler.start()
+            viewBox = self.lineProfile1.getPlotItem().getViewBox()
+            xMin, xMax = viewBox.viewRange()[0]
+            viewport = (xMin, xMax, max(1, int(viewBox.width())))
+
+            # sets data to their lines, the hour, day and week views come from the tiered history instead (a replay
+            # keeps a week in its buffers, so they are drawn from those)
+            span = self.historyViews.get(self.comboBox1.currentIndex())
+            for sensor in AIN:
+                if span is None or self.replay is not None:
+                    self.bridge.setCurve(lines['line %s' %sensor], xData, Data[sensor], viewport)
+                else:
+                    lines['line %s' %sensor].setData(*self.historyCurve(type, sensor, span, viewport))
+            profiler.stop('plot', timer, len(AIN))
 
         else:
-            for sensor in self.AINT:
-                self.linesT['line %s' %sensor].clear()
-                
-        # writes data to file
-        self.fileWriter(
-            self.filelistT,
-            'Temp',
-            now
-        )
-
-        #restarts the function if "e" is true
-        if self.e == True:
-            self.TempTimer = Timer(0.95,self.updatePlot2)
-            self.TempTimer.start()
+            for sensor in AIN:
+                lines['line %s' %sensor].clear()
+                self.bridge.forget(lines['line %s' %sensor])
 
 
-        
-
-
-    def updatePlot3(self): 
-        # the time now is used display the time on the file list
-        now = datetime.now()
-
+    def historyCurve(self, type: str, sensor: str, span: float, viewport: tuple):
         """
-        DataP - the collection of Pressure data taken each second from each sensor (2D)
-        xData - the collection of time when each piece of data was taken in seconds (1D)
-        filelistx - the collection of time when each piece of data was taken in minutes (1D)
-        filelistM - the colleciton of a average of Data over that minute appended to a list (2D)
+        returns the x and y to graph "span" seconds of a sensor's tiered history (see tieredHistory.py), using the tier
+        with about one bucket per pixel. the x values are seconds on the same clock as the live data, so anything
+        from before midnight is negative.
         """
+        # the history is kept by the acquisition, it can't be seen from another process
+        history = self.test.history.get(type, {}).get(sensor) if self.test is not None else None
+        if history is None:
+            return np.zeros(0), np.zeros(0)
 
-        xData, self.DataP, fileListx, self.filelistP = self.test.PData(
-
-        self.AINP,
-        self.DataP,
-        self.filelistP,
-        self.listP,
-        self.spikeDataP
-        )
-
-        self.filelistP.update({'Time':fileListx})
-        
-        #print(len(xData),len(self.DataP[0]))
-        
-        # this is the part that actually graphs the line using xData and DataP
-        if self.radio3.isChecked() == True:
-            #makes sure relevant data is visible
-            if len(xData)>=1:
-                self.imageUpdate1(xData)
-
-            # sets data to their lines
-            for sensor in self.AINP:
-                self.lineProfile1.addLegend()
-                self.linesP['line %s' %sensor].setData(xData,self.DataP[sensor])
-                
-        else:
-            for sensor in self.AINP:
-                self.linesP['line %s' %sensor].clear()
-                
-        # writes data to file
-        self.fileWriter(
-            self.filelistP,
-            'Pressure',
-            now
-        )
-
-        #restarts the function if "e" is true
-        if self.e == True:
-            self.PressTimer = Timer((1/3),self.updatePlot3)
-            self.PressTimer.start()
-
+        xMin, xMax, columns = viewport
+        times, means, lows, highs = history.select(span, columns).snapshot()
+        x = (times - self.test.clock.epochNs(0))/1e9
+        return minMaxEnvelope(x, lows, highs, xMin, xMax, columns)
 
-    def fileWriter(self,fileList: dict, type: str, now: time):
+    def fileWriter(self,fileList: dict, type: str, now: datetime):
         """
         This function writes the values of the file lists to a csv file accordong to which sensor.
         
-        first it sets the value of row to be a dictionary splitting up the values within the fileListY,
-        so each sensors data of fileListY can be with its respective "name". it then creates a folder 
-        based on what day it is and a file based on the hour.
-
-        it then writes a csv file where the data of each sensor is listed in columns
+        only the rows that were added since the last call are copied out of the file lists (normally none, or one at the
+        start of a minute) and queued for the writer thread, where the HourlyCsvWriter of that sensor type appends them to
+        the file for the current hour (see dataFiles.py). a new folder is made every day and a new file every hour.
+        if the writer's queue is full the rows are kept and offered again on the next tick.
         
         """            
-        
-        # creates a dictionary that has each row of data of the test; this will be looped over
-        row = fileList.copy()
-
-        # Sets the dictionary "row" as a pandas dataframe to easily log data to files
-        df = DataFrame(row)
-
-        #Sets the path
-        mypath = 'C:\\Users\\Bentim\\Documents\\TEM Data\\%s Data\\%s' %(type, now.strftime('%b %d, %Y'))
-
-        # if the folder doesnt exsist, make it
-        if not os.path.exists(mypath):
-            os.makedirs(mypath)
-        
-        
-        #writes to file
-        with open(mypath + '\\%s at %s.csv'%(type,now.hour), 'w+') as csvfile:
-            df.to_csv(csvfile, index=False)
-        
-            if self.e ==False:
-                csvfile.close()
+        timer = profiler.start()
+        self.trackers[type].submit(self.writer, type, fileList, now)
+        profiler.stop('persist', timer)
     
     
 
@@ -694,42 +928,48 @@ class MainWindow(QWidget):
 
     #----------------------------------------------------------------------------------------------------------------------
     #this function called to update the top plot, not the bottom one
-    def imageUpdate1(self,xData):
+    def imageUpdate1(self,latest):
         Index = self.comboBox1.currentIndex()
         """
         the function controls the range of values presented on the graph. it is determined by the combobox index value chosen by the user.
+        "latest" is the time of the newest sample, in seconds.
         
-        there are 4 settings:
+        there are 7 settings:
         default - this shows all the data, but only works up to a certain point as to not congest the frame
         90s - shows the previous 90s of data
         5min - shows the previous 5min of data
         10min - shows the previous 10min of data
+        1 hour, 1 day, 1 week - show the 1 second, 1 minute or 1 hour averages with their min and max from the tiered
+        history (see historyViews), these can go back past midnight and the start of the 15 minute buffers
         
         """
         if self.closing:
             return
         
         if Index == 0:
-            if xData[-1] > 90:
+            if latest > 90:
                 self.comboBox1.setCurrentIndex(1)
         if Index ==1:
-            if xData[-1]>90:
-                self.lineProfile1.setXRange(int(xData[-1]-90),int(xData[-1]+5), padding = 0.01)           
+            if latest>90:
+                self.lineProfile1.setXRange(int(latest-90),int(latest+5), padding = 0.01)           
             else:
                 print('Not enough Data')
                 self.comboBox1.setCurrentIndex(0)
         if Index ==2:
-            if xData[-1]>=5*60:
-                self.lineProfile1.setXRange(int(xData[-1]-(5*60)),int(xData[-1]+5), padding = 0.01) 
+            if latest>=5*60:
+                self.lineProfile1.setXRange(int(latest-(5*60)),int(latest+5), padding = 0.01) 
             else:
                 print('Not enough Data')
                 self.comboBox1.setCurrentIndex(0)
         if Index ==3:
-            if xData[-1]>=600:
-                self.lineProfile1.setXRange(int(xData[-1]-(10*60)),int(xData[-1]+5), padding = 0.01)         
+            if latest>=600:
+                self.lineProfile1.setXRange(int(latest-(10*60)),int(latest+5), padding = 0.01)         
             else:
                 print('Not enough Data')
                 self.comboBox1.setCurrentIndex(0)
+        if Index in self.historyViews:
+            span = self.historyViews[Index]
+            self.lineProfile1.setXRange(int(latest-span),int(latest+5), padding = 0.01)
         
 
     
@@ -743,6 +983,27 @@ class MainWindow(QWidget):
     
 
     
+    #----------------------------------------------------------------------------------------------------------------------
+    # turns the hot path timing on or off, the old timings are cleared when it is turned on
+    def uiProfileChanged(self, checked: bool):
+        if checked:
+            profiler.reset()
+        profiler.enable(checked)
+        self.updateStats()
+
+    #----------------------------------------------------------------------------------------------------------------------
+    # shows the p50, p99 and throughput of every stage
+    def updateStats(self):
+        self.statsLabel.setText(profiler.report())
+
+    #----------------------------------------------------------------------------------------------------------------------
+    # writes the stage timings to a json file
+    def exportStats(self):
+        path, _ = QFileDialog.getSaveFileName(self, 'Export stats', 'hotPathStats.json', 'JSON (*.json)')
+        if path:
+            profiler.export(path)
+            print('Stats written to %s' %path)
+
     #----------------------------------------------------------------------------------------------------------------------
     #make a clean shutdown, only if intended though!
     def closeEvent(self,event):
@@ -762,6 +1023,20 @@ class MainWindow(QWidget):
 
 def main():
 
+    # "python GUI_for_labjack.py --simulate" runs without a LabJack, on simulated sensors
+    if '--simulate' in sys.argv:
+        MainWindow.simulate = True
+
+    # "--separate" runs the acquisition in its own process, "--attach <name>" views a daqDaemon run with --share <name>
+    if '--separate' in sys.argv:
+        MainWindow.separateProcess = True
+    if '--attach' in sys.argv[:-1]:
+        MainWindow.attachTo = sys.argv[sys.argv.index('--attach') + 1]
+
+    # "--stream <scans per second>" streams every input instead of reading them every tick
+    if '--stream' in sys.argv[:-1]:
+        MainWindow.scanRate = float(sys.argv[sys.argv.index('--stream') + 1])
+
     #instantiate the application
     app = QApplication(sys.argv)
     #link the window to a variable, set the window to be visible
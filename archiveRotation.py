@@ -0,0 +1,311 @@
+"""
+Compresses the data files once nothing will write to them again, on a low priority thread of its own.
+
+every sensor type leaves a csv per hour and one per spike, which is thousands of files a month. an ArchiveRotator
+looks through the day folders every "interval" seconds and compresses each file that is closed:
+
+    an hourly file      once its hour is over (plus "grace" seconds, in case a row for the last minute is still queued)
+    a spike file        once it hasn't changed for "grace" seconds, they are written in one go
+
+"Temp at 14.csv" becomes "Temp at 14.csv.gz" (or ".zst" when the zstandard package is installed and asked for), the
+csv inside is exactly the same. a file is compressed into a temporary file that is only renamed into place when it is
+complete, and the original is removed after that, so a file is never lost if the program stops part way through.
+a csv that turns up again after its hour was compressed (the writer was behind, or the clocks went back and the hour
+happened twice) has its new rows added to the compressed copy rather than being thrown away.
+
+the work is done on its own thread, not the acquisition's or the IOWriter's, at the lowest priority the operating
+system gives a thread, and it stops for a moment after every "chunk" bytes so it doesn't hold the disk up either.
+
+anything that reads the files back should open them with openArchive, which takes the name of the csv and opens it
+whether it has been compressed or not:
+
+    with openArchive(hourlyPath('Temp', now)) as csvfile:
+        rows = list(csv.reader(csvfile))
+
+the raw .npy archive is left alone, it is read as a memory map and that only works on an uncompressed file.
+
+    python archiveRotation.py --root ./data          # compresses everything already closed, once
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from threading import Thread, Event, Lock
+from dataFiles import dataRoot, dayFormat, hourPattern, spikePattern
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+types = ('Mag', 'Temp', 'Pressure')
+suffixes = ('.gz', '.zst')
+
+
+def archiveName(path: str):
+    """
+    the name of the csv a file holds, without the suffix compression adds
+    """
+    for suffix in suffixes:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def findArchive(path: str):
+    """
+    the file that holds "path" as it is on disk now: the csv itself, or its compressed copy. None if there isn't one
+    """
+    path = archiveName(path)
+    for candidate in (path,) + tuple(path + suffix for suffix in suffixes):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def openArchive(path: str):
+    """
+    opens the csv "path" for reading as text, compressed or not. "path" can be given with or without the suffix
+    """
+    found = findArchive(path)
+    if found is None:
+        raise FileNotFoundError(path)
+    if found.endswith('.gz'):
+        return gzip.open(found, 'rt', newline='')
+    if found.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError('%s is compressed with zstd, install the zstandard package to read it' %found)
+        return zstandard.open(found, 'rt', newline='')
+    return open(found, newline='')
+
+
+def lowerPriority():
+    """
+    makes the calling thread the lowest priority there is, if the operating system lets it
+    """
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            kernel = ctypes.windll.kernel32
+            # THREAD_PRIORITY_LOWEST
+            kernel.SetThreadPriority(kernel.GetCurrentThread(), -2)
+        else:
+            # on linux a thread has its own nice value
+            import threading
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except Exception:
+        pass
+
+
+class ArchiveRotator(Thread):
+
+    """
+    Compresses the closed files of every sensor type under "root", see the top of this file. "method" is 'gzip' or
+    'zstd', "lookback" is how many days back the regular passes go (the first pass goes through everything)
+    """
+
+    def __init__(self, root: str = dataRoot, method: str = 'gzip', interval: float = 600, grace: float = 300,
+                 lookback: int = 2, chunk: int = 1 << 20, pause: float = 0.01, level: int = 6):
+        super().__init__(name='ArchiveRotator', daemon=True)
+        if method == 'zstd' and zstandard is None:
+            raise ImportError('the zstandard package is not installed, use gzip')
+        if method not in ('gzip', 'zstd'):
+            raise ValueError('files can be compressed with gzip or zstd, not %s' %method)
+        self.root = root
+        self.method = method
+        self.suffix = '.gz' if method == 'gzip' else '.zst'
+        self.interval = interval
+        self.grace = grace
+        self.lookback = lookback
+        self.chunk = chunk
+        self.pause = pause
+        self.level = level
+
+        self.stopping = Event()
+        self.statsLock = Lock()
+        self.passes = 0
+        self.compressed = 0
+        self.bytesIn = 0
+        self.bytesOut = 0
+        self.errors = 0
+
+    def run(self):
+        lowerPriority()
+        everything = True
+        while not self.stopping.is_set():
+            self.rotate(None if everything else self.lookback)
+            everything = False
+            self.stopping.wait(self.interval)
+
+    def stop(self, timeout: float = None):
+        """
+        stops after the file being compressed (if there is one)
+        """
+        self.stopping.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def folders(self, lookback: int = None):
+        """
+        the hourly and spike folders of every day, or only of the last "lookback" days, as (day, folder)
+        """
+        first = date.today() - timedelta(days=lookback) if lookback is not None else None
+        for type in types:
+            for parent in (os.path.join(self.root, '%s Data' %type), os.path.join(self.root, '%s Data' %type, 'Spike Data')):
+                try:
+                    names = os.listdir(parent)
+                except FileNotFoundError:
+                    continue
+                for name in names:
+                    try:
+                        day = datetime.strptime(name, dayFormat).date()
+                    except ValueError:
+                        continue
+                    if first is None or day >= first:
+                        yield day, os.path.join(parent, name)
+
+    def closed(self, day: date, name: str, path: str, now: float):
+        """
+        True if the file "name" in the folder of "day" won't be written to again
+        """
+        match = hourPattern.match(name)
+        if match is not None:
+            # the last second of the hour, the second time round when the clocks go back and the hour happens twice
+            end = datetime(day.year, day.month, day.day, int(match.group(2)), 59, 59, fold=1).timestamp() + 1
+            return now >= end + self.grace
+        if spikePattern.match(name) is not None:
+            return now >= os.path.getmtime(path) + self.grace
+        return False
+
+    def rotate(self, lookback: int = None):
+        """
+        one pass: compresses every closed file that isn't compressed yet. returns how many were compressed
+        """
+        done = 0
+        for day, folder in self.folders(lookback):
+            try:
+                names = os.listdir(folder)
+            except FileNotFoundError:
+                continue
+            for name in names:
+                if self.stopping.is_set():
+                    return done
+                if not name.endswith('.csv'):
+                    continue
+                path = os.path.join(folder, name)
+                try:
+                    if not self.closed(day, name, path, time.time()):
+                        continue
+                    self.compress(path)
+                    done += 1
+                except Exception as error:
+                    with self.statsLock:
+                        self.errors += 1
+                    print('ArchiveRotator: could not compress %s: %r' %(path, error))
+        with self.statsLock:
+            self.passes += 1
+        return done
+
+    def compress(self, path: str):
+        """
+        compresses "path" next to itself and removes it. if there is a compressed copy already (a pass was stopped
+        after the rename, the writer fell more than "grace" behind, or the hour happened twice when the clocks went
+        back) the csv is merged into it instead, see merge
+        """
+        target = path + self.suffix
+        if os.path.exists(target):
+            self.merge(path, target)
+            return
+
+        temporary = target + '.tmp'
+        size = os.path.getsize(path)
+        with open(path, 'rb') as source:
+            with self.openOutput(temporary) as output:
+                while True:
+                    block = source.read(self.chunk)
+                    if not block:
+                        break
+                    output.write(block)
+                    # gives the disk back to the writer between chunks
+                    if self.pause:
+                        time.sleep(self.pause)
+
+        self.replace(path, temporary, target, size)
+
+    def merge(self, path: str, target: str):
+        """
+        adds the rows of the csv "path" that aren't in its compressed copy "target" yet to the end of it, and removes
+        the csv. the copy is written again to a temporary file and renamed into place like in compress, so if this
+        is stopped part way the csv is still there, and the next pass finds its rows already in the copy
+        """
+        with open(path, 'rb') as source:
+            lines = source.read().splitlines(keepends=True)
+        # the compressed copy itself, openArchive would give the csv while it is still there
+        with (gzip.open(target, 'rb') if target.endswith('.gz') else zstandard.open(target, 'rb')) as existing:
+            archived = existing.read()
+        known = set(archived.splitlines())
+
+        # the rows that are new, a header that is already there isn't written again
+        added = [line for line in lines if line.rstrip(b'\r\n') not in known]
+        if not added:
+            os.remove(path)
+            return
+
+        if archived and not archived.endswith(b'\n'):
+            archived += b'\r\n'
+        temporary = target + '.tmp'
+        size = os.path.getsize(path)
+        with self.openOutput(temporary) as output:
+            output.write(archived)
+            output.write(b''.join(added))
+
+        self.replace(path, temporary, target, size)
+
+    def openOutput(self, path: str):
+        if self.method == 'gzip':
+            return gzip.open(path, 'wb', compresslevel=self.level)
+        return zstandard.open(path, 'wb', cctx=zstandard.ZstdCompressor(level=self.level))
+
+    def replace(self, path: str, temporary: str, target: str, size: int):
+        """
+        renames the finished "temporary" to "target" and removes the csv "path"
+        """
+        # keeps the time the csv was last written, so it still sorts the same way
+        stat = os.stat(path)
+        os.utime(temporary, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(temporary, target)
+        os.remove(path)
+
+        with self.statsLock:
+            self.compressed += 1
+            self.bytesIn += size
+            self.bytesOut += os.path.getsize(target)
+
+    def stats(self):
+        with self.statsLock:
+            return {
+                'passes': self.passes,
+                'compressed': self.compressed,
+                'bytesIn': self.bytesIn,
+                'bytesOut': self.bytesOut,
+                'errors': self.errors,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='compresses the hourly and spike files that are closed')
+    parser.add_argument('--root', default=dataRoot, help='folder the data files are in')
+    parser.add_argument('--zstd', action='store_true', help='compress with zstd instead of gzip (needs the zstandard package)')
+    parser.add_argument('--grace', type=float, default=300, help='seconds after a file is closed before it is compressed')
+    args = parser.parse_args()
+
+    rotator = ArchiveRotator(args.root, 'zstd' if args.zstd else 'gzip', grace=args.grace, pause=0)
+    rotator.rotate()
+    print('Archive rotation: %s' %rotator.stats())
+
+
+if __name__ == '__main__':
+    main()
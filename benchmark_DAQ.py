@@ -0,0 +1,250 @@
+"""
+Benchmarks the acquisition path without a LabJack attached.
+
+the DAQ is run against FakeLJM, a stand-in for the ljm module that answers straight away with made up voltages, so
+what gets measured is only our side of a tick, the steps of the ChannelPipeline: converting, the ring buffers and the
+staging block for the raw archive and tiered history, the detector banks and spike capture, and once a minute summing
+up the minute rows from the buffers and handing them to the writer thread (what MainWindow.updatePlots does, minus the
+drawing). the cost of drawing is measured separately by decimating every curve for a 1000 pixel wide plot.
+
+every combination of channel count, tick period and history length is run for a number of ticks, and for each one the
+results include:
+
+    tick latency        p50, p90, p99 and max of one tick, in microseconds
+    samples/s           how many samples a second the path could keep up with if the device answered instantly
+    frame latency       p50 and p99 of decimating every curve for one frame, in microseconds
+    memory growth       how much more memory python held at the end of the run than after the first ticks
+
+the results are written to a json file so two versions can be compared:
+
+    python benchmark_DAQ.py --output before.json
+    python benchmark_DAQ.py --channels 1 4 14 --periods 0.333 0.01 --windows 900 3600 --ticks 5000
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+
+from daqDaemon import Session
+from decimation import MinMaxPyramid
+
+# every analog input on a T7
+allAIN = ['AIN%s' %n for n in range(14)]
+
+# roughly what each sensor puts out: an RTD at room temperature, the ion pump monitor and the magcheck
+baseVoltages = {'Temp': 2.255, 'Pressure': 0.005, 'Mag': 0.05}
+
+
+class FakeLJM():
+
+    """
+    Stands in for the labjack ljm module with the calls the DAQ makes. reads answer immediately with a fixed voltage
+    per input, times 1 plus "noise" standard deviations of gaussian noise, streams hand back blocks of the fixed voltages.
+
+    the noise is off by default: the ticks are run back to back, microseconds apart, so even a little noise looks like
+    a very fast change to the temperature spike check and every tick would record a spike.
+    """
+
+    def __init__(self, voltages: dict = None, noise: float = 0, seed: int = 0):
+        self.voltages = voltages or {}
+        self.noise = noise
+        self.random = np.random.default_rng(seed)
+        self.streamAIN = []
+        self.scansPerRead = 0
+
+    def openS(self, deviceType, connectionType, identifier):
+        return 1
+
+    def close(self, handle):
+        pass
+
+    def eReadName(self, handle, name):
+        return self.eReadNames(handle, 1, [name])[0]
+
+    def eReadNames(self, handle, numFrames, names):
+        base = np.array([self.voltages.get(name, 0.0) for name in names])
+        if self.noise:
+            base = base*(1 + self.noise*self.random.standard_normal(len(names)))
+        return base.tolist()
+
+    def eWriteNames(self, handle, numFrames, names, values):
+        pass
+
+    def namesToAddresses(self, numFrames, names):
+        return [2*int(name[3:]) for name in names], [3]*len(names)
+
+    def eStreamStart(self, handle, scansPerRead, numAddresses, scanList, scanRate):
+        self.streamAIN = ['AIN%s' %(address//2) for address in scanList]
+        self.scansPerRead = scansPerRead
+        return scanRate
+
+    def eStreamRead(self, handle):
+        scans = np.tile([self.voltages.get(name, 0.0) for name in self.streamAIN], self.scansPerRead)
+        return scans.tolist(), 0, 0
+
+    def eStreamStop(self, handle):
+        pass
+
+
+def assign(channels: int):
+    """
+    splits the first "channels" inputs between temperature, pressure and magnetics in turn, the way the GUI's AINT,
+    AINP and AINM lists split them
+    """
+    groups = {'Temp': [], 'Pressure': [], 'Mag': []}
+    for i, sensor in enumerate(allAIN[:channels]):
+        groups[('Temp', 'Pressure', 'Mag')[i % 3]].append(sensor)
+    return groups
+
+
+class Pipeline(Session):
+
+    """
+    What the daemon (and MainWindow) sets up for a run and does every tick, without the scheduler: the same buffers,
+    the same DAQ calls and the same file writers (writing to a temporary folder).
+    """
+
+    slowTicks = 3
+
+    def __init__(self, channels: int, period: float, window: float, root: str):
+        self.groups = assign(channels)
+        voltages = {sensor: baseVoltages[type] for type, group in self.groups.items() for sensor in group}
+        ResValues = {sensor: 1.08 for sensor in self.groups['Temp']}
+
+        super().__init__(self.groups['Temp'], self.groups['Pressure'], self.groups['Mag'], ResValues, period, self.slowTicks,
+                         root=root, backend=FakeLJM(voltages), historyLength=window)
+        self.open()
+        self.daq = self.test
+
+    def curves(self):
+        """
+        (time buffer, data buffer) of every curve the GUI would draw
+        """
+        times = self.daq.pipeline.timeData
+        return [(times[type], buffer) for type, group in self.Data.items() for buffer in group.values()]
+
+    def close(self):
+        self.stop()
+
+
+def percentiles(samples: list, points=(50, 90, 99)):
+    if not samples:
+        return {}
+    values = np.percentile(np.asarray(samples)/1e3, points)
+    results = {'p%s' %point: round(float(value), 2) for point, value in zip(points, values)}
+    results['max'] = round(max(samples)/1e3, 2)
+    return results
+
+
+def benchmark(channels: int, period: float, window: float, ticks: int, warmup: int, frameEvery: int):
+    """
+    runs one combination and returns its results
+    """
+    with tempfile.TemporaryDirectory() as root:
+        pipeline = Pipeline(channels, period, window, root)
+
+        # fills the buffers part way so the ticks being timed aren't all from an empty start
+        for tick in range(warmup):
+            pipeline.step()
+
+        tracemalloc.start()
+        startMemory = tracemalloc.get_traced_memory()[0]
+
+        pyramids = [MinMaxPyramid(buffer.capacity) for timeData, buffer in pipeline.curves()]
+        tickTimes = []
+        frameTimes = []
+        start = time.perf_counter_ns()
+        for tick in range(ticks):
+            begin = time.perf_counter_ns()
+            pipeline.step()
+            tickTimes.append(time.perf_counter_ns() - begin)
+
+            if tick % frameEvery == 0:
+                begin = time.perf_counter_ns()
+                for pyramid, (timeData, buffer) in zip(pyramids, pipeline.curves()):
+                    if len(timeData):
+                        pyramid.decimate(timeData, buffer, timeData[0], timeData[-1], 1000)
+                frameTimes.append(time.perf_counter_ns() - begin)
+        elapsed = time.perf_counter_ns() - start
+
+        endMemory, peakMemory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        samples = sum(len(group) for group in pipeline.groups.values() if group)
+        # pressure is taken every tick, the other two every slowTicks ticks
+        perTick = len(pipeline.groups['Pressure']) + (len(pipeline.groups['Temp']) + len(pipeline.groups['Mag']))/pipeline.slowTicks
+        busy = sum(tickTimes)/1e9
+
+        writerStats = pipeline.writer.stats()
+        pipeline.close()
+
+    return {
+        'channels': channels,
+        'period': period,
+        'window': window,
+        'ticks': ticks,
+        'tickLatencyUs': percentiles(tickTimes),
+        'frameLatencyUs': percentiles(frameTimes),
+        'samplesPerSecond': round(perTick*ticks/busy, 1) if busy else None,
+        'sensors': samples,
+        'elapsedSeconds': round(elapsed/1e9, 3),
+        'memoryGrowthBytes': endMemory - startMemory,
+        'memoryPeakBytes': peakMemory - startMemory,
+        'writer': writerStats,
+    }
+
+
+def revision():
+    """
+    the git commit being benchmarked, if there is one
+    """
+    try:
+        folder = os.path.dirname(os.path.abspath(__file__))
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=folder, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmarks the DAQ acquisition path against a fake LJM backend')
+    parser.add_argument('--channels', type=int, nargs='+', default=[1, 2, 4, 8, 14], help='channel counts to sweep, up to 14')
+    parser.add_argument('--periods', type=float, nargs='+', default=[1/3, 0.1, 0.01], help='tick periods to sweep, in seconds')
+    parser.add_argument('--windows', type=float, nargs='+', default=[60*15, 60*60], help='history lengths to sweep, in seconds')
+    parser.add_argument('--ticks', type=int, default=3000, help='ticks timed per combination')
+    parser.add_argument('--warmup', type=int, default=300, help='ticks run before timing starts')
+    parser.add_argument('--frame-every', type=int, default=10, help='ticks between timed plot frames')
+    parser.add_argument('--output', default='benchmark_results.json', help='json file the results are written to')
+    args = parser.parse_args()
+
+    results = []
+    for channels in args.channels:
+        for period in args.periods:
+            for window in args.windows:
+                result = benchmark(min(channels, len(allAIN)), period, window, args.ticks, args.warmup, args.frame_every)
+                results.append(result)
+                print('%2s channels, %7.3f s period, %6s s window: tick p50 %8.1f us, p99 %8.1f us, %10.0f samples/s, frame p50 %8.1f us, memory %+d B' %(
+                    channels, period, int(window), result['tickLatencyUs']['p50'], result['tickLatencyUs']['p99'],
+                    result['samplesPerSecond'], result['frameLatencyUs'].get('p50', 0), result['memoryGrowthBytes']))
+
+    report = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'revision': revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print('results written to %s' %args.output)
+
+
+if __name__ == '__main__':
+    main()
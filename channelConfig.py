@@ -0,0 +1,196 @@
+"""
+How the T7 samples each analog input: its range, resolution index, settling time and negative channel.
+
+the T7 powers up with every input on the +-10 V range at the default resolution, which throws away most of the
+resolution of the ion pump monitor (a few millivolts, it should be on the +-0.01 V range). every channel used now gets
+a ChannelConfig, and all of them are written to the device in a single eWriteNames when the DAQ connects:
+
+    AIN#_RANGE              +-10, 1, 0.1 or 0.01 V
+    AIN#_RESOLUTION_INDEX   0 is the device default, 1 is fastest and noisiest, 8 the highest a T7 has (12 on a T7-Pro)
+    AIN#_SETTLING_US        0 lets the device pick a settling time for the range
+    AIN#_NEGATIVE_CH        199 is single ended (to ground), otherwise the odd input next to an even one for differential
+
+each sensor type has its defaults in "sensorDefaults" and a channel can be given its own on top of them.
+
+higher resolution and longer settling make every read of the channel slower, which adds up over all the channels in a
+tick. profile() tries a list of settings on a channel and measures what each one costs per scan (and how noisy the
+readings are), so resolution can be traded for throughput one channel at a time with real numbers:
+
+    python channelConfig.py AIN0 AIN3 --resolutions 1 4 8
+    python channelConfig.py AIN3 --simulate
+"""
+
+import argparse
+import time
+import numpy as np
+
+from devicePool import splitChannel
+
+ranges = (10, 1, 0.1, 0.01)
+singleEnded = 199
+
+
+class ChannelConfig():
+
+    """
+    The settings of one analog input, see the top of this file
+    """
+
+    def __init__(self, range: float = 10, resolution: int = 0, settling: float = 0, negative: int = singleEnded):
+        if range not in ranges:
+            raise ValueError('the T7 ranges are +-%s V, not %s' %(', '.join(str(value) for value in ranges), range))
+        if not 0 <= resolution <= 12:
+            raise ValueError('the resolution index goes from 0 to 12, not %s' %resolution)
+        if not 0 <= settling <= 50000:
+            raise ValueError('the settling time goes from 0 to 50000 us, not %s' %settling)
+        self.range = range
+        self.resolution = int(resolution)
+        self.settling = settling
+        self.negative = int(negative)
+
+    def registers(self, channel: str):
+        """
+        the register names and values that set this up on "channel" ('AIN3', or 'T7#123:AIN3' on a device pool)
+        """
+        device, name = splitChannel(channel)
+        if not name.startswith('AIN'):
+            raise ValueError('%s is not an analog input' %channel)
+
+        if self.negative != singleEnded:
+            positive = int(name[3:])
+            if positive % 2 or self.negative != positive + 1:
+                raise ValueError('%s can only be differential against AIN%s' %(name, positive + 1))
+
+        prefix = channel + '_'
+        return [(prefix + 'RANGE', self.range), (prefix + 'RESOLUTION_INDEX', self.resolution),
+                (prefix + 'SETTLING_US', self.settling), (prefix + 'NEGATIVE_CH', self.negative)]
+
+    def copy(self, **changes):
+        settings = {'range': self.range, 'resolution': self.resolution, 'settling': self.settling, 'negative': self.negative}
+        settings.update(changes)
+        return ChannelConfig(**settings)
+
+    def __repr__(self):
+        return 'ChannelConfig(range=%s, resolution=%s, settling=%s, negative=%s)' %(self.range, self.resolution, self.settling, self.negative)
+
+
+# the RTD dividers sit around 2 V and change slowly, so they get a high resolution. the ion pump monitor is a few mV.
+# the magcheck puts out under a volt
+sensorDefaults = {
+    'Temp': ChannelConfig(range=10, resolution=8),
+    'Pressure': ChannelConfig(range=0.01),
+    'Mag': ChannelConfig(range=1),
+}
+
+
+def channelPlan(AINT: list, AINP: list, AINM: list, overrides: dict = None):
+    """
+    the ChannelConfig of every channel: the defaults of its sensor type, or the one in "overrides" for that channel
+    """
+    overrides = overrides or {}
+    plan = {}
+    for type, AIN in (('Temp', AINT), ('Pressure', AINP), ('Mag', AINM)):
+        for channel in AIN:
+            plan[channel] = overrides.get(channel, sensorDefaults[type])
+    return plan
+
+
+def registerWrites(plan: dict):
+    """
+    every register write of a plan, as the two lists eWriteNames takes
+    """
+    names = []
+    values = []
+    for channel, config in plan.items():
+        for name, value in config.registers(channel):
+            names.append(name)
+            values.append(value)
+    return names, values
+
+
+def apply(ljm, handle, plan: dict):
+    """
+    writes a plan to the device in one eWriteNames call
+    """
+    names, values = registerWrites(plan)
+    if names:
+        ljm.eWriteNames(handle, len(names), names, values)
+
+
+def profile(ljm, handle, channel: str, candidates: list, reads: int = 20, restore: ChannelConfig = None):
+    """
+    tries every ChannelConfig in "candidates" on "channel" and reads it "reads" times with each. returns a row per
+    candidate with the median time of a read, how much longer that is than the fastest candidate, and the standard
+    deviation of the readings. the channel is put back to "restore" afterwards if it is given
+    """
+    rows = []
+    try:
+        for config in candidates:
+            apply(ljm, handle, {channel: config})
+            # the first read after a change can include the device switching over
+            ljm.eReadName(handle, channel)
+
+            times = []
+            values = []
+            for n in range(reads):
+                start = time.perf_counter_ns()
+                values.append(ljm.eReadName(handle, channel))
+                times.append(time.perf_counter_ns() - start)
+
+            rows.append({
+                'channel': channel,
+                'range': config.range,
+                'resolution': config.resolution,
+                'settling': config.settling,
+                'scanUs': float(np.median(times))/1e3,
+                'noise': float(np.std(values)),
+            })
+    finally:
+        if restore is not None:
+            apply(ljm, handle, {channel: restore})
+
+    fastest = min(row['scanUs'] for row in rows) if rows else 0
+    for row in rows:
+        row['costUs'] = row['scanUs'] - fastest
+    return rows
+
+
+def report(rows: list):
+    lines = ['%-14s %6s %10s %9s %10s %10s %12s' %('channel', 'range', 'resolution', 'settling', 'scan us', 'cost us', 'noise V')]
+    for row in rows:
+        lines.append('%-14s %6s %10s %9s %10.1f %10.1f %12.3g' %(row['channel'], row['range'], row['resolution'], row['settling'],
+                                                                 row['scanUs'], row['costUs'], row['noise']))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='measures what each range, resolution and settling time costs per scan on a channel')
+    parser.add_argument('channels', nargs='+', help='analog inputs to profile')
+    parser.add_argument('--ranges', type=float, nargs='+', default=None, help='ranges to try, defaults to +-10 V')
+    parser.add_argument('--resolutions', type=int, nargs='+', default=[1, 2, 3, 4, 5, 6, 7, 8], help='resolution indexes to try')
+    parser.add_argument('--settling', type=float, nargs='+', default=[0], help='settling times to try, in us')
+    parser.add_argument('--reads', type=int, default=20, help='reads of each setting')
+    parser.add_argument('--simulate', action='store_true', help='profile a simulated T7')
+    args = parser.parse_args()
+
+    if args.simulate:
+        from simulatedT7 import SimulatedLJM, labSignals
+        ljm = SimulatedLJM(labSignals(args.channels, [], []), jitter=0)
+    else:
+        from labjack import ljm
+    handle = ljm.openS('T7', 'ANY', 'ANY')
+
+    try:
+        for channel in args.channels:
+            base = ChannelConfig()
+            candidates = [base.copy(range=value, resolution=resolution, settling=settling)
+                          for value in (args.ranges or [base.range])
+                          for resolution in args.resolutions
+                          for settling in args.settling]
+            print(report(profile(ljm, handle, channel, candidates, args.reads, restore=base)))
+    finally:
+        ljm.close(handle)
+
+
+if __name__ == '__main__':
+    main()
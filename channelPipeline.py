@@ -0,0 +1,498 @@
+"""
+One pipeline for every sensor type and every channel.
+
+TData, PData and MData used to each do the same steps for their own sensor type, one channel at a time, and
+MainWindow and the daemon each called them again in their own way. the steps are now done once, here, and what makes a
+sensor type different is an entry in the registry:
+
+    SensorType(name, convert, setup, digits, scale, detectors, pre, post, spreadDigits)
+
+    convert(voltages, setup)        the conversion math, on a block with one row per scan and one column per channel
+    setup(daq, AIN, settings)       anything the conversion needs that only has to be worked out once a run (the lead
+                                    resistance of every RTD)
+    digits, scale                   how the minute rows are aggregated: multiplied by "scale" (the magnetic field is
+                                    written in mG) and the average rounded to "digits" places
+    spreadDigits                    the places the min, max and std are rounded to, so a spread much smaller than the
+                                    average isn't rounded away (the same as "digits" if left out)
+    detectors(daq, AIN, period)     the spike detector banks of the type's channels (see spikeDetection.py)
+    pre, post                       seconds of data from before and after a spike that go in its spike file
+
+a new sensor type is one register() call:
+
+    register(SensorType('Flow', lambda voltage, setup: 12.5*voltage, digits=2))
+
+a ChannelPipeline puts the channels of all the sensor types sampled at the same rate into one Bank. a bank has one time
+buffer, one RingBlock with a row for each of its channels and the detector banks of its types, so a scan goes through
+every step as a few array operations over all of the bank's channels:
+
+    convert     each sensor type converts its own columns of the scan, this is the only step done once per type
+    buffer      the scan goes into the RingBlock, and into a staging block that is handed to the raw archive and the
+                tiered history once a second instead of every tick
+    aggregate   nothing is done per tick: the minute is still in the RingBlock when it is over, so every type's row of
+                min, max, mean and std is summed up from there in one go (see rollingStats.blockSummary). the file
+                lists are emptied at the start of an hour
+    detect      the detector banks check every channel of a type at once, a spike starts (or extends) the capture of
+                its type
+
+so a tenth channel only makes the arrays longer, and a fourth sensor type only adds its own conversion (and its
+detectors, if it has any).
+
+a tick of command/response mode is one scan (tick()), a stream read is a block of many (block()) which goes through the
+same steps with the whole block at once. in a block the detectors still look at one scan at a time, since whether a
+detector fires depends on the scan before.
+"""
+
+import numpy as np
+from ringBuffer import RingBuffer, RingBlock, samplesIn
+from rollingStats import blockSummary
+from conversions import leadResistances, rtdTemperature, ionPumpPressure, magFlux
+from spikeDetection import SpikeEvent, ThresholdBank, RateBank, ZScoreBank
+from eventCapture import EventCapture
+from tieredHistory import TieredHistory
+from instrumentation import profiler
+
+minuteNs = 60*10**9
+secondNs = 10**9
+
+
+class SensorType():
+
+    """
+    What one sensor type does differently from the others, see the top of this file
+    """
+
+    def __init__(self, name: str, convert, setup=None, digits: int = 6, scale: float = 1, detectors=None, pre: float = 60, post: float = 60,
+                 spreadDigits: int = None):
+        self.name = name
+        self.convert = convert
+        self.setup = setup
+        self.digits = digits
+        self.scale = scale
+        self.detectors = detectors
+        self.pre = pre
+        self.post = post
+        self.spreadDigits = digits if spreadDigits is None else spreadDigits
+
+    def __repr__(self):
+        return 'SensorType(%s)' %self.name
+
+
+# every sensor type the pipeline knows, by name
+sensorTypes = {}
+
+
+def register(sensorType: SensorType):
+    sensorTypes[sensorType.name] = sensorType
+    return sensorType
+
+
+#########################
+# the built in sensor types
+#########################
+
+def rtdSetup(daq, AIN: list, ResValues: dict):
+    ResValues = ResValues or {}
+    return daq.rtdTable, leadResistances(AIN, {sensor: ResValues.get(sensor, 0) for sensor in AIN})
+
+
+def rtdConvert(voltage, setup):
+    table, leads = setup
+    if table is not None:
+        return table.temperature(voltage, leads)
+    return rtdTemperature(voltage, leads)
+
+
+def zScoreDetectors(daq, AIN: list, period: float):
+    # off unless the DAQ has a "zScore" set
+    if daq.zScore is None:
+        return []
+    return [ZScoreBank(len(AIN), daq.zScore, samplesIn(daq.zScoreWindow, period), hysteresis=daq.zScoreHysteresis)]
+
+
+def tempDetectors(daq, AIN: list, period: float):
+    # a temperature spike is the 2 minute average changing by more than "tempRate" degrees a second
+    return [RateBank(len(AIN), daq.tempRate, samplesIn(daq.rateSmoothingT, period))] + zScoreDetectors(daq, AIN, period)
+
+
+def pressureDetectors(daq, AIN: list, period: float):
+    return [ThresholdBank(len(AIN), high=daq.threshold, hysteresis=daq.thresholdHysteresis)] + zScoreDetectors(daq, AIN, period)
+
+
+register(SensorType('Temp', rtdConvert, rtdSetup, digits=3, detectors=tempDetectors, pre=60, post=60, spreadDigits=4))
+register(SensorType('Pressure', lambda voltage, setup: ionPumpPressure(voltage), digits=1, detectors=pressureDetectors, pre=60*2, post=60,
+                    spreadDigits=6))
+register(SensorType('Mag', lambda voltage, setup: magFlux(voltage), digits=3, scale=1000, detectors=zScoreDetectors, spreadDigits=6))
+
+
+class TypeChannels():
+
+    """
+    The channels of one sensor type in a bank: where they are in the bank's rows, the conversion setup, the detector
+    banks and the spike capture
+    """
+
+    def __init__(self, sensorType: SensorType, AIN: list, columns: slice, setup, detectors: list, capture):
+        self.sensorType = sensorType
+        self.name = sensorType.name
+        self.AIN = AIN
+        self.columns = columns
+        self.setup = setup
+        self.detectors = detectors
+        self.capture = capture
+
+
+class Bank():
+
+    """
+    The channels of every sensor type sampled every "every" ticks ("period" seconds), see the top of this file.
+    "sources" is where the bank's channels are in the pipeline's scan, they are always next to each other
+    """
+
+    def __init__(self, daq, every: int, period: float, historyLength: float):
+        self.daq = daq
+        self.every = every
+        self.period = period
+        self.historyLength = historyLength
+        self.types = []
+        self.AIN = []
+
+    def add(self, sensorType: SensorType, AIN: list, settings):
+        start = len(self.AIN)
+        self.AIN.extend(AIN)
+
+        setup = sensorType.setup(self.daq, AIN, settings) if sensorType.setup is not None else None
+        detectors = sensorType.detectors(self.daq, AIN, self.period) if sensorType.detectors is not None else []
+        capture = None
+        if detectors:
+            capture = EventCapture(sensorType.name, AIN, self.period, self.daq.writer, sensorType.pre, sensorType.post)
+        self.types.append(TypeChannels(sensorType, list(AIN), slice(start, len(self.AIN)), setup, detectors, capture))
+
+    def build(self, first: int):
+        """
+        makes the buffers once every sensor type has been added, "first" is where the bank's channels start in the scan
+        """
+        channels = len(self.AIN)
+        self.sources = slice(first, first + channels)
+
+        # the minute rows are summed up from the buffers, so they hold at least a minute
+        capacity = max(samplesIn(self.historyLength, self.period), samplesIn(minuteNs/1e9, self.period) + 1)
+        self.timeData = RingBuffer(capacity, dtype=np.int64)
+        self.values = RingBlock(channels, capacity)
+        self.Data = {}
+        for group in self.types:
+            self.Data[group.name] = {sensor: self.values.channel(group.columns.start + row) for row, sensor in enumerate(group.AIN)}
+
+        # the converted scan of a tick, used again every tick since the buffers keep copies
+        self.converted = np.zeros(channels)
+
+        # single scans waiting to go into the raw archive and tiered history, up to a second of them
+        self.stageStamps = np.zeros(max(16, samplesIn(1, self.period) + 1), dtype=np.int64)
+        self.stage = np.zeros((len(self.stageStamps), channels))
+        self.staged = 0
+        self.stageSecond = None
+
+        # the minute being collected, and the value of values.total at its first scan
+        self.minute = None
+        self.minuteStart = 0
+        self.day = self.daq.day
+        self.originNs = self.daq.clock.originNs
+
+    def begin(self, epoch: int, pipeline):
+        """
+        called with the time of the first scan of a tick or block, before it goes in. the minute that just ended is
+        written out first, so it is still in the buffers when they are cleared at the start of a day
+        """
+        minute = epoch//minuteNs
+        if minute != self.minute:
+            if self.minute is not None:
+                self.storeMinute(self.values.total - self.minuteStart, 0, epoch, pipeline)
+            self.minute = minute
+            self.minuteStart = self.values.total
+
+        if self.daq.day != self.day:
+            self.day = self.daq.day
+            self.timeData.clear()
+            self.values.clear()
+            self.minuteStart = 0
+
+            # the stamps start over from the new origin, the detectors' times are moved back with them so a channel
+            # waiting to re-arm doesn't wait for the new day's clock to catch up with the old one
+            moved = (self.daq.clock.originNs - self.originNs)/1e9
+            self.originNs = self.daq.clock.originNs
+            for group in self.types:
+                for detector in group.detectors:
+                    detector.shift(moved)
+
+    def scan(self, stamp: int, voltages, pipeline):
+        """
+        one scan of the bank's channels, "stamp" in nanoseconds since the clock's origin
+        """
+        daq = self.daq
+        epoch = daq.clock.wallOriginNs + stamp
+        self.begin(epoch, pipeline)
+
+        timer = profiler.start()
+        converted = self.converted
+        for group in self.types:
+            converted[group.columns] = group.sensorType.convert(voltages[group.columns], group.setup)
+        profiler.stop('convert', timer, len(converted))
+
+        timer = profiler.start()
+        self.timeData.append(stamp)
+        self.values.append(converted)
+        self.stageScan(epoch, converted, pipeline)
+        profiler.stop('buffer', timer, len(converted))
+
+        timer = profiler.start()
+        for group in self.types:
+            if group.detectors:
+                self.check(group, stamp, epoch, converted[group.columns])
+        profiler.stop('detect', timer, len(converted))
+
+    def block(self, stamps, voltages, pipeline):
+        """
+        a block of scans, "stamps" in nanoseconds since the clock's origin and "voltages" with one row per scan
+        """
+        daq = self.daq
+        n = len(stamps)
+        epochs = daq.clock.wallOriginNs + stamps
+        self.begin(int(epochs[0]), pipeline)
+
+        timer = profiler.start()
+        converted = np.empty(voltages.shape)
+        for group in self.types:
+            converted[:, group.columns] = group.sensorType.convert(voltages[:, group.columns], group.setup)
+        profiler.stop('convert', timer, converted.size)
+
+        timer = profiler.start()
+        self.timeData.extend(stamps)
+        self.values.extend(converted)
+        self.flush(pipeline)
+        self.output(epochs, converted, pipeline)
+
+        # a block that runs into the next minute
+        minutes = epochs//minuteNs
+        for change in (np.flatnonzero(minutes[1:] != minutes[:-1]) + 1).tolist():
+            start = self.values.total - n + change
+            self.storeMinute(start - self.minuteStart, n - change, int(epochs[change]), pipeline)
+            self.minuteStart = start
+        self.minute = int(minutes[-1])
+        profiler.stop('buffer', timer, converted.size)
+
+        timer = profiler.start()
+        for group in self.types:
+            if not group.detectors:
+                continue
+            # the buffers already hold every scan of the block, the ones after a spike are left out of its pre window
+            values = converted[:, group.columns]
+            for scan in range(n):
+                self.check(group, int(stamps[scan]), int(epochs[scan]), values[scan], n - 1 - scan)
+        profiler.stop('detect', timer, converted.size)
+
+    def check(self, group: TypeChannels, stamp: int, epoch: int, values, skip: int = 0):
+        """
+        runs the detector banks of a sensor type over one scan and feeds its spike capture. "skip" is how many scans in
+        the buffers came after this one. returns True if a spike was found
+        """
+        if group.capture.active is not None:
+            group.capture.append(epoch, values)
+
+        t = stamp/1e9
+        events = []
+        for detector in group.detectors:
+            fired = detector.update(t, values)
+            if fired.any():
+                events.extend(SpikeEvent(group.name, group.AIN[row], detector.name, t, float(values[row])) for row in np.flatnonzero(fired))
+        if not events:
+            return False
+
+        now = self.daq.clock.wallTime(stamp)
+        print('%s spike detected on %s at %s!' %(group.name, ', '.join(event.channel for event in events), now.strftime('%H:%M:%S')))
+        group.capture.trigger(events, self.timeData, self.Data[group.name], self.daq.clock.epochNs, now, skip)
+        return True
+
+    def stageScan(self, epoch: int, values, pipeline):
+        second = epoch//secondNs
+        if self.staged and (second != self.stageSecond or self.staged == len(self.stageStamps)):
+            self.flush(pipeline)
+        self.stageSecond = second
+        self.stageStamps[self.staged] = epoch
+        self.stage[self.staged] = values
+        self.staged += 1
+
+    def flush(self, pipeline):
+        if self.staged:
+            self.output(self.stageStamps[:self.staged], self.stage[:self.staged], pipeline, True)
+            self.staged = 0
+
+    def output(self, epochs, converted, pipeline, oneSecond: bool = False):
+        """
+        hands a block of scans to the raw archive and tiered history of each sensor type. when the block is all from
+        "oneSecond" (the staged scans always are) it is one bucket of the finest tier for every channel, so the buckets
+        are summed up for all of the channels at once
+        """
+        daq = self.daq
+        if oneSecond:
+            present = converted == converted
+            counts = present.sum(axis=0).tolist()
+            totals = np.where(present, converted, 0.0).sum(axis=0).tolist()
+            lows = np.where(present, converted, np.inf).min(axis=0).tolist()
+            highs = np.where(present, converted, -np.inf).max(axis=0).tolist()
+            stamp = int(epochs[0])
+
+        for group in self.types:
+            columns = converted[:, group.columns]
+            archive = daq.archives.get(group.name)
+            if archive is not None:
+                archive.extend(epochs, {sensor: columns[:, row] for row, sensor in enumerate(group.AIN)})
+
+            histories = daq.history.setdefault(group.name, {})
+            for row, sensor in enumerate(group.AIN):
+                if sensor not in histories:
+                    histories[sensor] = TieredHistory()
+                if not oneSecond:
+                    histories[sensor].extend(epochs, columns[:, row])
+                elif counts[group.columns.start + row]:
+                    channel = group.columns.start + row
+                    histories[sensor].merge(0, stamp, totals[channel], counts[channel], lows[channel], highs[channel])
+
+    def storeMinute(self, scans: int, skip: int, epoch: int, pipeline):
+        """
+        adds a row to every type's file lists with the average, min, max and standard deviation of each sensor over the
+        minute that just ended: the "scans" scans before the newest "skip". "epoch" is when the new minute started. the
+        file lists are emptied first when the new minute is the start of an hour, since a new file is made every hour
+        """
+        now = self.daq.clock.wallTime(epoch - self.daq.clock.wallOriginNs)
+        scans = min(scans, self.values.count - skip)
+        summary = blockSummary(self.values.tail(scans + skip)[:, :scans])
+
+        for group in self.types:
+            filelist = pipeline.filelist[group.name]
+            if now.minute == 0:
+                for column in filelist.values():
+                    column.clear()
+            filelist['Time'].append(now.strftime('%H:%M'))
+
+            # scaled first, so the rounding is to places of the unit that is written
+            sensorType = group.sensorType
+            for suffix, values, digits in zip(('', ' min', ' max', ' std'), summary, (sensorType.digits,) + (sensorType.spreadDigits,)*3):
+                values = np.round(values[group.columns]*sensorType.scale, digits).tolist()
+                for sensor, value in zip(group.AIN, values):
+                    filelist[sensor + suffix].append(value)
+            pipeline.stored.add(group.name)
+
+    def close(self, pipeline):
+        self.flush(pipeline)
+        for group in self.types:
+            if group.capture is not None:
+                group.capture.close()
+
+
+class ChannelPipeline():
+
+    """
+    Every channel of a run, see the top of this file. "AIN" is {sensor type: its inputs}, "every" how many ticks apart
+    each type is sampled (1 if left out) and "settings" anything a type's setup takes ({'Temp': ResValues}).
+
+    the inputs are read in the order of "names", which has the inputs of each bank one after the other. the buffers the
+    graph and the files use are in timeData, Data and filelist, by sensor type. "stored" has the types whose file lists
+    got a new row in the last tick or block, only those have anything to write
+    """
+
+    def __init__(self, daq, AIN: dict, tickPeriod: float, every: dict = None, settings: dict = None, historyLength: float = None):
+        self.daq = daq
+        self.stored = set()
+        every = every or {}
+        settings = settings or {}
+        historyLength = historyLength if historyLength is not None else daq.historyLength
+
+        self.AIN = {}
+        self.banks = []
+        byEvery = {}
+        for name, channels in AIN.items():
+            if name not in sensorTypes:
+                raise ValueError('%s is not a registered sensor type (%s)' %(name, ', '.join(sensorTypes)))
+            self.AIN[name] = list(channels)
+            if not channels:
+                continue
+
+            ticks = max(1, int(every.get(name, 1)))
+            bank = byEvery.get(ticks)
+            if bank is None:
+                bank = byEvery[ticks] = Bank(daq, ticks, tickPeriod*ticks, historyLength)
+                self.banks.append(bank)
+            bank.add(sensorTypes[name], list(channels), settings.get(name))
+
+        self.names = []
+        self.timeData = {}
+        self.Data = {}
+        self.filelist = {}
+        for bank in self.banks:
+            bank.build(len(self.names))
+            self.names.extend(bank.AIN)
+            for group in bank.types:
+                self.timeData[group.name] = bank.timeData
+                self.Data[group.name] = bank.Data[group.name]
+
+        # every sensor type has file lists even without inputs, the minute rows go in as columns of these
+        for name, channels in self.AIN.items():
+            filelist = {}
+            for sensor in channels:
+                filelist.update({sensor: [], sensor+' min': [], sensor+' max': [], sensor+' std': []})
+            filelist['Time'] = []
+            self.filelist[name] = filelist
+            if name not in self.timeData:
+                self.timeData[name] = RingBuffer(1, dtype=np.int64)
+                self.Data[name] = {}
+
+    def tick(self, tick: int, stamp: int, voltages):
+        """
+        one read of every input in "names", "stamp" in nanoseconds since the clock's origin. the banks that are due
+        this tick take it, returns the sensor types that did
+        """
+        voltages = np.asarray(voltages, dtype=np.float64)
+        self.now(stamp)
+        self.stored.clear()
+        processed = []
+        for bank in self.banks:
+            if tick % bank.every:
+                continue
+            bank.scan(stamp, voltages[bank.sources], self)
+            processed.extend(group.name for group in bank.types)
+        return processed
+
+    def block(self, stamps, voltages):
+        """
+        a block of scans of every input in "names" (one row per scan), like a stream read. every bank takes all of it
+        """
+        stamps = np.asarray(stamps, dtype=np.int64)
+        voltages = np.asarray(voltages, dtype=np.float64).reshape(len(stamps), len(self.names))
+        self.stored.clear()
+        processed = []
+        if len(stamps) == 0:
+            return processed
+        self.now(int(stamps[-1]))
+        for bank in self.banks:
+            bank.block(stamps, voltages[:, bank.sources], self)
+            processed.extend(group.name for group in bank.types)
+        return processed
+
+    def now(self, stamp: int):
+        # the time of the newest scan: "stop" as a wall clock time for the file names and "time" in seconds since the
+        # clock's origin
+        self.daq.stop = self.daq.clock.wallTime(stamp)
+        self.daq.time = stamp/1e9
+
+    def flush(self):
+        """
+        hands the staged scans to the raw archive and tiered history now
+        """
+        for bank in self.banks:
+            bank.flush(self)
+
+    def close(self):
+        """
+        flushes everything and writes out spikes that are still being collected, for the end of a run
+        """
+        for bank in self.banks:
+            bank.close(self)
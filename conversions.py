@@ -0,0 +1,105 @@
+"""
+Conversion kernels that turn the voltages read from the labjack into temperature, pressure and magnetic field.
+
+every function takes numpy arrays (or single numbers) and does the whole conversion as array operations, so a block
+of 10 000 stream samples is converted in one call instead of 10 000 trips through the python interpreter.
+a block is laid out as one row per scan and one column per channel, anything that is different for every channel
+(like the lead resistance of each RTD) is passed as an array with one value per column and numpy broadcasts it.
+"""
+
+import numpy as np
+
+
+###############################
+# RTD (PT100)
+###############################
+
+# Callendar Van-Dusen coefficients for a PT100 (IEC 60751)
+A = 3.9083e-3
+B = -5.775e-7
+C = -4.183e-12
+Res0 = 100
+
+# the RTD sits in a divider with a fixed 1k resistor fed by the 2.5V reference
+Rfixed = 1000
+excitation = 2.5
+
+
+def leadResistances(AIN: list, ResValues: dict):
+    """
+    turns the ResValues dictionary into an array in the same order as AIN, ready to be broadcast against a block
+    """
+    return np.array([ResValues[sensor] for sensor in AIN], dtype=np.float64)
+
+
+def rtdResistance(voltage, leadResistance=0):
+    """
+    works out the resistance of the RTD element from the divider voltage, taking off the resistance the
+    wires add (3/2 of the lead resistance for the 3 wire connection)
+    """
+    voltage = np.asarray(voltage, dtype=np.float64)
+    Rtd = (Rfixed*(excitation - voltage))/voltage
+    return Rtd - 1.5*np.asarray(leadResistance, dtype=np.float64)
+
+
+def rtdTemperature(voltage, leadResistance=0):
+    """
+    converts RTD voltages to degrees C by solving the Callendar Van-Dusen quadratic directly. this ignores the C
+    coefficient so it is only exact at and above 0 C, use RtdTable for anything colder.
+    """
+    Res = rtdResistance(voltage, leadResistance)
+    return (-A + np.sqrt(A**2 - 4*B*(1 - Res/Res0)))/(2*B)
+
+
+def cvdResistance(TempC):
+    """
+    the forward Callendar Van-Dusen equation, resistance of a PT100 at a given temperature. below 0 C the
+    C(T-100)T^3 term is included.
+    """
+    T = np.asarray(TempC, dtype=np.float64)
+    cold = np.where(T < 0, C*(T - 100)*T**3, 0.0)
+    return Res0*(1 + A*T + B*T**2 + cold)
+
+
+class RtdTable():
+
+    """
+    Lookup table for converting RTD voltages to temperature by interpolation instead of solving the equation for
+    every sample.
+
+    the table is built once from the forward equation (cvdResistance), so unlike rtdTemperature it is correct below
+    0 C where the C coefficient matters. PT100 resistance only ever goes up with temperature, so the table can be
+    searched with np.interp. readings outside the table (open or shorted sensor) come back as nan.
+    """
+
+    def __init__(self, low: float = -200, high: float = 850, step: float = 0.1):
+        self.temps = np.arange(low, high + step/2, step)
+        self.resistances = cvdResistance(self.temps)
+
+    def temperature(self, voltage, leadResistance=0):
+        Res = rtdResistance(voltage, leadResistance)
+        return np.interp(Res, self.resistances, self.temps, left=np.nan, right=np.nan)
+
+    __call__ = temperature
+
+
+###############################
+# ION PUMP (TP-020)
+###############################
+
+def ionPumpPressure(voltage):
+    """
+    converts the ion pump monitor voltage to pressure
+    """
+    return (10**(-0.74))*np.asarray(voltage, dtype=np.float64)
+
+
+###############################
+# MAGCHECK-95
+###############################
+
+def magFlux(voltage):
+    """
+    the magcheck outputs 1mV AC per 1mG, so the voltage is the field strength in Gauss
+    """
+    return np.asarray(voltage, dtype=np.float64)
@@ -0,0 +1,342 @@
+"""
+Runs the acquisition without the GUI, for logging all day as a service on the lab PC.
+
+    python daqDaemon.py --temp AIN0 AIN4 --pressure AIN3 --mag AIN2
+    python daqDaemon.py --simulate --root ./data --status daqStatus.json
+    python daqDaemon.py --stream 1000
+
+with --stream the T7 samples every input on its own clock at that many scans per second (see DAQ.startStream) and
+the session processes a block of scans at a time, instead of reading every input once a tick.
+
+this does everything MainWindow.startRun sets going except the drawing: reading every input each tick, the minute
+averages and hourly csv files, the raw archive, the tiered history, spike detection and spike files. nothing here
+imports Qt or pyqtgraph, so it starts quickly and only needs numpy and the LJM library.
+
+the work is done by a Session, which can also be used from other code. anything that wants the data as it comes in
+(a viewer, a test) can subscribe to it:
+
+    session = Session(['AIN0'], ['AIN3'], ['AIN2'])
+    session.subscribe(lambda type, AIN, xData, Data: ...)
+    session.start()
+
+the daemon stops cleanly (finishing the tick it is on and writing out everything queued) on ctrl-c or SIGTERM, and
+while it runs it can write its state to a small json file every few seconds so a service monitor can check on it.
+
+with --share the samples are also published to shared memory (see sharedRing.py) and the GUI can watch a daemon that
+is already running without touching the device:
+
+    python daqDaemon.py --share labjackDAQ
+    python GUI_for_labjack.py --attach labjackDAQ
+"""
+
+import argparse
+import json
+import os
+import signal
+from threading import Event, Lock
+from datetime import datetime
+
+from streamTest_T7 import DAQ
+from dataFiles import HourlyCsvWriter, FileListTracker, SpikeCsvWriter, dataRoot
+from ioWriter import IOWriter
+from scheduler import Scheduler
+from channelConfig import channelPlan
+from archiveRotation import ArchiveRotator
+
+
+class Session():
+
+    """
+    One acquisition run: the DAQ, its buffers and file writers, and the scheduler that ticks it. "AINT", "AINP" and
+    "AINM" are the temperature, pressure and magnetic inputs, "ResValues" the lead resistance of each temperature
+    input. pressure is processed every "tickPeriod" seconds and the other two every "slowTicks" ticks, like the GUI.
+    if "scanRate" is given every input is streamed at that many scans per second instead, and the ticks are ignored
+    """
+
+    types = ('Mag', 'Temp', 'Pressure')
+
+    def __init__(self, AINT: list, AINP: list, AINM: list, ResValues: dict = None, tickPeriod: float = 1/3, slowTicks: int = 3,
+                 rawArchive: bool = True, root: str = dataRoot, backend=None, historyLength: float = None, channels: dict = None,
+                 compress: bool = True, scanRate: float = None):
+        self.AIN = {'Temp': list(AINT), 'Pressure': list(AINP), 'Mag': list(AINM)}
+        # ChannelConfigs for inputs that shouldn't get the defaults of their sensor type (see channelConfig.py)
+        self.channels = dict(channels or {})
+        self.ResValues = dict(ResValues or {})
+        self.tickPeriod = tickPeriod
+        self.slowTicks = slowTicks
+        self.rawArchive = rawArchive
+        # when True the hourly and spike files are compressed once they are closed (see archiveRotation.py)
+        self.compress = compress
+        self.root = root
+        self.backend = backend
+        self.scanRate = scanRate
+
+        slow = tickPeriod*slowTicks
+        self.periods = {'Temp': slow, 'Pressure': tickPeriod, 'Mag': slow}
+        # a stream samples every input on every scan
+        if scanRate:
+            self.periods = {type: 1/scanRate for type in self.periods}
+        self.historyLength = historyLength if historyLength is not None else DAQ.historyLength
+
+        self.listeners = []
+        self.lock = Lock()
+        self.running = False
+        self.tick = 0
+        self.started = None
+        self.test = None
+        self.writer = None
+        self.scheduler = None
+        self.rotator = None
+        self.backlog = (0, 0)
+
+    def subscribe(self, listener):
+        """
+        calls listener(type, AIN, xData, Data) on the acquisition thread every time a sensor type gets a new sample.
+        the buffers are the session's own, a listener should only read them (or hand them to a PlotBridge)
+        """
+        with self.lock:
+            self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def open(self):
+        """
+        sets up the writer, the DAQ and the buffers without starting the ticks, so step() can be called by hand
+        """
+        self.writer = IOWriter()
+        for type in self.types:
+            self.writer.addSink(type, HourlyCsvWriter(type, self.root))
+        self.writer.addSink('Spike', SpikeCsvWriter(self.root))
+        self.writer.start()
+
+        self.test = DAQ(self.periods['Temp'], self.periods['Pressure'], self.periods['Mag'], writer=self.writer, backend=self.backend)
+        # the pipeline sizes its buffers from historyLength when it is made
+        self.test.historyLength = self.historyLength
+        self.test.configureChannels(channelPlan(self.AIN['Temp'], self.AIN['Pressure'], self.AIN['Mag'], self.channels))
+
+        if self.rawArchive:
+            for type in self.types:
+                if self.AIN[type]:
+                    self.test.startArchive(type, self.AIN[type], root=self.root)
+
+        pipeline = self.test.startPipeline(self.AIN, {'Temp': self.ResValues})
+        self.Data = pipeline.Data
+        self.filelist = pipeline.filelist
+
+        # keeps track of which rows of the file lists have already been sent to the writer
+        self.trackers = {type: FileListTracker() for type in self.types}
+        self.tick = 0
+        self.started = datetime.now()
+        self.running = True
+
+        if self.scanRate:
+            self.test.startStream(scanRate=self.scanRate)
+
+    def start(self):
+        """
+        opens the session and ticks it on the scheduler thread until stop() is called
+        """
+        self.open()
+        self.scheduler = Scheduler()
+        # streamStep waits for its block, so in stream mode the task runs once per block
+        period = self.test.scansPerRead/self.test.scanRate if self.scanRate else self.tickPeriod
+        self.scheduler.addTask('read', period, self.step)
+        self.scheduler.start()
+
+        if self.compress:
+            self.rotator = ArchiveRotator(self.root)
+            self.rotator.start()
+
+    def step(self):
+        """
+        one tick: reads every input at once, processes pressure, and temperature and magnetics every "slowTicks" ticks.
+        in stream mode it reads and processes the next block of scans instead
+        """
+        if not self.running:
+            return
+
+        self.tick += 1
+        if self.scanRate:
+            types, *self.backlog = self.test.streamStep()
+        else:
+            types = self.test.step(self.tick)
+        for type in types:
+            self.process(type)
+
+    def process(self, type: str):
+        """
+        sends the new minute rows of a sensor type to its file and hands its buffers to the listeners
+        """
+        pipeline = self.test.pipeline
+        tracker = self.trackers[type]
+        if type in pipeline.stored or tracker.pending:
+            tracker.submit(self.writer, type, pipeline.filelist[type], self.test.stop)
+
+        with self.lock:
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(type, self.AIN[type], pipeline.timeData[type], pipeline.Data[type])
+
+    def stop(self):
+        """
+        stops ticking, writes out everything still queued and closes the files
+        """
+        if not self.running:
+            return
+        self.running = False
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        self.test.stopRun()
+        self.writer.close()
+        if self.rotator is not None:
+            self.rotator.stop()
+
+        # a DevicePool has the handles of all its devices to give back
+        if hasattr(self.backend, 'devices'):
+            self.backend.close()
+
+    def status(self):
+        """
+        how the session is doing, for the status file
+        """
+        latest = {}
+        if self.running:
+            for type in self.types:
+                for sensor, buffer in self.Data[type].items():
+                    if len(buffer):
+                        latest[sensor] = float(buffer.view()[-1])
+        return {
+            'pid': os.getpid(),
+            'started': self.started.isoformat(timespec='seconds') if self.started else None,
+            'updated': datetime.now().isoformat(timespec='seconds'),
+            'running': self.running,
+            'ticks': self.tick,
+            'scanRate': self.test.scanRate if self.scanRate and self.test is not None else None,
+            'backlog': {'device': self.backlog[0], 'ljm': self.backlog[1]},
+            'inputs': self.AIN,
+            'latest': latest,
+            'scheduler': self.scheduler.stats() if self.scheduler is not None else {},
+            'writer': self.writer.stats() if self.writer is not None else {},
+            'archive': self.rotator.stats() if self.rotator is not None else {},
+        }
+
+
+def writeStatus(session: Session, path: str):
+    # written to a temporary file and renamed over the old one, so a reader never sees half a file
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(session.status(), file, indent=2)
+    os.replace(temporary, path)
+
+
+def leadValues(pairs: list):
+    """
+    ['AIN0=1.08', 'AIN4=1.099'] -> {'AIN0': 1.08, 'AIN4': 1.099}
+    """
+    values = {}
+    for pair in pairs:
+        sensor, _, value = pair.partition('=')
+        values[sensor] = float(value)
+    return values
+
+
+def openBackend(AINT: list, AINP: list, AINM: list, devices: list = (), simulate: bool = False):
+    """
+    returns what the DAQ reads the sensors through: None for the labjack library with one T7, a simulated T7, or a
+    DevicePool when "devices" lists the T7s to read (simulated ones if "simulate"). the simulator and the device pool
+    are only imported when they are asked for
+    """
+    if not devices:
+        if simulate:
+            from simulatedT7 import SimulatedLJM, labSignals
+            return SimulatedLJM(labSignals(AINT, AINP, AINM))
+        return None
+
+    from devicePool import DevicePool, Device, splitChannel
+    if not simulate:
+        return DevicePool(devices)
+
+    # a simulated T7 for each device, with the signals of the inputs named after it
+    from simulatedT7 import SimulatedLJM, labSignals
+    pool = []
+    for identifier in devices:
+        name = 'T7#%s' %identifier
+        inputs = lambda group: [splitChannel(channel)[1] for channel in group if splitChannel(channel)[0] == name]
+        pool.append(Device(identifier, SimulatedLJM(labSignals(inputs(AINT), inputs(AINP), inputs(AINM))), name=name))
+    return DevicePool(pool)
+
+
+def serve(prefix: str, stopping, AINT: list, AINP: list, AINM: list, ResValues: dict = None, tickPeriod: float = 1/3,
+          slowTicks: int = 3, rawArchive: bool = True, root: str = dataRoot, devices: list = (), simulate: bool = False, channels: dict = None,
+          compress: bool = True, scanRate: float = None):
+    """
+    runs a Session and publishes it to shared rings named after "prefix" (see sharedRing.py) until the
+    multiprocessing Event "stopping" is set. this is what MainWindow runs in its own process in separate process mode
+    """
+    from sharedRing import SharedPublisher
+
+    session = Session(AINT, AINP, AINM, ResValues, tickPeriod, slowTicks, rawArchive, root, openBackend(AINT, AINP, AINM, devices, simulate),
+                      channels=channels, compress=compress, scanRate=scanRate)
+    publisher = SharedPublisher(session, prefix)
+    session.start()
+    try:
+        stopping.wait()
+    finally:
+        session.stop()
+        publisher.close()
+        print('Acquisition process: %s' %session.scheduler.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='logs the LabJack sensors without the GUI')
+    parser.add_argument('--temp', nargs='*', default=['AIN0', 'AIN4'], help='temperature (RTD) inputs')
+    parser.add_argument('--pressure', nargs='*', default=['AIN3'], help='ion pump pressure inputs')
+    parser.add_argument('--mag', nargs='*', default=['AIN2'], help='magcheck inputs')
+    parser.add_argument('--leads', nargs='*', default=['AIN0=1.080', 'AIN4=1.099'], help='lead resistance of each temperature input, as AIN0=1.08')
+    parser.add_argument('--devices', nargs='*', default=[], help='serial numbers or IP addresses of the T7s, inputs are then named like T7#<serial>:AIN0')
+    parser.add_argument('--tick', type=float, default=1/3, help='seconds between reads')
+    parser.add_argument('--slow-ticks', type=int, default=3, help='ticks between temperature and magnetic samples')
+    parser.add_argument('--root', default=dataRoot, help='folder the data files go in')
+    parser.add_argument('--no-archive', action='store_true', help="don't keep every sample in the raw archive")
+    parser.add_argument('--no-compress', action='store_true', help="don't compress the hourly and spike files once they are closed")
+    parser.add_argument('--simulate', action='store_true', help='read simulated sensors instead of a T7')
+    parser.add_argument('--status', default=None, help='json file the state of the daemon is written to')
+    parser.add_argument('--status-every', type=float, default=5, help='seconds between status file updates')
+    parser.add_argument('--stream', type=float, default=None, metavar='SCANRATE', help='streams every input at this many scans per second instead of reading them every tick')
+    parser.add_argument('--share', default=None, help='publishes the data to shared memory rings under this name, for the GUI to view with --attach')
+    args = parser.parse_args()
+
+    backend = openBackend(args.temp, args.pressure, args.mag, args.devices, args.simulate)
+    session = Session(args.temp, args.pressure, args.mag, leadValues(args.leads), args.tick, args.slow_ticks,
+                      not args.no_archive, args.root, backend, compress=not args.no_compress, scanRate=args.stream)
+
+    publisher = None
+    if args.share:
+        from sharedRing import SharedPublisher
+        publisher = SharedPublisher(session, args.share)
+
+    stopping = Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *ignored: stopping.set())
+
+    session.start()
+    print('Logging %s to %s' %(', '.join(sensor for group in session.AIN.values() for sensor in group), args.root))
+    try:
+        while not stopping.wait(args.status_every):
+            if args.status:
+                writeStatus(session, args.status)
+    finally:
+        session.stop()
+        if publisher is not None:
+            publisher.close()
+        if args.status:
+            writeStatus(session, args.status)
+        print('Scheduler: %s' %session.scheduler.stats())
+        print('File writer: %s' %session.writer.stats())
+
+
+if __name__ == '__main__':
+    main()
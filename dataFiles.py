@@ -0,0 +1,242 @@
+"""
+Everything to do with where the data files live and how they get written.
+
+the layout is the same one the GUI has always used:
+
+    <dataRoot>\\<type> Data\\<Mon DD, YYYY>\\<type> at <hour>.csv
+
+with one csv per sensor type per hour, holding one row per minute, and one csv per recorded spike:
+
+    <dataRoot>\\<type> Data\\Spike Data\\<Mon DD, YYYY>\\ <type> Data at <HH>;<MM> .csv
+
+the writers in here are sinks for the IOWriter thread (see ioWriter.py). the acquisition side only builds the records
+they take (CsvRows and SpikeRows), which are snapshots that nothing changes after they are made.
+"""
+
+import csv
+import os
+import re
+import time
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+from timeBase import formatTimes
+
+dataRoot = 'C:\\Users\\Bentim\\Documents\\TEM Data'
+
+dayFormat = '%b %d, %Y'
+
+# the names of the two kinds of file, once closed they can also be compressed (see archiveRotation.py):
+# "Temp at 14.csv" -> ('Temp', '14', None), " Temp Data at 14;05 .csv.gz" -> ('Temp', '14', '05', '.gz')
+hourPattern = re.compile(r'^(\w+) at (\d{1,2})\.csv(\.gz|\.zst)?$')
+spikePattern = re.compile(r'^ ?(\w+) Data at (\d{2});(\d{2}) ?\.csv(\.gz|\.zst)?$')
+
+
+def hourlyFolder(type: str, now: datetime, root: str = dataRoot):
+    """
+    the folder the hourly files of a sensor type go in for the day of "now"
+    """
+    return os.path.join(root, '%s Data' %type, now.strftime(dayFormat))
+
+
+def hourlyPath(type: str, now: datetime, root: str = dataRoot):
+    """
+    the hourly file of a sensor type for the hour of "now"
+    """
+    return os.path.join(hourlyFolder(type, now, root), '%s at %s.csv' %(type, now.hour))
+
+
+def spikePath(type: str, now: datetime, root: str = dataRoot):
+    """
+    the file a spike of a sensor type recorded at "now" goes in
+    """
+    folder = os.path.join(root, '%s Data' %type, 'Spike Data', now.strftime(dayFormat))
+    return os.path.join(folder, ' %s Data at %s;%s .csv' %(type, now.strftime('%H'), now.strftime('%M')))
+
+
+# rows of an hourly file that haven't been written yet. "first" is the position of the first of them in the hour's
+# file lists, a batch starting at 0 for a file that already has rows means the file should be written again from the top
+CsvRows = namedtuple('CsvRows', ['now', 'header', 'rows', 'first'])
+
+# a recorded spike, "columns" is a dictionary of copied arrays with one entry per sensor plus the time
+SpikeRows = namedtuple('SpikeRows', ['type', 'now', 'columns'])
+
+
+class FileListTracker():
+
+    """
+    Runs on the acquisition side and turns the file lists of one sensor type into CsvRows batches for HourlyCsvWriter.
+
+    it remembers how many rows of the file lists have already been sent, so each call only copies the rows added since
+    the last one (normally none, or one at the start of a minute). when the lists are emptied for a new hour it starts
+    counting from 0 again. rows only count as sent once the writer has taken them (see submit), when its queue is full
+    they stay "pending" and are offered again on the next call.
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.header = None
+        self.pending = False
+
+    def newRows(self, fileList: dict, now: datetime):
+        """
+        returns a CsvRows of the rows not sent yet, or None if there are none. the rows still count as not sent until
+        markSent is called with the batch
+        """
+        columns = list(fileList.values())
+        rows = min(len(column) for column in columns) if columns else 0
+
+        # the file lists were emptied for a new hour
+        if rows < self.sent:
+            self.sent = 0
+
+        # a column was added part way through the hour, everything is sent again so the file can be rewritten
+        header = tuple(fileList.keys())
+        if header != self.header:
+            self.header = header
+            self.sent = 0
+
+        if rows == self.sent:
+            return None
+
+        batch = CsvRows(now, header, tuple(zip(*(column[self.sent:rows] for column in columns))), self.sent)
+        return batch
+
+    def markSent(self, batch: CsvRows):
+        self.sent = batch.first + len(batch.rows)
+
+    def submit(self, writer, name: str, fileList: dict, now: datetime):
+        """
+        queues the rows not sent yet on "writer" for the sink "name". if the writer's queue is full the rows are kept
+        as not sent and "pending" is set, so the caller knows to try again next tick. returns True if a batch was queued
+        """
+        batch = self.newRows(fileList, now)
+        if batch is None:
+            self.pending = False
+            return False
+        if not writer.submit(name, batch):
+            self.pending = True
+            return False
+        self.markSent(batch)
+        self.pending = False
+        return True
+
+
+class HourlyCsvWriter():
+
+    """
+    Writes CsvRows batches of one sensor type to its hourly csv file.
+
+    instead of rewriting the whole file every tick the writer keeps the current hour's file open and only appends the
+    rows in each batch, which are just the rows that are new.
+
+    when the hour (or day) changes the file is closed and the next one is opened. rows are flushed to disk at most
+    every "flushInterval" seconds, and always when the file is rotated or closed.
+    """
+
+    def __init__(self, type: str, root: str = dataRoot, flushInterval: float = 60):
+        self.type = type
+        self.root = root
+        self.flushInterval = flushInterval
+
+        self.file = None
+        self.writer = None
+        self.path = None
+        self.header = None
+        self.rowsWritten = 0
+        self.lastFlush = time.monotonic()
+
+    def write(self, batch: CsvRows):
+        """
+        appends the rows of "batch" to the file for the hour of batch.now
+        """
+        path = hourlyPath(self.type, batch.now, self.root)
+        if path != self.path:
+            self.rotate(path)
+
+        if batch.first == 0 and self.rowsWritten:
+            self.file.seek(0)
+            self.file.truncate()
+            self.header = None
+            self.rowsWritten = 0
+
+        header = list(batch.header)
+        if header != self.header:
+            if self.file.tell() == 0:
+                self.writer.writerow(header)
+            self.header = header
+
+        self.writer.writerows(batch.rows)
+        self.rowsWritten += len(batch.rows)
+
+        if time.monotonic() - self.lastFlush >= self.flushInterval:
+            self.flush()
+
+    def rotate(self, path: str):
+        """
+        closes the current file and opens "path", creating its folder if needed. if the file already exists (the
+        program was restarted part way through an hour) new rows are added to the end of it.
+        """
+        self.close()
+
+        folder = os.path.dirname(path)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        self.file = open(path, 'a', newline='')
+        self.writer = csv.writer(self.file)
+        self.path = path
+        self.header = None
+        self.rowsWritten = 0
+
+        # an existing file already has its header
+        if self.file.tell() > 0:
+            with open(path, newline='') as existing:
+                self.header = next(csv.reader(existing), None)
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+        self.lastFlush = time.monotonic()
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+            self.writer = None
+            self.path = None
+
+
+class SpikeCsvWriter():
+
+    """
+    Writes each SpikeRows record to its own csv file in the spike folder of its sensor type
+    """
+
+    def __init__(self, root: str = dataRoot):
+        self.root = root
+
+    def write(self, spike: SpikeRows):
+        path = spikePath(spike.type, spike.now, self.root)
+        folder = os.path.dirname(path)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        # the 'Time' column comes in as nanoseconds since the epoch and is only formatted here
+        columns = dict(spike.columns)
+        if 'Time' in columns and np.asarray(columns['Time']).dtype.kind in 'iu':
+            columns['Time'] = formatTimes(columns['Time'])
+
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(list(columns.keys()))
+            writer.writerows(zip(*(list(column) for column in columns.values())))
+
+        print('Spike has been recorded')
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,171 @@
+"""
+Min/max decimation of the plotted data, so drawing a curve costs about the same whatever the time window.
+
+a plot can't show more than one value per pixel column anyway, so instead of passing every sample to setData the
+samples that land in each column are reduced to their minimum and maximum, and the curve draws a vertical stroke between
+the two. spikes and dips still show up at any zoom level (which plotting every n'th sample would lose), and setData
+never gets more than two points per pixel.
+
+reducing the raw samples still means looking at all of them every frame, so a MinMaxPyramid also keeps coarser copies of
+the history: level 0 holds the min and max of every "factor" samples, level 1 of every factor**2 samples and so on. the
+levels are updated with only the samples that arrived since the last frame, and a long window is drawn from the coarsest
+level that still has at least one block per pixel column.
+"""
+
+import numpy as np
+from ringBuffer import RingBuffer, alignedViews
+
+
+def minMaxEnvelope(x, yMin, yMax, xMin: float, xMax: float, columns: int):
+    """
+    reduces the points with "x" between "xMin" and "xMax" to at most "columns" pixel columns, and returns the x and y of
+    the envelope as new arrays: two points per column, at the column's first x, going from the lowest to the highest
+    value in it. "x" has to be sorted. "yMin" and "yMax" are the lowest and highest value at each x (for raw samples
+    they are the same array). one point either side of the range is kept so the curve runs to the edges of the plot.
+    """
+    columns = max(1, int(columns))
+    raw = yMin is yMax
+
+    start = max(0, int(np.searchsorted(x, xMin, 'left')) - 1)
+    stop = min(len(x), int(np.searchsorted(x, xMax, 'right')) + 1)
+    x = x[start:stop]
+    yMin = yMin[start:stop]
+    yMax = yMax[start:stop]
+
+    # already no more points than the envelope would have
+    if raw and len(x) <= 2*columns:
+        return np.array(x), np.array(yMin)
+    if not raw and len(x) <= columns:
+        return np.repeat(x, 2), np.column_stack((yMin, yMax)).ravel()
+
+    # index of the first point in every column, columns without any points are left out
+    edges = np.linspace(x[0], x[-1], columns + 1)[:-1]
+    first = np.unique(np.searchsorted(x, edges))
+    first = first[first < len(x)]
+
+    # fmin/fmax skip NaNs (skipped stream samples) unless the whole column is NaN
+    low = np.fmin.reduceat(yMin, first)
+    high = np.fmax.reduceat(yMax, first)
+    return np.repeat(x[first], 2), np.column_stack((low, high)).ravel()
+
+
+def minMaxDecimate(x, y, xMin: float, xMax: float, columns: int):
+    """
+    min/max envelope of raw samples, see minMaxEnvelope
+    """
+    return minMaxEnvelope(x, y, y, xMin, xMax, columns)
+
+
+class PyramidLevel():
+
+    """
+    One level of a MinMaxPyramid: the first x, lowest and highest value of every block of "blockSize" raw samples,
+    plus the points of the next block that isn't complete yet.
+    """
+
+    def __init__(self, capacity: int, blockSize: int, dtype):
+        self.blockSize = blockSize
+        self.x = RingBuffer(capacity, dtype)
+        self.low = RingBuffer(capacity)
+        self.high = RingBuffer(capacity)
+        self.pending = (np.zeros(0, dtype), np.zeros(0), np.zeros(0))
+
+    def add(self, x, low, high, factor: int):
+        """
+        adds points from the level below and returns the blocks that were completed, to be added to the level above
+        """
+        x = np.concatenate((self.pending[0], x))
+        low = np.concatenate((self.pending[1], low))
+        high = np.concatenate((self.pending[2], high))
+
+        full = len(x) - len(x) % factor
+        self.pending = (x[full:], low[full:], high[full:])
+
+        blockX = x[:full:factor]
+        blockLow = np.fmin.reduce(low[:full].reshape(-1, factor), axis=1)
+        blockHigh = np.fmax.reduce(high[:full].reshape(-1, factor), axis=1)
+        self.x.extend(blockX)
+        self.low.extend(blockLow)
+        self.high.extend(blockHigh)
+        return blockX, blockLow, blockHigh
+
+
+class MinMaxPyramid():
+
+    """
+    Incrementally updated min/max levels of one curve, built from a time buffer and a data buffer that are appended to
+    together. every level covers about the same stretch of time as the buffers, so the oldest blocks drop off as the
+    oldest samples do.
+
+    decimate() is what the plotting calls every frame: it folds in the new samples and returns the envelope of the
+    visible range, ready for setData.
+    """
+
+    def __init__(self, capacity: int, factor: int = 8, levels: int = 4):
+        self.capacity = int(capacity)
+        self.factor = factor
+        self.nLevels = levels
+        self.generation = None
+        self.levels = []
+        self.total = 0
+
+    def reset(self, xData: RingBuffer):
+        self.levels = []
+        blockSize = 1
+        for level in range(self.nLevels):
+            blockSize *= self.factor
+            size = self.capacity//blockSize
+            if size < 2:
+                break
+            self.levels.append(PyramidLevel(size, blockSize, xData.data.dtype))
+        self.total = 0
+
+    def update(self, xData: RingBuffer, yData: RingBuffer):
+        """
+        folds the samples added to the buffers since the last update into the levels. if the buffers were cleared in
+        the meantime the levels are rebuilt from what is in them now.
+        """
+        generation = (xData.generation, yData.generation)
+        if generation != self.generation:
+            self.generation = generation
+            self.reset(xData)
+
+        x, y = alignedViews(xData, yData)
+        stop = min(xData.total, yData.total)
+        new = min(stop - self.total, len(x))
+        self.total = stop
+        if new <= 0:
+            return
+
+        x = x[len(x) - new:]
+        low = high = y[len(y) - new:]
+        for level in self.levels:
+            x, low, high = level.add(x, low, high, self.factor)
+            if len(x) == 0:
+                break
+
+    def decimate(self, xData: RingBuffer, yData: RingBuffer, xMin: float, xMax: float, columns: int):
+        """
+        returns the x and y to plot for the range "xMin" to "xMax" on a plot "columns" pixels wide
+        """
+        self.update(xData, yData)
+        x, y = alignedViews(xData, yData)
+
+        start = int(np.searchsorted(x, xMin, 'left'))
+        stop = int(np.searchsorted(x, xMax, 'right'))
+        visible = stop - start
+
+        # the coarsest level that still has a block for every pixel column in the visible range
+        for level in reversed(self.levels):
+            if visible//level.blockSize < columns or len(level.x) == 0:
+                continue
+
+            # the level only has complete blocks, the newest samples after the last one are added on from the raw data
+            covered = int(np.searchsorted(x, level.x[-1], 'right'))
+            covered = min(len(x), covered - 1 + level.blockSize)
+            levelX = np.concatenate((level.x.view(), x[covered:]))
+            levelLow = np.concatenate((level.low.view(), y[covered:]))
+            levelHigh = np.concatenate((level.high.view(), y[covered:]))
+            return minMaxEnvelope(levelX, levelLow, levelHigh, xMin, xMax, columns)
+
+        return minMaxDecimate(x, y, xMin, xMax, columns)
@@ -0,0 +1,320 @@
+"""
+Several T7s read as if they were one.
+
+the DAQ talks to a single device through its backend (the ljm module). a DevicePool is a backend too, so the DAQ and
+the GUI don't change at all, but behind it every device has its own handle and is read on its own thread at the same
+time as the others:
+
+    pool = DevicePool(['470012345', '192.168.1.40'])
+    daq = DAQ(backend=pool)
+    # the T7 at 192.168.1.40 is serial 470012346
+    daq.readAll(['T7#470012345:AIN0', 'T7#470012346:AIN3'])
+
+every input is named after its device, "T7#<serial>:<input>", so the channels of all the devices share one namespace
+and the ring buffers, file columns and spike files all use those names. a name without a device ('AIN0') is allowed
+when the pool only has one device.
+
+lining the devices up in time:
+
+    command/response    all the devices are read at once and the DAQ stamps the whole read with the middle of it,
+                        so every channel of a tick has the same time. how far apart the devices' own reads were is
+                        kept in "skew"
+    stream              each device streams on its own clock at the same scan rate. they can't be started at exactly
+                        the same moment, so the scans a device took before the last one started are dropped, and
+                        after that scan n of every device is merged into scan n of the pool. eStreamRead only hands
+                        back the scans every device has reached
+
+devices are opened by serial number or IP address (anything openS takes as an identifier), a Device can also be given
+directly, for example one with its own simulated backend (see simulatedT7.py).
+"""
+
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+try:
+    from labjack import ljm
+except ImportError:
+    ljm = None
+
+# "T7#470012345:AIN0" -> ('T7#470012345', 'AIN0')
+channelPattern = re.compile(r'^(T7#[^:]+):(.+)$')
+ipPattern = re.compile(r'^\d{1,3}(\.\d{1,3}){3}$')
+
+
+def channelName(device: str, name: str):
+    return '%s:%s' %(device, name)
+
+
+def splitChannel(channel: str):
+    """
+    returns (device, input) of a channel name, device is None if the name doesn't have one
+    """
+    match = channelPattern.match(channel)
+    if match is None:
+        return None, channel
+    return match.group(1), match.group(2)
+
+
+class Device():
+
+    """
+    One T7 in the pool. "identifier" is its serial number or IP address, "backend" the ljm module (or a stand in) it
+    is opened with. it is named "T7#<serial>" once opened, "name" overrides that.
+    """
+
+    def __init__(self, identifier, backend=None, connectionType: str = None, name: str = None):
+        self.identifier = str(identifier)
+        self.ljm = backend if backend is not None else ljm
+        if self.ljm is None:
+            raise ImportError('the LabJack LJM library (labjack-ljm) is not installed')
+        if connectionType is None:
+            connectionType = 'ETHERNET' if ipPattern.match(self.identifier) else 'ANY'
+        self.connectionType = connectionType
+        self.name = name
+        self.handle = None
+
+        # stream state, see DevicePool.eStreamStart
+        self.streamNames = []
+        self.startNs = 0
+        self.skip = 0
+        self.pending = None
+
+    def open(self):
+        if self.handle is not None:
+            return
+        self.handle = self.ljm.openS('T7', self.connectionType, self.identifier)
+        if self.name is None:
+            serial = int(self.ljm.eReadName(self.handle, 'SERIAL_NUMBER'))
+            self.name = 'T7#%s' %(serial if serial > 0 else self.identifier)
+
+    def close(self):
+        if self.handle is not None:
+            self.ljm.close(self.handle)
+            self.handle = None
+
+    def read(self, names: list):
+        """
+        reads "names" (inputs of this device) in one eReadNames call, returns the values and the monotonic time in
+        the middle of the read
+        """
+        start = time.monotonic_ns()
+        values = self.ljm.eReadNames(self.handle, len(names), names)
+        return values, (start + time.monotonic_ns())//2
+
+
+class DevicePool():
+
+    """
+    Stands in for the ljm module in front of several devices, see the top of this file. "devices" is a list of
+    identifiers or Device objects.
+    """
+
+    def __init__(self, devices: list, backend=None):
+        self.devices = [device if isinstance(device, Device) else Device(device, backend) for device in devices]
+        if not self.devices:
+            raise ValueError('a device pool needs at least one device')
+        self.byName = {}
+        self.executor = None
+
+        # how far apart in time the devices' reads of the last tick were, in nanoseconds
+        self.skew = 0
+        self.maxSkew = 0
+
+        # stream mode: the pool's scan list as (device, input), the devices streaming and the rate they were started at
+        self.streamChannels = []
+        self.streaming = []
+        self.scanRate = None
+
+        self.LJMError = getattr(self.devices[0].ljm, 'LJMError', Exception)
+
+    #########################
+    # devices
+    #########################
+
+    def openS(self, deviceType: str = 'T7', connectionType: str = 'ANY', identifier: str = 'ANY'):
+        """
+        opens every device, the arguments are only there so the DAQ can call this like ljm.openS
+        """
+        for device in self.devices:
+            device.open()
+        self.byName = {device.name: device for device in self.devices}
+        if len(self.byName) != len(self.devices):
+            raise ValueError('two devices in the pool have the same name: %s' %[device.name for device in self.devices])
+        if self.executor is None and len(self.devices) > 1:
+            self.executor = ThreadPoolExecutor(len(self.devices), thread_name_prefix='DevicePool')
+        return 0
+
+    def close(self, handle: int = 0):
+        self.eStreamStop(handle)
+        for device in self.devices:
+            device.close()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def locate(self, channel: str):
+        """
+        returns the Device a channel is on and its input name on that device
+        """
+        device, name = splitChannel(channel)
+        if device is None:
+            if len(self.devices) > 1:
+                raise ValueError('%s does not say which device it is on, use a name like T7#<serial>:%s' %(channel, channel))
+            return self.devices[0], name
+
+        target = self.byName.get(device)
+        if target is None:
+            raise ValueError('%s is not in the device pool (%s)' %(device, ', '.join(self.byName)))
+        return target, name
+
+    def channels(self, names: list):
+        """
+        splits a list of channels up by device: {Device: [(position in names, input), ...]}
+        """
+        groups = {}
+        for position, channel in enumerate(names):
+            device, name = self.locate(channel)
+            groups.setdefault(device, []).append((position, name))
+        return groups
+
+    def parallel(self, function, items: list):
+        """
+        runs function(item) for every item, each on its own thread when there are several, and returns the results in order
+        """
+        if self.executor is None or len(items) < 2:
+            return [function(item) for item in items]
+        return list(self.executor.map(function, items))
+
+    #########################
+    # command/response
+    #########################
+
+    def eReadName(self, handle: int, name: str):
+        return self.eReadNames(handle, 1, [name])[0]
+
+    def eReadNames(self, handle: int, numFrames: int, names: list):
+        """
+        reads every device's inputs at the same time and returns the values in the order of "names"
+        """
+        groups = list(self.channels(names[:numFrames]).items())
+        results = self.parallel(lambda group: group[0].read([name for position, name in group[1]]), groups)
+
+        values = [0.0]*numFrames
+        stamps = []
+        for (device, group), (read, stamp) in zip(groups, results):
+            for (position, name), value in zip(group, read):
+                values[position] = value
+            stamps.append(stamp)
+
+        self.skew = max(stamps) - min(stamps)
+        if self.skew > self.maxSkew:
+            self.maxSkew = self.skew
+        return values
+
+    def eWriteName(self, handle: int, name: str, value: float):
+        self.eWriteNames(handle, 1, [name], [value])
+
+    def eWriteNames(self, handle: int, numFrames: int, names: list, values: list):
+        """
+        writes each name to its device. names without a device (like 'STREAM_SETTLING_US') go to every device
+        """
+        writes = {device: ([], []) for device in self.devices}
+        for channel, value in zip(names[:numFrames], values[:numFrames]):
+            if splitChannel(channel)[0] is None:
+                targets, name = self.devices, channel
+            else:
+                device, name = self.locate(channel)
+                targets = [device]
+            for target in targets:
+                writes[target][0].append(name)
+                writes[target][1].append(value)
+
+        def write(item):
+            device, (names, values) = item
+            if names:
+                device.ljm.eWriteNames(device.handle, len(names), names, values)
+        self.parallel(write, list(writes.items()))
+
+    def namesToAddresses(self, numFrames: int, names: list):
+        """
+        the pool's stream "addresses" are positions in its own scan list, each device is given its part of the scan
+        list by eStreamStart
+        """
+        self.streamChannels = [self.locate(channel) for channel in names[:numFrames]]
+        return list(range(len(self.streamChannels))), [3]*len(self.streamChannels)
+
+    #########################
+    # stream
+    #########################
+
+    def eStreamStart(self, handle: int, scansPerRead: int, numAddresses: int, scanList: list, scanRate: float):
+        """
+        starts every device that has a channel in the scan list streaming at "scanRate"
+        """
+        channels = [self.streamChannels[address] for address in scanList[:numAddresses]]
+        streaming = []
+        for device in self.devices:
+            device.streamNames = [name for owner, name in channels if owner is device]
+            device.pending = None
+            if device.streamNames:
+                streaming.append(device)
+        # where each channel of the pool's scan ends up: (device, column in that device's scans)
+        self.streamOrder = [(device, device.streamNames.index(name)) for device, name in channels]
+
+        def start(device):
+            addresses = device.ljm.namesToAddresses(len(device.streamNames), device.streamNames)[0]
+            rate = device.ljm.eStreamStart(device.handle, scansPerRead, len(device.streamNames), addresses, scanRate)
+            device.startNs = time.monotonic_ns()
+            return rate
+        rates = self.parallel(start, streaming)
+
+        self.streaming = streaming
+        self.scanRate = rates[0]
+        if max(rates) - min(rates) > 1e-6*self.scanRate:
+            print('DevicePool: the devices are streaming at different rates %s, they will drift apart' %rates)
+
+        # scans taken before the last device started are dropped so scan n lines up on every device
+        last = max(device.startNs for device in streaming)
+        for device in streaming:
+            device.skip = int(round((last - device.startNs)/1e9*self.scanRate))
+        return self.scanRate
+
+    def eStreamRead(self, handle: int):
+        """
+        reads one block from every device at the same time and returns the scans all of them have reached, merged
+        into the pool's scan list and interleaved like eStreamRead does. the backlogs are the largest of any device
+        """
+        def read(device):
+            data, deviceBacklog, ljmBacklog = device.ljm.eStreamRead(device.handle)
+            return np.asarray(data, dtype=np.float64).reshape(-1, len(device.streamNames)), deviceBacklog, ljmBacklog
+        results = self.parallel(read, self.streaming)
+
+        deviceBacklog = ljmBacklog = 0
+        for device, (block, deviceLag, ljmLag) in zip(self.streaming, results):
+            if device.skip:
+                dropped = min(device.skip, len(block))
+                block = block[dropped:]
+                device.skip -= dropped
+            device.pending = block if device.pending is None else np.concatenate((device.pending, block))
+            deviceBacklog = max(deviceBacklog, deviceLag)
+            ljmBacklog = max(ljmBacklog, ljmLag)
+
+        scans = min(len(device.pending) for device in self.streaming)
+        merged = np.empty((scans, len(self.streamOrder)))
+        for column, (device, index) in enumerate(self.streamOrder):
+            merged[:, column] = device.pending[:scans, index]
+        for device in self.streaming:
+            device.pending = device.pending[scans:]
+
+        # the scans one device is ahead of the slowest count as backlog too
+        ahead = max(len(device.pending) for device in self.streaming)
+        return merged.ravel().tolist(), deviceBacklog, ljmBacklog + ahead
+
+    def eStreamStop(self, handle: int = 0):
+        streaming = self.streaming
+        self.streaming = []
+        for device in streaming:
+            device.ljm.eStreamStop(device.handle)
+            device.pending = None
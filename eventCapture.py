@@ -0,0 +1,129 @@
+"""
+Captures the data around a spike: a window from before the trigger and a window after it.
+
+the old way started a Timer that copied the spike buffers a minute later, on another thread, while the acquisition
+was still appending to them. here everything happens on the acquisition thread, in the same call that adds the samples:
+
+ - when a spike is found, the last "pre" seconds are copied out of the history buffers straight away, into arrays big
+   enough for the whole event, so the history carrying on can't change them
+ - every sample after that is written into the same arrays until "post" seconds have been collected
+ - the finished event is handed to the IOWriter as a SpikeRows record (views of those arrays, nothing is copied
+   again) and written to its spike file on the writer thread
+
+if another spike of the same sensor type (on the same or another channel) comes in while an event is still collecting,
+it is added to that event instead of starting a second one, and the post window is stretched so it covers "post"
+seconds after the newest spike too, up to "maxPost" seconds in all.
+"""
+
+from datetime import datetime
+import numpy as np
+from ringBuffer import samplesIn
+from dataFiles import SpikeRows
+
+
+class SpikeCapture():
+
+    """
+    One event being collected: arrays for the time and every channel, the spikes that belong to it and how far along
+    the post trigger window it is. the channels are the rows of one 2D array, "columns" has a view of each row.
+    """
+
+    def __init__(self, events: list, now: datetime, length: int):
+        self.events = list(events)
+        self.now = now
+        self.columns = {}
+        self.values = None
+        self.length = length
+        self.filled = 0
+        self.end = 0
+
+    def channels(self):
+        return sorted(set(event.channel for event in self.events))
+
+
+class EventCapture():
+
+    """
+    The event capture of one sensor type. "period" is how often samples come in, which sets how many samples the pre
+    and post windows hold. finished events are submitted to "writer" under "sinkName".
+    """
+
+    def __init__(self, type: str, AIN: list, period: float, writer, pre: float = 60, post: float = 60, maxPost: float = None, sinkName: str = 'Spike'):
+        self.type = type
+        self.AIN = list(AIN)
+        self.writer = writer
+        self.sinkName = sinkName
+
+        self.preSamples = samplesIn(pre, period)
+        self.postSamples = samplesIn(post, period)
+        self.maxPostSamples = max(self.postSamples, samplesIn(maxPost, period) if maxPost is not None else 10*self.postSamples)
+
+        self.active = None
+        self.captured = 0
+
+    def append(self, stamp: int, values):
+        """
+        adds the newest sample to the event being collected, if there is one. "stamp" is nanoseconds since the epoch
+        and "values" has one value per input in AIN. call this before trigger for the same sample.
+        """
+        capture = self.active
+        if capture is None:
+            return
+
+        row = capture.filled
+        capture.columns['Time'][row] = stamp
+        capture.values[:, row] = values
+        capture.filled += 1
+
+        if capture.filled >= capture.end:
+            self.finish()
+
+    def trigger(self, events: list, timeData, Data: dict, epochNs, now: datetime, skip: int = 0):
+        """
+        starts an event for the spikes in "events", or adds them to the one being collected. "timeData" and "Data" are
+        the history buffers (already holding the sample that set the spike off), "epochNs" turns the times in timeData
+        into nanoseconds since the epoch and "now" is the wall clock time of the spike. "skip" is how many samples in
+        the buffers came after the one that set the spike off (a block of scans goes into the buffers before it is
+        checked), they are left out of the pre window and added with append like any other sample after the spike.
+        """
+        capture = self.active
+        if capture is not None:
+            capture.events.extend(events)
+            capture.end = min(capture.length, max(capture.end, capture.filled + self.postSamples))
+            return
+
+        # the newest samples every buffer has, in case one was cleared while the others kept going
+        pre = max(0, min([self.preSamples, len(timeData) - skip] + [len(Data[sensor]) - skip for sensor in self.AIN]))
+        length = pre + self.maxPostSamples
+
+        capture = SpikeCapture(events, now, length)
+        capture.values = np.empty((len(self.AIN), length))
+        for row, sensor in enumerate(self.AIN):
+            capture.columns[sensor] = capture.values[row]
+            capture.columns[sensor][:pre] = Data[sensor].tail(pre + skip)[:pre]
+        capture.columns['Time'] = np.empty(length, dtype=np.int64)
+        capture.columns['Time'][:pre] = epochNs(timeData.tail(pre + skip)[:pre])
+
+        capture.filled = pre
+        capture.end = pre + self.postSamples
+        self.active = capture
+
+    def finish(self):
+        """
+        hands the event being collected to the writer, cut down to the samples collected so far
+        """
+        capture = self.active
+        if capture is None:
+            return
+        self.active = None
+        self.captured += 1
+
+        columns = {name: column[:capture.filled] for name, column in capture.columns.items()}
+        print('%s spike on %s recorded' %(self.type, ', '.join(capture.channels())))
+        self.writer.submit(self.sinkName, SpikeRows(self.type, capture.now, columns))
+
+    def close(self):
+        """
+        writes out an event that is still collecting, for when the run is stopped
+        """
+        self.finish()
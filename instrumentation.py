@@ -0,0 +1,209 @@
+"""
+Timing of each stage of the hot path, so when the display stutters it is clear where the time went.
+
+the stages are:
+
+    acquire     - reading the device (eReadNames / eStreamRead)
+    convert     - turning voltages into temperature, pressure and field strength, each sensor type's columns at once
+    buffer      - adding the scan to the bank's ring buffers and the staging block for the raw archive and tiered
+                  history, and in a stream block the minute rows summed up from the buffers (ChannelPipeline's
+                  aggregate step, which in command/response mode runs before the tick's stages, once a minute)
+    detect      - the detector banks and spike capture
+    persist     - handing rows to the writer thread
+    plot        - redrawing the graph on the GUI thread
+    write       - the writer thread writing a record to disk, off the hot path but the first place to look when the
+                  writer's queue fills up
+
+each stage's times go into a LatencyHistogram: a log-linear histogram like HdrHistogram, with 16 buckets for every
+power of two, so every time is kept to within about 6% whatever its size (a 2 us conversion and a 50 ms disk write
+alike). recording is a couple of integer operations and one list increment, and percentiles are read off the bucket
+counts whenever the stats panel asks for them.
+
+timing is off until enabled. a stage is timed like this:
+
+    start = profiler.start()
+    ... the work ...
+    profiler.stop('convert', start, samples)
+
+when the profiler is off start() returns 0 and stop() returns straight away, so the only cost is the two calls.
+"""
+
+import json
+import time
+from time import perf_counter_ns
+from threading import Lock
+
+
+class LatencyHistogram():
+
+    """
+    Log-linear histogram of nanosecond times. "subBits" sets the precision: 2**(subBits-1) buckets per power of two.
+    """
+
+    def __init__(self, subBits: int = 5):
+        self.subBits = subBits
+        self.half = 1 << (subBits - 1)
+        # enough buckets for anything up to 2**63 ns
+        self.counts = [0]*(64*self.half + self.half)
+        self.reset()
+
+    def reset(self):
+        self.counts = [0]*len(self.counts)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.items = 0
+        self.first = None
+        self.last = None
+
+    def index(self, value: int):
+        shift = value.bit_length() - self.subBits
+        if shift <= 0:
+            return value
+        return shift*self.half + (value >> shift)
+
+    def value(self, index: int):
+        """
+        the smallest time that goes in bucket "index"
+        """
+        if index < 2*self.half:
+            return index
+        shift = index//self.half - 1
+        return (index - shift*self.half) << shift
+
+    def record(self, value: int, items: int = 1, now: int = None):
+        """
+        adds one time, in nanoseconds. "items" is how many samples (or rows, ...) it covered, for the throughput.
+        "now" is when the time ended (perf_counter_ns), needed for the throughput
+        """
+        if value < 0:
+            value = 0
+        # index() written out, this runs for every stage of every tick
+        shift = value.bit_length() - self.subBits
+        self.counts[value if shift <= 0 else shift*self.half + (value >> shift)] += 1
+        self.count += 1
+        self.total += value
+        self.items += items
+        if value > self.max:
+            self.max = value
+
+        if now is not None:
+            if self.first is None:
+                self.first = now - value
+            self.last = now
+
+    def percentile(self, percent: float):
+        """
+        the time "percent" of the recorded times are at or under, in nanoseconds (the middle of its bucket)
+        """
+        if self.count == 0:
+            return 0
+        target = max(1, int(round(self.count*percent/100)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                low = self.value(index)
+                high = self.value(index + 1)
+                return min((low + high)//2, self.max)
+        return self.max
+
+    def throughput(self):
+        """
+        items a second over the time the stage has been recording
+        """
+        if self.first is None or self.last <= self.first:
+            return 0.0
+        return self.items/((self.last - self.first)/1e9)
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'p50Us': self.percentile(50)/1e3,
+            'p90Us': self.percentile(90)/1e3,
+            'p99Us': self.percentile(99)/1e3,
+            'p999Us': self.percentile(99.9)/1e3,
+            'maxUs': self.max/1e3,
+            'meanUs': self.total/self.count/1e3 if self.count else 0.0,
+            'perSecond': self.throughput(),
+            'busyFraction': self.total/(self.last - self.first) if self.first is not None and self.last > self.first else 0.0,
+        }
+
+
+class Profiler():
+
+    """
+    A LatencyHistogram per stage, see the top of this file
+    """
+
+    stages = ('acquire', 'convert', 'buffer', 'detect', 'persist', 'plot', 'write')
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.lock = Lock()
+        self.histograms = {}
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def start(self):
+        if not self.enabled:
+            return 0
+        return perf_counter_ns()
+
+    def stop(self, stage: str, start: int, items: int = 1):
+        """
+        records the time since "start" (from start()) against "stage"
+        """
+        if not start:
+            return
+        now = perf_counter_ns()
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(stage, LatencyHistogram())
+        histogram.record(now - start, items, now)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+
+    def summary(self):
+        """
+        the percentiles and throughput of every stage, by name, in pipeline order
+        """
+        with self.lock:
+            histograms = dict(self.histograms)
+        order = list(self.stages) + sorted(set(histograms) - set(self.stages))
+        return {stage: histograms[stage].summary() for stage in order if stage in histograms}
+
+    def report(self):
+        """
+        the summary as text, one line per stage, for the stats panel
+        """
+        lines = ['%-8s %9s %9s %9s %12s' %('stage', 'p50 us', 'p99 us', 'max us', 'per second')]
+        for stage, stats in self.summary().items():
+            lines.append('%-8s %9.1f %9.1f %9.1f %12.1f' %(stage, stats['p50Us'], stats['p99Us'], stats['maxUs'], stats['perSecond']))
+        if len(lines) == 1:
+            lines.append('no timings yet' if self.enabled else 'profiling is off')
+        return '\n'.join(lines)
+
+    def export(self, path: str):
+        """
+        writes the summary, and the bucket counts of every stage so they can be merged or plotted later, to a json file
+        """
+        with self.lock:
+            histograms = dict(self.histograms)
+        data = {
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'stages': self.summary(),
+            'buckets': {stage: {'subBits': histogram.subBits,
+                                'counts': {str(histogram.value(index)): count for index, count in enumerate(histogram.counts) if count}}
+                        for stage, histogram in histograms.items()},
+        }
+        with open(path, 'w') as file:
+            json.dump(data, file, indent=2)
+
+
+# the profiler everything records to
+profiler = Profiler()
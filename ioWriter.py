@@ -0,0 +1,169 @@
+"""
+Background writer thread for everything that goes to disk.
+
+the acquisition side never touches a file. it only builds a record (a batch of rows that nothing else will change
+afterwards) and hands it to submit(), which puts it on a queue and returns straight away. a single writer thread takes
+records off the queue and passes each one to the sink it was addressed to.
+
+a sink is any object with these three methods:
+
+    write(record)       - writes one record
+    flush()             - pushes anything buffered to disk
+    close()             - flushes and closes its files
+
+the hourly csv writer, the spike writer and the raw archive are all sinks (see dataFiles.py and rawArchive.py), more
+can be added with addSink without the acquisition code changing.
+
+the queue has a fixed size. if the disk is so slow that it fills up, new records are dropped and counted instead of
+making the acquisition wait, the counts are in stats().
+"""
+
+import time
+from queue import Queue, Full
+from threading import Thread, Event, Lock
+from instrumentation import profiler
+
+# submitted in place of a record to close a sink and remove it, see closeSink
+closeRecord = object()
+
+
+class IOWriter(Thread):
+
+    def __init__(self, maxsize: int = 1000):
+        super().__init__(name='IOWriter', daemon=True)
+        self.queue = Queue(maxsize)
+        self.sinks = {}
+        self.running = True
+
+        # backpressure metrics, see stats()
+        self.statsLock = Lock()
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.maxDepth = 0
+        self.busy = 0.0
+
+    def addSink(self, name: str, sink):
+        """
+        registers a sink under "name", records submitted under that name are passed to its write method
+        """
+        self.sinks[name] = sink
+
+    def closeSink(self, name: str, timeout: float = 0.5):
+        """
+        closes the sink "name" on the writer thread once everything already submitted to it is written, and removes it.
+        if the queue is full this waits at most "timeout" seconds for room, returns False (and counts an error) if there
+        was none, the sink then stays open until close()
+        """
+        if not self.is_alive():
+            if name in self.sinks:
+                self.call(self.sinks.pop(name).close)
+            return True
+
+        try:
+            self.queue.put_nowait((name, closeRecord))
+        except Full:
+            try:
+                self.queue.put((name, closeRecord), timeout=timeout)
+            except Full:
+                with self.statsLock:
+                    self.errors += 1
+                print('IOWriter: could not close %s, the queue is full' %name)
+                return False
+        return True
+
+    def submit(self, name: str, record):
+        """
+        queues a record for the sink "name" without waiting. returns False if the queue was full and the record was dropped
+        """
+        try:
+            self.queue.put_nowait((name, record))
+        except Full:
+            with self.statsLock:
+                self.dropped += 1
+            return False
+
+        with self.statsLock:
+            self.submitted += 1
+            depth = self.queue.qsize()
+            if depth > self.maxDepth:
+                self.maxDepth = depth
+        return True
+
+    def run(self):
+        while True:
+            name, record = self.queue.get()
+            try:
+                if name is None:
+                    # flush request from flush(), "record" is the event to set once everything before it is written
+                    for sink in list(self.sinks.values()):
+                        self.call(sink.flush)
+                    record.set()
+                    if not self.running:
+                        return
+                elif record is closeRecord:
+                    if name in self.sinks:
+                        self.call(self.sinks.pop(name).close)
+                else:
+                    start = time.perf_counter()
+                    timer = profiler.start()
+                    if self.call(self.sinks[name].write, record):
+                        profiler.stop('write', timer)
+                        with self.statsLock:
+                            self.written += 1
+                            self.busy += time.perf_counter() - start
+            finally:
+                self.queue.task_done()
+
+    def call(self, function, *args):
+        """
+        runs a sink method, a sink that fails is reported but never stops the writer thread
+        """
+        try:
+            function(*args)
+            return True
+        except Exception as error:
+            with self.statsLock:
+                self.errors += 1
+            print('IOWriter: %s failed: %r' %(function, error))
+            return False
+
+    def flush(self, timeout: float = None):
+        """
+        waits until every record submitted so far has been written and all sinks flushed. returns False on timeout
+        """
+        if not self.is_alive():
+            return True
+
+        done = Event()
+        self.queue.put((None, done))
+        return done.wait(timeout)
+
+    def close(self, timeout: float = None):
+        """
+        writes out everything still queued, closes all the sinks and stops the thread
+        """
+        if self.is_alive():
+            self.running = False
+            self.flush(timeout)
+            self.join(timeout)
+
+        for sink in self.sinks.values():
+            self.call(sink.close)
+
+    def stats(self):
+        """
+        returns the backpressure metrics: how many records are waiting, the most that were ever waiting, how many were
+        submitted, written, dropped because the queue was full or failed in a sink, and how long the thread spent writing
+        """
+        with self.statsLock:
+            return {
+                'queued': self.queue.qsize(),
+                'maxDepth': self.maxDepth,
+                'submitted': self.submitted,
+                'written': self.written,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'busySeconds': self.busy,
+            }
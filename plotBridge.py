@@ -0,0 +1,107 @@
+"""
+Hands plot updates from the acquisition thread over to the GUI thread.
+
+Qt widgets (and the pyqtgraph plots drawn on them) may only be touched from the GUI thread, but the sensors are read on
+the scheduler thread. so instead of calling setData from there, the acquisition code publishes what it wants drawn to a
+PlotBridge, and a QTimer running on the GUI thread redraws at a fixed frame rate.
+
+everything published is kept by key and only the newest update for each key is kept, so if the sensors tick several
+times between two frames the curve still only gets one setData. that keeps the cost of redrawing tied to the frame rate
+instead of to how fast the data comes in.
+
+curves drawn with a viewport are also decimated to a min/max envelope with one stroke per pixel column (see
+decimation.py), so a long time window costs about as much to draw as a short one.
+"""
+
+from threading import Lock
+import numpy as np
+from decimation import MinMaxPyramid
+from ringBuffer import alignedViews
+from PyQt6.QtCore import QObject, QTimer
+
+
+class PlotBridge(QObject):
+
+    def __init__(self, fps: float = 20, parent=None, xScale: float = 1):
+        super().__init__(parent)
+        self.lock = Lock()
+
+        # the x buffers are divided by this to get the units on the plot, e.g. 1e9 for nanosecond stamps shown in seconds
+        self.xScale = xScale
+
+        # key -> (function, args), replaced every time something new is published under the same key
+        self.pending = {}
+
+        # curve -> its MinMaxPyramid, only touched on the GUI thread
+        self.pyramids = {}
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.render)
+        self.setFps(fps)
+
+    def setFps(self, fps: float):
+        """
+        sets how many times a second the plots are redrawn
+        """
+        self.fps = fps
+        self.timer.setInterval(max(1, int(1000/fps)))
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        """
+        stops redrawing and throws away anything that hasn't been drawn yet
+        """
+        self.timer.stop()
+        with self.lock:
+            self.pending.clear()
+
+    def publish(self, curve, xData, yData, viewport=None):
+        """
+        queues new data for a curve. "xData" and "yData" are ring buffers, they are only read when the frame is drawn so
+        publishing is just storing a reference. can be called from any thread. see setCurve for "viewport".
+        """
+        with self.lock:
+            self.pending[curve] = (self.setCurve, (curve, xData, yData, viewport))
+
+    def call(self, key, function, *args):
+        """
+        queues function(*args) to run on the GUI thread at the next frame, replacing anything else queued under "key".
+        can be called from any thread.
+        """
+        with self.lock:
+            self.pending[key] = (function, args)
+
+    def render(self):
+        """
+        runs on the GUI thread every frame and applies everything published since the last frame
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+
+        for function, args in pending.values():
+            function(*args)
+
+    def setCurve(self, curve, xData, yData, viewport=None):
+        """
+        sets a curve to the data in two ring buffers. "viewport" is (xMin, xMax, columns): the visible x range and how many
+        pixels wide the plot is, if given the curve is set to the min/max envelope of that range instead of every sample.
+        the buffers keep changing on the acquisition thread, so what is drawn is always a copy.
+        """
+        if viewport is None:
+            x, y = alignedViews(xData, yData)
+            curve.setData(x/self.xScale, np.array(y))
+            return
+
+        xMin, xMax, columns = viewport
+        if curve not in self.pyramids:
+            self.pyramids[curve] = MinMaxPyramid(yData.capacity)
+        x, y = self.pyramids[curve].decimate(xData, yData, xMin*self.xScale, xMax*self.xScale, columns)
+        curve.setData(x/self.xScale, y)
+
+    def forget(self, curve):
+        """
+        drops the decimation levels kept for a curve, for when it is cleared
+        """
+        self.pyramids.pop(curve, None)
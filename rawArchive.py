@@ -0,0 +1,234 @@
+"""
+Full rate archive of every converted sample, kept next to the minute averages in the csv files.
+
+each sensor type gets one file per hour:
+
+    <dataRoot>\\<type> Data\\Raw\\<Mon DD, YYYY>\\<type> raw at <hour>.npy
+
+the files are normal .npy files holding a structured array with one row per scan: a 'time' column (int64 nanoseconds
+since the epoch) and one float64 column per analog input. since the layout is fixed they can be opened without reading
+them into memory:
+
+    data = readRaw(path)                 # np.memmap, nothing is read until it is used
+    data['time'], data['AIN0']           # zero copy column views
+
+the header is rewritten with the new row count every time rows are written, so a file is always readable up to the
+last write even if the program stops without closing it.
+"""
+
+import os
+import struct
+import time
+from datetime import datetime
+import numpy as np
+from dataFiles import dataRoot
+
+
+def rawPath(type: str, now: datetime, root: str = dataRoot):
+    """
+    the raw archive file of a sensor type for the hour of "now"
+    """
+    return os.path.join(root, '%s Data' %type, 'Raw', now.strftime('%b %d, %Y'), '%s raw at %s.npy' %(type, now.hour))
+
+
+def readRaw(path: str):
+    """
+    opens a raw archive file as a read only memory map
+    """
+    return np.load(path, mmap_mode='r')
+
+
+class RawArchiveFile():
+
+    """
+    The file side of the raw archive: takes blocks of rows (structured arrays of the archive's dtype) and writes them to
+    the hourly file they belong in. this is a sink for the IOWriter thread, so all of the disk access happens there.
+    a block that runs over the end of the hour is split between the two files.
+    """
+
+    def __init__(self, type: str, dtype: np.dtype, root: str = dataRoot):
+        self.type = type
+        self.dtype = dtype
+        self.root = root
+
+        # the header is padded to a fixed size so it can be rewritten in place as the file grows
+        self.headerSize = len(self.header(10**18, 0)) + 1
+        self.headerSize += -self.headerSize % 64
+
+        self.file = None
+        self.path = None
+        self.rows = 0
+        self.hourEnd = 0
+
+    def header(self, rows: int, size: int = None):
+        """
+        builds a version 1.0 .npy header for "rows" rows of the archive's dtype, padded with spaces to "size" bytes
+        """
+        if size is None:
+            size = self.headerSize
+        text = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" %(np.lib.format.dtype_to_descr(self.dtype), rows)
+        text = text.ljust(size - 11) + '\n'
+        return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(text)) + text.encode('latin1')
+
+    def write(self, rows):
+        """
+        appends a block of rows and updates the row count in the header
+        """
+        stamps = rows['time']
+
+        start = 0
+        while start < len(rows):
+            if stamps[start] >= self.hourEnd:
+                self.rotate(int(stamps[start]))
+            stop = start + int(np.searchsorted(stamps[start:], self.hourEnd))
+
+            self.file.write(rows[start:stop].tobytes())
+            self.rows += stop - start
+            start = stop
+
+        if self.file is not None:
+            self.file.seek(0)
+            self.file.write(self.header(self.rows))
+            self.file.seek(0, 2)
+
+    def rotate(self, stamp: int):
+        """
+        closes the current file and opens the one for the hour "stamp" falls in
+        """
+        self.close()
+
+        now = datetime.fromtimestamp(stamp/1e9)
+        hourStart = now.replace(minute=0, second=0, microsecond=0)
+        self.hourEnd = int(hourStart.timestamp() + 3600)*10**9
+
+        path = rawPath(self.type, now, self.root)
+        folder = os.path.dirname(path)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        # picks up where an existing file for this hour left off, as long as it has the same columns
+        number = 1
+        while os.path.exists(path):
+            with open(path, 'rb') as existing:
+                try:
+                    version = np.lib.format.read_magic(existing)
+                    shape, fortranOrder, dtype = np.lib.format.read_array_header_1_0(existing)
+                    offset = existing.tell()
+                except ValueError:
+                    version, dtype, offset = None, None, None
+
+            if version == (1, 0) and dtype == self.dtype and offset == self.headerSize:
+                self.rows = shape[0]
+                self.file = open(path, 'r+b')
+                self.file.seek(self.headerSize + self.rows*self.dtype.itemsize)
+                self.file.truncate()
+                self.path = path
+                return
+            number += 1
+            path = rawPath(self.type, now, self.root)[:-4] + ' (%s).npy' %number
+
+        self.file = open(path, 'w+b')
+        self.rows = 0
+        self.file.write(self.header(0))
+        self.path = path
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.path = None
+            self.hourEnd = 0
+
+
+class RawArchive():
+
+    """
+    The acquisition side of the raw archive for one sensor type.
+
+    scans are copied into a preallocated structured array and only handed on when "flushSize" rows have built up or
+    "flushInterval" seconds have passed, so adding a scan is one array assignment. blocks of scans can be added with
+    extend, which buffers them the same way (or hands a block bigger than the buffer on in one go).
+
+    if an IOWriter is given the blocks are submitted to it and written on its thread, otherwise they are written
+    to the file straight away.
+    """
+
+    def __init__(self, type: str, AIN: list, writer=None, root: str = dataRoot, flushSize: int = 4096, flushInterval: float = 10):
+        self.type = type
+        self.AIN = list(AIN)
+        self.flushInterval = flushInterval
+
+        self.dtype = np.dtype([('time', '<i8')] + [(sensor, '<f8') for sensor in self.AIN])
+        self.buffer = np.zeros(flushSize, dtype=self.dtype)
+        self.pending = 0
+        self.lastFlush = time.monotonic()
+
+        self.sink = RawArchiveFile(type, self.dtype, root)
+        self.writer = writer
+        self.sinkName = 'Raw %s' %type
+        if writer is not None:
+            writer.addSink(self.sinkName, self.sink)
+
+    def output(self, rows):
+        if self.writer is not None:
+            self.writer.submit(self.sinkName, rows)
+        else:
+            self.sink.write(rows)
+
+    def append(self, stamp: int, values):
+        """
+        adds one scan, "stamp" is the time in nanoseconds since the epoch and "values" has one value per input in AIN
+        """
+        self.buffer[self.pending] = (stamp, *values)
+        self.pending += 1
+
+        if self.pending == len(self.buffer) or time.monotonic() - self.lastFlush >= self.flushInterval:
+            self.flush()
+
+    def extend(self, stamps, Data: dict):
+        """
+        adds a block of scans, "stamps" is an array of times in nanoseconds since the epoch and "Data" a dictionary with
+        an array for each input in AIN
+        """
+        n = len(stamps)
+        if n == 0:
+            return
+
+        # a block that fits is buffered with the scans from append, a bigger one is handed on by itself
+        if n <= len(self.buffer) - self.pending:
+            rows = self.buffer[self.pending:self.pending + n]
+            rows['time'] = stamps
+            for sensor in self.AIN:
+                rows[sensor] = Data[sensor]
+            self.pending += n
+            if self.pending == len(self.buffer) or time.monotonic() - self.lastFlush >= self.flushInterval:
+                self.flush()
+            return
+
+        self.flush()
+
+        block = np.empty(len(stamps), dtype=self.dtype)
+        block['time'] = stamps
+        for sensor in self.AIN:
+            block[sensor] = Data[sensor]
+        self.output(block)
+
+    def flush(self):
+        """
+        hands the buffered scans on, as a copy since the buffer is reused for the next scans
+        """
+        if self.pending:
+            self.output(self.buffer[:self.pending].copy())
+        self.pending = 0
+        self.lastFlush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.closeSink(self.sinkName)
+        else:
+            self.sink.close()
@@ -0,0 +1,400 @@
+"""
+Plays the archived files back through the graph, to look over a test after it has finished.
+
+the hourly files (see dataFiles.py) hold one row a minute with the average, min, max and standard deviation of every
+sensor, and a spike file holds every sample from a little before a spike to a little after it. for a date range:
+
+    index = ArchiveIndex(dataRoot, date(2024, 3, 4), date(2024, 3, 10))
+    replay = Replay(index, speed=100)
+    replay.seek(index.start)
+    replay.play()
+    ...
+    for type in replay.advance():
+        draw(replay.timeData[type], replay.Data[type])
+
+the index only lists the folders of the days in the range, it doesn't open a file until its rows are needed. parsed
+files are kept (up to "cacheFiles" of them, the least recently used go first), so seeking back and forth over a week
+only parses each hour once. a file that is still being written is parsed again when it changes. files that have been
+compressed (see archiveRotation.py) are read the same way as the rest.
+
+the replay keeps a RingBuffer of times and one per sensor for every sensor type, like the DAQ does, so the graph draws
+them exactly the way it draws live data. the averages of the hourly files and the samples of the spike files go into
+the same buffers in time order, so the line gets every sample around a spike and the minute averages everywhere else.
+the minute rows from the time a spike file covers are left out, the line would zig-zag between the averages and the
+samples otherwise. times in the buffers are nanoseconds since midnight at the start of the range.
+
+playing moves the position on by the time since the last advance() times "speed" (1 to 1000), seek() jumps anywhere in
+the range and fills the buffers with the "window" before that point.
+"""
+
+import csv
+import os
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, timedelta
+import numpy as np
+from ringBuffer import RingBuffer
+from dataFiles import dataRoot, dayFormat, hourPattern, spikePattern
+from archiveRotation import archiveName, findArchive, openArchive
+
+types = ('Mag', 'Temp', 'Pressure')
+
+# the hourly files of a sensor type hold its values multiplied by this (the magnetic field is written in mG), the
+# spike files hold them as they were graphed
+fileScales = {'Mag': 1000}
+
+# the times a spike file can cover around the minute in its name, see EventCapture (60 s before, up to 10 minutes after)
+spikeBefore = 5*60*10**9
+spikeAfter = 15*60*10**9
+
+hourNs = 60*60*10**9
+
+speeds = (1, 1000)
+
+# one file of the archive, "start" is nanoseconds since the epoch (the start of its hour, or the minute of its spike).
+# "path" is the name of the csv, it is opened with openArchive whether it has been compressed since or not
+ArchiveFile = namedtuple('ArchiveFile', ['type', 'start', 'path', 'spike'])
+
+# the parsed rows of a file: nanoseconds since the epoch and {sensor: values}
+Block = namedtuple('Block', ['times', 'columns'])
+
+
+def epochNs(day: date, hour: int = 0, minute: int = 0, second: int = 0):
+    """
+    nanoseconds since the epoch of a local wall clock time
+    """
+    return int(datetime(day.year, day.month, day.day, hour, minute, second).timestamp())*10**9
+
+
+def days(first: date, last: date):
+    day = first
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+
+def parseTimes(day: date, texts: list, spread: bool = False):
+    """
+    turns the 'HH:MM' or 'HH:MM:SS' strings of a file from "day" into nanoseconds since the epoch. a time earlier than
+    the one before it is on the next day.
+
+    spike files only have their times to the second, with "spread" the samples that share a second are spread out
+    evenly over it so the line still goes forwards
+    """
+    hours = {}
+    times = np.empty(len(texts), dtype=np.int64)
+    offset = 0
+    last = None
+    for n, text in enumerate(texts):
+        parts = [int(part) for part in text.split(':')]
+        hour, minute, second = (parts + [0, 0])[:3]
+        if last is not None and (hour, minute, second) < last:
+            offset += 1
+        last = (hour, minute, second)
+
+        key = (offset, hour)
+        start = hours.get(key)
+        if start is None:
+            start = hours[key] = epochNs(day + timedelta(days=offset), hour)
+        times[n] = start + (minute*60 + second)*10**9
+
+    if spread and len(times):
+        starts = np.flatnonzero(np.r_[True, times[1:] != times[:-1]])
+        lengths = np.diff(np.r_[starts, len(times)])
+        within = np.arange(len(times)) - np.repeat(starts, lengths)
+        times += within*10**9//np.repeat(lengths, lengths)
+    return times
+
+
+def parseFile(file: ArchiveFile, day: date):
+    """
+    reads one file into a Block. only the sensor columns are kept (not their min, max and std), in the units they are
+    graphed in
+    """
+    with openArchive(file.path) as csvfile:
+        rows = list(csv.reader(csvfile))
+    if not rows or 'Time' not in rows[0]:
+        return Block(np.zeros(0, dtype=np.int64), {})
+
+    header = rows[0]
+    rows = [row for row in rows[1:] if len(row) == len(header)]
+    timeColumn = header.index('Time')
+    times = parseTimes(day, [row[timeColumn] for row in rows], spread=file.spike)
+
+    scale = 1 if file.spike else fileScales.get(file.type, 1)
+    columns = {}
+    for column, name in enumerate(header):
+        if column == timeColumn or name.endswith((' min', ' max', ' std')):
+            continue
+        values = np.array([row[column] for row in rows])
+        values = np.where(values == '', 'nan', values).astype(np.float64) if len(values) else np.zeros(0)
+        columns[name] = values/scale if scale != 1 else values
+
+    # the rows of a file are in time order already, apart from any that were written twice after a restart
+    order = np.argsort(times, kind='stable')
+    if np.any(order != np.arange(len(order))):
+        times = times[order]
+        columns = {name: values[order] for name, values in columns.items()}
+    return Block(times, columns)
+
+
+class ArchiveIndex():
+
+    """
+    The hourly and spike files of every sensor type under "root" from day "first" to day "last", see the top of this
+    file
+    """
+
+    def __init__(self, root: str = dataRoot, first: date = None, last: date = None, cacheFiles: int = 24*8*len(types)):
+        self.root = root
+        self.first = first or date.today()
+        self.last = last or self.first
+        if self.last < self.first:
+            raise ValueError('the replay range ends (%s) before it starts (%s)' %(self.last, self.first))
+        self.cacheFiles = cacheFiles
+
+        self.start = epochNs(self.first)
+        self.stop = epochNs(self.last + timedelta(days=1))
+
+        # every file of a sensor type sorted by start, and the starts on their own for bisecting
+        self.files = {type: [] for type in types}
+        self.starts = {}
+        self.spikes = []
+        self.dayOf = {}
+        self.headers = {}
+
+        # path -> (modified time and size, Block)
+        self.cache = OrderedDict()
+        self.parsed = 0
+
+        for day in days(self.first, self.last):
+            folder = day.strftime(dayFormat)
+            for type in types:
+                self.scan(type, day, os.path.join(root, '%s Data' %type, folder), hourPattern, False)
+                self.scan(type, day, os.path.join(root, '%s Data' %type, 'Spike Data', folder), spikePattern, True)
+
+        for type, files in self.files.items():
+            files.sort(key=lambda file: file.start)
+            self.starts[type] = [file.start for file in files]
+        self.spikes.sort(key=lambda file: file.start)
+
+    def scan(self, type: str, day: date, folder: str, pattern, spike: bool):
+        try:
+            names = os.listdir(folder)
+        except FileNotFoundError:
+            return
+        # a file can be there twice for a moment, while it is being compressed
+        for name in sorted(set(archiveName(name) for name in names)):
+            match = pattern.match(name)
+            if match is None or match.group(1) != type:
+                continue
+            numbers = [int(number) for number in match.groups()[1:-1]]
+            file = ArchiveFile(type, epochNs(day, *numbers), os.path.join(folder, name), spike)
+            self.files[type].append(file)
+            self.dayOf[file.path] = day
+            if spike:
+                self.spikes.append(file)
+
+    def __len__(self):
+        return sum(len(files) for files in self.files.values())
+
+    def sensors(self, type: str):
+        """
+        the sensors of a sensor type found in any of its files, only the header line of each file is read
+        """
+        if type not in self.headers:
+            sensors = []
+            for file in self.files[type]:
+                with openArchive(file.path) as csvfile:
+                    header = next(csv.reader(csvfile), [])
+                for name in header:
+                    if name != 'Time' and not name.endswith((' min', ' max', ' std')) and name not in sensors:
+                        sensors.append(name)
+            self.headers[type] = sensors
+        return self.headers[type]
+
+    def load(self, file: ArchiveFile):
+        """
+        the Block of a file, parsed the first time it is asked for (or when it has changed since) and cached
+        """
+        # compressing a file doesn't change its rows (or its modified time), only its size
+        found = findArchive(file.path)
+        try:
+            stat = os.stat(found)
+            version = (stat.st_mtime_ns, found == file.path and stat.st_size)
+        except (FileNotFoundError, TypeError):
+            version = None
+
+        cached = self.cache.get(file.path)
+        if cached is not None and cached[0] == version:
+            self.cache.move_to_end(file.path)
+            return cached[1]
+
+        block = parseFile(file, self.dayOf[file.path]) if version is not None else Block(np.zeros(0, dtype=np.int64), {})
+        self.parsed += 1
+        self.cache[file.path] = (version, block)
+        while len(self.cache) > self.cacheFiles:
+            self.cache.popitem(last=False)
+        return block
+
+    def rows(self, type: str, after: int, until: int):
+        """
+        the times and {sensor: values} of every row of a sensor type after "after" and up to "until" (nanoseconds
+        since the epoch), from all the files that can have rows then, in time order. rows of the hourly files from
+        when a spike file has samples are left out
+        """
+        files = self.files[type]
+        starts = self.starts[type]
+        first = bisect_left(starts, after - max(hourNs, spikeBefore + spikeAfter))
+        last = bisect_right(starts, until + spikeBefore)
+
+        hourly = []
+        spikes = []
+        for file in files[first:last]:
+            if file.spike:
+                if file.start + spikeAfter <= after or file.start - spikeBefore > until:
+                    continue
+                spikes.append(self.load(file))
+            elif file.start + hourNs <= after or file.start > until:
+                continue
+            else:
+                hourly.append(self.load(file))
+
+        # the first and last sample of every spike file, a spike file's rows are in time order
+        spans = [(block.times[0], block.times[-1]) for block in spikes if len(block.times)]
+
+        pieces = []
+        for block, minutes in [(block, True) for block in hourly] + [(block, False) for block in spikes]:
+            low = np.searchsorted(block.times, after, side='right')
+            high = np.searchsorted(block.times, until, side='right')
+            if high <= low:
+                continue
+            times = block.times[low:high]
+            columns = {name: values[low:high] for name, values in block.columns.items()}
+            if spans and minutes:
+                keep = np.ones(len(times), dtype=bool)
+                for start, stop in spans:
+                    keep &= (times < start) | (times > stop)
+                times = times[keep]
+                columns = {name: values[keep] for name, values in columns.items()}
+            if len(times):
+                pieces.append((times, columns))
+
+        sensors = self.sensors(type)
+        if not pieces:
+            return np.zeros(0, dtype=np.int64), {sensor: np.zeros(0) for sensor in sensors}
+
+        times = np.concatenate([piece[0] for piece in pieces])
+        columns = {sensor: np.concatenate([piece[1].get(sensor, np.full(len(piece[0]), np.nan)) for piece in pieces]) for sensor in sensors}
+        if len(pieces) > 1:
+            order = np.argsort(times, kind='stable')
+            times = times[order]
+            columns = {sensor: values[order] for sensor, values in columns.items()}
+        return times, columns
+
+
+class Replay():
+
+    """
+    Plays an ArchiveIndex into ring buffers, see the top of this file. "capacity" is how many rows each buffer keeps and
+    "window" how many seconds before the position a seek fills in (a week, so the week view has something to show)
+    """
+
+    def __init__(self, index: ArchiveIndex, speed: float = 1, capacity: int = 1 << 16, window: float = 60*60*24*7):
+        self.index = index
+        self.origin = index.start
+        self.window = int(window*10**9)
+
+        self.AIN = {type: list(index.sensors(type)) for type in types}
+        self.timeData = {type: RingBuffer(capacity, dtype=np.int64) for type in types}
+        self.Data = {type: {sensor: RingBuffer(capacity) for sensor in self.AIN[type]} for type in types}
+
+        self.speed = 1
+        self.setSpeed(speed)
+        self.playing = False
+        self.wall = None
+
+        # the time (nanoseconds since the epoch) the replay is at, and how far each sensor type's buffers go
+        self.position = index.start
+        self.cursor = {type: index.start for type in types}
+
+    def setSpeed(self, speed: float):
+        self.speed = min(max(speed, speeds[0]), speeds[1])
+
+    def play(self):
+        self.playing = True
+        self.wall = time.monotonic_ns()
+
+    def pause(self):
+        self.playing = False
+
+    def finished(self):
+        return self.position >= self.index.stop
+
+    def fraction(self):
+        """
+        how far through the range the replay is, from 0 to 1
+        """
+        return (self.position - self.index.start)/(self.index.stop - self.index.start)
+
+    def seek(self, position: int):
+        """
+        jumps to "position" (nanoseconds since the epoch), the buffers are emptied and filled again with the rows in
+        the window before it. returns the sensor types that have rows
+        """
+        self.position = min(max(int(position), self.index.start), self.index.stop)
+        for type in types:
+            self.timeData[type].clear()
+            for buffer in self.Data[type].values():
+                buffer.clear()
+            self.cursor[type] = max(self.index.start - 1, self.position - self.window)
+        self.wall = time.monotonic_ns()
+        return self.fill()
+
+    def seekFraction(self, fraction: float):
+        return self.seek(self.index.start + fraction*(self.index.stop - self.index.start))
+
+    def nextSpike(self, after: int = None):
+        """
+        the start of the first spike file after "after" (the position if not given), or None
+        """
+        after = self.position if after is None else after
+        starts = [file.start for file in self.index.spikes]
+        found = bisect_right(starts, after)
+        return starts[found] if found < len(starts) else None
+
+    def advance(self, now: int = None):
+        """
+        moves the position on by how long it has been since the last call (times the speed) if playing, and adds the
+        rows up to the new position to the buffers. returns the sensor types that got new rows
+        """
+        now = time.monotonic_ns() if now is None else now
+        if self.playing and self.wall is not None:
+            self.position = min(self.index.stop, self.position + int((now - self.wall)*self.speed))
+            if self.finished():
+                self.playing = False
+        self.wall = now
+        return self.fill()
+
+    def fill(self):
+        changed = []
+        for type in types:
+            if self.cursor[type] >= self.position:
+                continue
+            times, columns = self.index.rows(type, self.cursor[type], self.position)
+            self.cursor[type] = self.position
+            if not len(times):
+                continue
+
+            self.timeData[type].extend(times - self.origin)
+            for sensor, buffer in self.Data[type].items():
+                buffer.extend(columns[sensor])
+            changed.append(type)
+        return changed
+
+    def seconds(self, position: int = None):
+        """
+        seconds since the start of the range, the x axis of the graph
+        """
+        return ((self.position if position is None else position) - self.origin)/1e9
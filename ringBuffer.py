@@ -0,0 +1,244 @@
+import numpy as np
+
+
+def samplesIn(seconds: float, period: float):
+    """
+    returns how many samples taken every "period" seconds fit in "seconds", used to size the ring buffers
+    """
+    return max(1, int(round(seconds/period)))
+
+
+class RingBuffer():
+
+    """
+    A fixed size history of samples stored in a numpy array, used in place of python lists that get trimmed with pop(0).
+
+    once the buffer is full every new sample overwrites the oldest one, so appending always costs the same no matter how
+    long the window is, and nothing ever has to be shifted down the list.
+
+    the array is twice as long as the capacity and every sample is written to both halves. because of that the newest
+    "capacity" samples always sit next to each other somewhere in the array, so view() can hand them out oldest to newest
+    as a plain numpy slice without copying anything (this is what gets passed to setData for plotting).
+
+    the buffer can be used mostly like the lists it replaced: append, len(), buffer[-1], iterating and clear() all work.
+    """
+
+    def __init__(self, capacity: int, dtype=np.float64):
+        self.capacity = int(capacity)
+        self.data = np.zeros(2*self.capacity, dtype=dtype)
+
+        # "end" is where the next sample goes in the first half, "count" is how many samples are stored and "total" is
+        # how many have been appended since the last clear (readers can use it to pick up only the samples they haven't
+        # seen yet). "generation" goes up every time the buffer is cleared so readers know to start over
+        self.end = 0
+        self.count = 0
+        self.total = 0
+        self.generation = 0
+
+    def append(self, value):
+        """
+        adds one sample, overwriting the oldest one if the buffer is full
+        """
+        end = self.end
+        self.data[end] = value
+        self.data[end + self.capacity] = value
+
+        end += 1
+        self.end = 0 if end == self.capacity else end
+        if self.count < self.capacity:
+            self.count += 1
+        self.total += 1
+
+    def extend(self, block):
+        """
+        adds a whole block of samples at once (for example a block from stream mode) with at most two array copies
+        """
+        block = np.asarray(block, dtype=self.data.dtype).ravel()
+        n = len(block)
+        if n == 0:
+            return
+        self.total += n
+
+        # only the newest "capacity" samples of a long block would survive anyway
+        if n > self.capacity:
+            block = block[-self.capacity:]
+            n = self.capacity
+
+        end = self.end
+        first = min(n, self.capacity - end)
+        self.data[end:end + first] = block[:first]
+        self.data[end + self.capacity:end + self.capacity + first] = block[:first]
+
+        rest = n - first
+        if rest:
+            self.data[:rest] = block[first:]
+            self.data[self.capacity:self.capacity + rest] = block[first:]
+
+        self.end = (end + n) % self.capacity
+        self.count = min(self.capacity, self.count + n)
+
+    def view(self):
+        """
+        returns the stored samples oldest to newest as a numpy array that shares memory with the buffer.
+        the view changes as new samples come in, use toArray() if the values need to be kept.
+        """
+        stop = self.end + self.capacity
+        return self.data[stop - self.count:stop]
+
+    def tail(self, n: int):
+        """
+        returns a view of the newest "n" samples
+        """
+        n = min(int(n), self.count)
+        stop = self.end + self.capacity
+        return self.data[stop - n:stop]
+
+    def toArray(self):
+        """
+        returns a copy of the stored samples oldest to newest
+        """
+        return self.view().copy()
+
+    def clear(self):
+        self.end = 0
+        self.count = 0
+        self.total = 0
+        self.generation += 1
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return self.view()[index]
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.view()
+        return self.view().astype(dtype)
+
+
+def alignedViews(xData: RingBuffer, yData: RingBuffer):
+    """
+    returns views of two buffers that are appended to together (like a time buffer and a data buffer) covering only the
+    samples both of them have. if one is read part way through a tick, after the first has been appended to but before
+    the second, the extra sample is left off so the two always line up.
+    """
+    start = max(xData.total - xData.count, yData.total - yData.count)
+    stop = min(xData.total, yData.total)
+    if stop <= start:
+        return xData.view()[:0], yData.view()[:0]
+
+    x = xData.view()
+    y = yData.view()
+    xOffset = xData.total - len(x)
+    yOffset = yData.total - len(y)
+    return x[start - xOffset:stop - xOffset], y[start - yOffset:stop - yOffset]
+
+
+class RingBlock():
+
+    """
+    The ring buffers of several channels that are always appended to together, kept in one 2D array (one row per
+    channel, each row laid out like a RingBuffer). a whole scan of every channel is added with one array assignment, so
+    appending costs the same for one channel as for ten.
+
+    channel(row) hands out a ChannelBuffer for one row, which can be used anywhere a RingBuffer is read from.
+    """
+
+    def __init__(self, channels: int, capacity: int, dtype=np.float64):
+        self.channels = int(channels)
+        self.capacity = int(capacity)
+        self.data = np.zeros((self.channels, 2*self.capacity), dtype=dtype)
+        self.end = 0
+        self.count = 0
+        self.total = 0
+        self.generation = 0
+
+    def append(self, values):
+        """
+        adds one sample to every channel, "values" has one value per row
+        """
+        end = self.end
+        self.data[:, end] = values
+        self.data[:, end + self.capacity] = values
+
+        end += 1
+        self.end = 0 if end == self.capacity else end
+        if self.count < self.capacity:
+            self.count += 1
+        self.total += 1
+
+    def extend(self, block):
+        """
+        adds a block of scans, one row per scan and one column per channel
+        """
+        block = np.asarray(block, dtype=self.data.dtype).reshape(-1, self.channels).T
+        n = block.shape[1]
+        if n == 0:
+            return
+        self.total += n
+
+        if n > self.capacity:
+            block = block[:, -self.capacity:]
+            n = self.capacity
+
+        end = self.end
+        first = min(n, self.capacity - end)
+        self.data[:, end:end + first] = block[:, :first]
+        self.data[:, end + self.capacity:end + self.capacity + first] = block[:, :first]
+
+        rest = n - first
+        if rest:
+            self.data[:, :rest] = block[:, first:]
+            self.data[:, self.capacity:self.capacity + rest] = block[:, first:]
+
+        self.end = (end + n) % self.capacity
+        self.count = min(self.capacity, self.count + n)
+
+    def tail(self, n: int):
+        """
+        returns a view of the newest "n" scans, one row per channel
+        """
+        n = min(int(n), self.count)
+        stop = self.end + self.capacity
+        return self.data[:, stop - n:stop]
+
+    def clear(self):
+        self.end = 0
+        self.count = 0
+        self.total = 0
+        self.generation += 1
+
+    def channel(self, row: int):
+        return ChannelBuffer(self, row)
+
+    def __len__(self):
+        return self.count
+
+
+class ChannelBuffer(RingBuffer):
+
+    """
+    One row of a RingBlock, read like a RingBuffer. its position is the block's, it is written through the block only
+    """
+
+    def __init__(self, block: RingBlock, row: int):
+        self.block = block
+        self.capacity = block.capacity
+        self.data = block.data[row]
+
+    end = property(lambda self: self.block.end)
+    count = property(lambda self: self.block.count)
+    total = property(lambda self: self.block.total)
+    generation = property(lambda self: self.block.generation)
+
+    def append(self, value):
+        raise TypeError('the channels of a RingBlock are written through the block')
+
+    extend = append
+
+    def clear(self):
+        raise TypeError('the channels of a RingBlock are written through the block')
@@ -0,0 +1,228 @@
+from collections import deque
+from math import sqrt, nan, inf
+import numpy as np
+from ringBuffer import RingBuffer
+
+
+class RollingStats():
+
+    """
+    Keeps the mean, min, max and variance of the newest "capacity" samples (a sliding window) up to date as each
+    sample comes in, so asking for them costs the same no matter how long the window is.
+
+     - the mean and variance use Welford's method, when the window is full the oldest sample is swapped out for the new one
+     in a single update instead of summing the whole window again
+     - min and max are kept with monotonic queues, each sample is added and removed from a queue at most once
+     - every "capacity" samples the mean and variance are recomputed from the window in one numpy call to stop rounding
+     errors from building up, which still only works out to a constant cost per sample
+
+    the samples themselves are kept in a RingBuffer, so view(), tail(), len() etc. work the same as on a plain ring buffer
+    and a RollingStats can be used anywhere a RingBuffer history is expected.
+    """
+
+    def __init__(self, capacity: int):
+        self.window = RingBuffer(capacity)
+        self.capacity = self.window.capacity
+        self.clear()
+
+    def clear(self):
+        self.window.clear()
+        self.mean = 0.0
+        self.M2 = 0.0
+        self.index = 0
+        self.sinceResync = 0
+
+        # (index, value) pairs, values increasing in minQueue and decreasing in maxQueue
+        self.minQueue = deque()
+        self.maxQueue = deque()
+
+    def append(self, value):
+        value = float(value)
+        n = self.window.count
+
+        if n == self.capacity:
+            # the window is full, so the oldest sample is replaced by the new one
+            old = self.window.data[self.window.end]
+            oldMean = self.mean
+            self.mean += (value - old)/n
+            self.M2 += (value - old)*(value - self.mean + old - oldMean)
+
+            self.window.append(value)
+
+            self.sinceResync += 1
+            if self.sinceResync >= self.capacity:
+                self.resync()
+        else:
+            delta = value - self.mean
+            self.mean += delta/(n + 1)
+            self.M2 += delta*(value - self.mean)
+            self.window.append(value)
+
+        index = self.index
+        self.index += 1
+
+        while self.minQueue and self.minQueue[-1][1] >= value:
+            self.minQueue.pop()
+        self.minQueue.append((index, value))
+        while self.maxQueue and self.maxQueue[-1][1] <= value:
+            self.maxQueue.pop()
+        self.maxQueue.append((index, value))
+
+        # drop whatever has slid out of the window
+        oldest = self.index - self.capacity
+        if self.minQueue[0][0] < oldest:
+            self.minQueue.popleft()
+        if self.maxQueue[0][0] < oldest:
+            self.maxQueue.popleft()
+
+    def extend(self, block):
+        for value in np.asarray(block, dtype=np.float64).ravel():
+            self.append(value)
+
+    def resync(self):
+        """
+        recomputes the mean and variance from the samples in the window
+        """
+        values = self.window.view()
+        self.mean = float(values.mean())
+        self.M2 = float(((values - self.mean)**2).sum())
+        self.sinceResync = 0
+
+    @property
+    def count(self):
+        return self.window.count
+
+    @property
+    def min(self):
+        return self.minQueue[0][1] if self.minQueue else nan
+
+    @property
+    def max(self):
+        return self.maxQueue[0][1] if self.maxQueue else nan
+
+    @property
+    def variance(self):
+        n = self.window.count
+        return max(self.M2, 0.0)/(n - 1) if n > 1 else 0.0
+
+    @property
+    def std(self):
+        return sqrt(self.variance)
+
+    def view(self):
+        return self.window.view()
+
+    def tail(self, n: int):
+        return self.window.tail(n)
+
+    def toArray(self):
+        return self.window.toArray()
+
+    def __len__(self):
+        return self.window.count
+
+    def __getitem__(self, index):
+        return self.window[index]
+
+    def __iter__(self):
+        return iter(self.window)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.window.__array__(dtype)
+
+
+class TumblingStats():
+
+    """
+    Keeps the mean, min, max and variance of every sample added since the last reset(), without storing the samples.
+    this is used for the minute averages written to the csv files: samples are added every tick and once the minute is
+    over the statistics are read off and the window is reset for the next minute.
+
+    blocks of samples (for example from stream mode) can be added with extend, which merges the statistics of the whole
+    block in one go using Chan's method for combining variances. skipped samples (nan) are left out.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self.M2 = 0.0
+        self.min = inf
+        self.max = -inf
+
+    clear = reset
+
+    def append(self, value):
+        value = float(value)
+        if value != value:
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta/self.count
+        self.M2 += delta*(value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def extend(self, block):
+        block = np.asarray(block, dtype=np.float64).ravel()
+        block = block[block == block]
+        n = len(block)
+        if n == 0:
+            return
+
+        blockMean = float(block.mean())
+        blockM2 = float(((block - blockMean)**2).sum())
+
+        total = self.count + n
+        delta = blockMean - self.mean
+        self.mean += delta*n/total
+        self.M2 += blockM2 + delta**2*self.count*n/total
+        self.count = total
+
+        self.min = min(self.min, float(block.min()))
+        self.max = max(self.max, float(block.max()))
+
+    @property
+    def variance(self):
+        return max(self.M2, 0.0)/(self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return sqrt(self.variance)
+
+    def summary(self):
+        """
+        returns the mean, min, max and standard deviation of the window, or nan for all of them if nothing was added
+        """
+        if self.count == 0:
+            return nan, nan, nan, nan
+        return self.mean, self.min, self.max, self.std
+
+    def __len__(self):
+        return self.count
+
+
+
+def blockSummary(block):
+    """
+    returns arrays of the mean, min, max and standard deviation of every row of a 2D block (one row per channel), the
+    TumblingStats.summary of each row. skipped samples (nan) are left out, a row with no samples gives nan for all four.
+
+    this is how the minute rows of a ChannelPipeline are made: the samples of the minute are still in its ring buffers,
+    so each row is merged into a TumblingStats in one go when the minute is over instead of adding every sample to it
+    as it comes in
+    """
+    block = np.asarray(block, dtype=np.float64)
+    stats = TumblingStats()
+    summaries = []
+    for row in block:
+        stats.reset()
+        stats.extend(row)
+        summaries.append(stats.summary())
+    if not summaries:
+        return tuple(np.zeros(0) for column in range(4))
+    return tuple(np.array(column) for column in zip(*summaries))
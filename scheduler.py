@@ -0,0 +1,136 @@
+"""
+Acquisition scheduler: one thread that runs every periodic task at fixed deadlines.
+
+the old approach started a new threading.Timer at the end of every tick, which makes a new OS thread per tick and
+lets the period drift by however long the tick took. here every task has an absolute deadline on the
+time.monotonic_ns() clock, and after each run the deadline moves forward by exactly one period, so the time a tick takes
+doesn't push the next one back and a long run keeps its cadence.
+
+if a task runs so long that it misses one or more of its deadlines, the missed ticks are skipped (not run back to
+back to catch up) and counted, so overruns show up in stats() instead of as a burst of ticks.
+"""
+
+import time
+from threading import Thread, Event, Lock, current_thread
+
+
+class Task():
+
+    """
+    One periodic task of the scheduler, with its deadline and timing statistics. periods and times are in nanoseconds
+    """
+
+    def __init__(self, name: str, period: float, function, args: tuple):
+        self.name = name
+        self.period = int(round(period*1e9))
+        self.function = function
+        self.args = args
+        self.deadline = 0
+
+        self.runs = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.errors = 0
+        self.maxLateness = 0
+        self.maxDuration = 0
+        self.totalDuration = 0
+
+    def stats(self):
+        return {
+            'period': self.period/1e9,
+            'runs': self.runs,
+            'overruns': self.overruns,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'maxLateness': self.maxLateness/1e9,
+            'maxDuration': self.maxDuration/1e9,
+            'meanDuration': self.totalDuration/self.runs/1e9 if self.runs else 0.0,
+        }
+
+
+class Scheduler(Thread):
+
+    def __init__(self):
+        super().__init__(name='Scheduler', daemon=True)
+        self.tasks = []
+        self.lock = Lock()
+        self.stopEvent = Event()
+
+    def addTask(self, name: str, period: float, function, *args):
+        """
+        runs function(*args) every "period" seconds, starting one period from now (or from when the scheduler starts)
+        """
+        task = Task(name, period, function, args)
+        task.deadline = time.monotonic_ns() + task.period
+        with self.lock:
+            self.tasks.append(task)
+        return task
+
+    def start(self):
+        # the first deadlines are counted from when the scheduler actually starts
+        now = time.monotonic_ns()
+        with self.lock:
+            for task in self.tasks:
+                task.deadline = now + task.period
+        super().start()
+
+    def run(self):
+        while not self.stopEvent.is_set():
+            with self.lock:
+                if not self.tasks:
+                    task = None
+                else:
+                    task = min(self.tasks, key=lambda task: task.deadline)
+
+            if task is None:
+                if self.stopEvent.wait(0.1):
+                    return
+                continue
+
+            wait = task.deadline - time.monotonic_ns()
+            if wait > 0:
+                # sleeping on the event means stop() doesn't have to wait out the rest of the period
+                if self.stopEvent.wait(wait/1e9):
+                    return
+                continue
+
+            self.runTask(task)
+
+    def runTask(self, task: Task):
+        start = time.monotonic_ns()
+        task.maxLateness = max(task.maxLateness, start - task.deadline)
+
+        try:
+            task.function(*task.args)
+        except Exception as error:
+            task.errors += 1
+            print('Scheduler: task %s failed: %r' %(task.name, error))
+
+        end = time.monotonic_ns()
+        duration = end - start
+        task.runs += 1
+        task.totalDuration += duration
+        task.maxDuration = max(task.maxDuration, duration)
+
+        task.deadline += task.period
+        if end >= task.deadline:
+            # the next deadline has already gone by, skip ahead to the first one still in the future
+            missed = (end - task.deadline)//task.period + 1
+            task.overruns += 1
+            task.skipped += missed
+            task.deadline += missed*task.period
+
+    def stop(self, timeout: float = None):
+        """
+        stops the scheduler, waiting for a task that is running to finish
+        """
+        self.stopEvent.set()
+        if self.is_alive() and self is not current_thread():
+            self.join(timeout)
+
+    def stats(self):
+        """
+        returns the timing statistics of every task, by name
+        """
+        with self.lock:
+            return {task.name: task.stats() for task in self.tasks}
@@ -0,0 +1,351 @@
+"""
+Ring buffers in shared memory, so the acquisition can run in its own process and the GUI in another.
+
+with both in one process a slow redraw holds the GIL and the next read of the device waits for it, which shows up as
+jitter in the time stamps. with the acquisition in its own process (see daqDaemon.py) it publishes every sample into a
+SharedRingWriter, and the GUI maps the same memory with a SharedRingReader and draws straight from it without copying.
+
+a ring holds one sensor type: a time column and a column per sensor, laid out like RingBuffer (every row is written to
+both halves of an array twice the capacity), so the reader's SharedBuffers can be used anywhere a RingBuffer can, the
+PlotBridge and its decimation pyramids included.
+
+    header      int64s: magic, capacity, visible, columns, total, generation, origin, closed, tracker
+    names       the column names, as json
+    time        int64 nanoseconds since "origin" (nanoseconds since the epoch), 2 x capacity
+    columns     float64, 2 x capacity each
+
+there is only one writer, and it never waits for a reader. it writes a row into both halves and only then moves
+"total" on, which is the sequence counter readers go by. a reader takes a snapshot of "total" with refresh() and works
+from that until its next refresh, so all its buffers line up with each other for the frame. a reader that doesn't
+refresh often enough finds the writer has gone round the ring past the rows it last saw, and refresh() counts those as
+lost instead of anything blocking.
+
+the writer allocates more rows than it shows ("capacity" vs "visible"), so the rows a reader is looking at stay
+untouched for a while after its refresh. valid() tells the reader if they lasted until it was done with them.
+"""
+
+import json
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from ringBuffer import RingBuffer, samplesIn
+
+magic = 0x4C4A5249  # 'LJRI'
+headerFields = ('magic', 'capacity', 'visible', 'columns', 'total', 'generation', 'origin', 'closed', 'tracker')
+headerSize = 8*len(headerFields)
+namesSize = 4096
+
+MAGIC, CAPACITY, VISIBLE, COLUMNS, TOTAL, GENERATION, ORIGIN, CLOSED, TRACKER = range(len(headerFields))
+
+
+def layout(capacity: int, columns: int):
+    """
+    the size of a ring's shared memory and where its time and value arrays start
+    """
+    timeStart = headerSize + namesSize
+    valueStart = timeStart + 8*2*capacity
+    return valueStart + 8*2*capacity*columns, timeStart, valueStart
+
+
+def trackerPid():
+    """
+    the process id of the resource tracker this process registers shared memory with, 0 if it can't be found out.
+    a process started with fork shares the tracker of its parent if the parent had one running
+    """
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.ensure_running()
+        return int(resource_tracker._resource_tracker._pid or 0)
+    except Exception:
+        return 0
+
+
+def untrack(memory: shared_memory.SharedMemory, writerTracker: int):
+    # every process that opens a segment registers it with its resource tracker, which removes it when that process
+    # exits, even if it only attached. only the writer should remove it, but a tracker keeps a segment once however
+    # often it is registered, so a reader that shares the writer's tracker would unregister the writer's segment too
+    tracker = trackerPid()
+    if not tracker or tracker == writerTracker:
+        return
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+class SharedRingWriter():
+
+    """
+    The acquisition side of a ring called "name" with a column for every name in "columns". readers see the newest
+    "visible" rows, "slack" more are kept so those rows aren't overwritten the moment a reader has looked at them.
+    """
+
+    def __init__(self, name: str, columns: list, visible: int, slack: int = None, origin: int = None):
+        self.name = name
+        self.columns = list(columns)
+        self.visible = int(visible)
+        slack = max(16, self.visible//8) if slack is None else int(slack)
+        self.capacity = self.visible + slack
+        self.origin = time.time_ns() if origin is None else int(origin)
+
+        size, timeStart, valueStart = layout(self.capacity, len(self.columns))
+        names = json.dumps(self.columns).encode()
+        if len(names) > namesSize:
+            raise ValueError('too many column names for a shared ring')
+
+        try:
+            self.memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # left behind by a writer that didn't get to close it, readers still on it are told it is finished
+            stale = shared_memory.SharedMemory(name=name)
+            if stale.size >= headerSize:
+                np.ndarray(len(headerFields), dtype=np.int64, buffer=stale.buf)[CLOSED] = 1
+            stale.close()
+            stale.unlink()
+            self.memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.header = np.ndarray(len(headerFields), dtype=np.int64, buffer=self.memory.buf)
+        self.memory.buf[headerSize:headerSize + len(names)] = names
+        self.time = np.ndarray(2*self.capacity, dtype=np.int64, buffer=self.memory.buf, offset=timeStart)
+        self.values = np.ndarray((len(self.columns), 2*self.capacity), dtype=np.float64, buffer=self.memory.buf, offset=valueStart)
+
+        # the magic number goes in last, a reader that attaches before then waits for it
+        self.header[1:] = (self.capacity, self.visible, len(self.columns), 0, 0, self.origin, 0, trackerPid())
+        self.header[MAGIC] = magic
+        self.total = 0
+
+    def append(self, stamp: int, values):
+        """
+        adds one row, "stamp" is nanoseconds since the epoch and "values" has one value per column
+        """
+        end = self.total % self.capacity
+        self.time[end] = self.time[end + self.capacity] = stamp - self.origin
+        self.values[:, end] = self.values[:, end + self.capacity] = values
+
+        # readers only see the row once total moves past it
+        self.total += 1
+        self.header[TOTAL] = self.total
+
+    def extend(self, stamps, block):
+        """
+        adds a row for every stamp in "stamps" (nanoseconds since the epoch), "block" has a row per column and a column
+        per stamp. if there are more rows than the ring holds only the newest go in, the rest count as written over
+        """
+        stamps = np.asarray(stamps, dtype=np.int64)
+        n = len(stamps)
+        if n == 0:
+            return
+        keep = min(n, self.capacity)
+        ends = (self.total + n - keep + np.arange(keep)) % self.capacity
+        times = stamps[-keep:] - self.origin
+        self.time[ends] = times
+        self.time[ends + self.capacity] = times
+        block = np.asarray(block, dtype=np.float64)[:, -keep:]
+        self.values[:, ends] = block
+        self.values[:, ends + self.capacity] = block
+
+        self.total += n
+        self.header[TOTAL] = self.total
+
+    def clear(self):
+        self.total = 0
+        self.header[TOTAL] = 0
+        self.header[GENERATION] += 1
+
+    def close(self):
+        """
+        tells readers nothing more is coming and removes the shared memory (readers that still have it mapped keep it
+        until they close it too)
+        """
+        if self.memory is None:
+            return
+        self.header[CLOSED] = 1
+        self.header = self.time = self.values = None
+        self.memory.close()
+        try:
+            self.memory.unlink()
+        except FileNotFoundError:
+            pass
+        self.memory = None
+
+
+class SharedBuffer(RingBuffer):
+
+    """
+    One column of a SharedRingReader, usable like a RingBuffer but read only. its position is the one the reader had
+    at its last refresh()
+    """
+
+    def __init__(self, data: np.ndarray, capacity: int):
+        self.capacity = capacity
+        self.data = data
+        self.end = 0
+        self.count = 0
+        self.total = 0
+        self.generation = 0
+
+    def append(self, value):
+        raise TypeError('shared buffers are written by the acquisition process only')
+
+    extend = append
+
+    def clear(self):
+        raise TypeError('shared buffers are written by the acquisition process only')
+
+
+class SharedRingReader():
+
+    """
+    The GUI side of a ring made by SharedRingWriter. "timeout" is how long to wait for the writer to make it.
+    """
+
+    def __init__(self, name: str, timeout: float = 0):
+        self.name = name
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.memory = shared_memory.SharedMemory(name=name)
+                break
+            except FileNotFoundError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+
+        self.header = np.ndarray(len(headerFields), dtype=np.int64, buffer=self.memory.buf)
+        while self.header[MAGIC] != magic:
+            if time.monotonic() >= deadline:
+                raise ValueError('%s is not a shared ring' %name)
+            time.sleep(0.01)
+        untrack(self.memory, int(self.header[TRACKER]))
+        self.capacity = int(self.header[CAPACITY])
+        self.visible = int(self.header[VISIBLE])
+        self.origin = int(self.header[ORIGIN])
+        names = bytes(self.memory.buf[headerSize:headerSize + namesSize]).rstrip(b'\0')
+        self.columns = json.loads(names.decode())
+
+        size, timeStart, valueStart = layout(self.capacity, len(self.columns))
+        timeData = np.ndarray(2*self.capacity, dtype=np.int64, buffer=self.memory.buf, offset=timeStart)
+        values = np.ndarray((len(self.columns), 2*self.capacity), dtype=np.float64, buffer=self.memory.buf, offset=valueStart)
+        for array in (timeData, values):
+            array.flags.writeable = False
+
+        self.timeData = SharedBuffer(timeData, self.capacity)
+        self.Data = {name: SharedBuffer(values[column], self.capacity) for column, name in enumerate(self.columns)}
+
+        # the writer's total at the last refresh, and the rows that went by without being seen
+        self.total = 0
+        self.generation = None
+        self.lost = 0
+        self.overruns = 0
+        self.stale = False
+
+    def closed(self):
+        return bool(self.header[CLOSED])
+
+    def refresh(self):
+        """
+        catches up with the writer: every buffer is moved to its newest "visible" rows. returns how many new rows
+        there are (at least 1 after retry()). rows the writer went past before this reader saw them are added to "lost"
+        """
+        total = int(self.header[TOTAL])
+        generation = int(self.header[GENERATION])
+        if generation != self.generation:
+            self.generation = generation
+            self.total = 0
+
+        new = total - self.total
+        if new > self.visible:
+            self.lost += new - self.visible
+            self.overruns += 1
+        self.total = total
+
+        count = min(total, self.visible)
+        end = total % self.capacity
+        for buffer in [self.timeData] + list(self.Data.values()):
+            buffer.total = total
+            buffer.count = count
+            buffer.end = end
+            buffer.generation = generation
+
+        if self.stale:
+            self.stale = False
+            return max(1, new)
+        return max(0, new)
+
+    def retry(self):
+        """
+        for when valid() says the rows of the last refresh were written over while they were being used: the next
+        refresh() reports new rows even if the writer hasn't added any, so they are read again
+        """
+        self.stale = True
+
+    def valid(self):
+        """
+        True if the rows seen at the last refresh haven't been written over since, check this after reading them
+        """
+        return int(self.header[TOTAL]) - self.total < self.capacity - self.visible and int(self.header[GENERATION]) == self.generation
+
+    def epochNs(self, ns):
+        """
+        turns times from the ring into nanoseconds since the epoch
+        """
+        return np.asarray(ns, dtype=np.int64) + self.origin
+
+    def close(self):
+        self.timeData = None
+        self.Data = {}
+        self.header = None
+        self.memory.close()
+
+
+def ringName(prefix: str, type: str):
+    return '%s_%s' %(prefix, type)
+
+
+class SharedPublisher():
+
+    """
+    Publishes a daqDaemon Session into a ring per sensor type, named "<prefix>_<type>". every ring holds as much as the
+    session's ring buffers do, its times count from when the publisher was made. every row added to the session's
+    buffers since the last publish is copied over, so a stream block goes in whole
+    """
+
+    def __init__(self, session, prefix: str):
+        self.session = session
+        self.prefix = prefix
+        self.origin = time.time_ns()
+        self.rings = {}
+        # the total and generation of each type's buffers at its last publish
+        self.published = {}
+        for type, AIN in session.AIN.items():
+            if AIN:
+                visible = samplesIn(session.historyLength, session.periods[type])
+                self.rings[type] = SharedRingWriter(ringName(prefix, type), AIN, visible, origin=self.origin)
+        session.subscribe(self.publish)
+
+    def publish(self, type: str, AIN: list, xData, Data: dict):
+        ring = self.rings.get(type)
+        if ring is None:
+            return
+        total, generation = self.published.get(type, (0, None))
+        if generation != xData.generation:
+            # the buffers were cleared, everything in them is new
+            total = xData.total - len(xData)
+            if generation is not None:
+                ring.clear()
+        self.published[type] = (xData.total, xData.generation)
+
+        new = min(xData.total - total, len(xData))
+        if new <= 0:
+            return
+        if new == 1:
+            ring.append(self.session.test.clock.epochNs(xData[-1]), [Data[sensor][-1] for sensor in AIN])
+            return
+        stamps = self.session.test.clock.epochNs(xData.tail(new))
+        ring.extend(stamps, np.array([Data[sensor].tail(new) for sensor in AIN]))
+
+    def close(self):
+        self.session.unsubscribe(self.publish)
+        for ring in self.rings.values():
+            ring.close()
+        self.rings.clear()
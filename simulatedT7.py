@@ -0,0 +1,343 @@
+"""
+A simulated LabJack T7, so the DAQ and GUI can run (and be load tested) without a device.
+
+SimulatedLJM has the part of the ljm module this project uses: openS, close, eReadName(s), eWriteName(s),
+namesToAddresses and eStreamStart / eStreamRead / eStreamStop. it is passed to the DAQ as its backend:
+
+    backend = SimulatedLJM({'AIN0': RtdSignal(22), 'AIN3': IonPumpSignal(1, spikesPerHour=4), 'AIN2': MagSignal()})
+    daq = DAQ(backend=backend)
+
+every input gets a signal generator that gives its voltage at any time since the device was opened:
+
+    RtdSignal       - the divider voltage of a PT100 at a temperature that drifts slowly, with noise
+    IonPumpSignal   - the ion pump monitor voltage for a pressure, with spikes at random times
+    MagSignal       - the magcheck output for a steady field plus mains frequency hum and noise
+    ConstantSignal  - a fixed voltage
+
+inputs without a generator read 0 V. the device side can be made slower or less reliable with:
+
+    latency, jitter - seconds added to every command/response round trip (the USB or ethernet delay), jitter is the
+                      standard deviation of a random extra delay
+    conversion      - when True (the default) every analog input read also takes the time the T7 needs to sample it,
+                      which depends on the resolution index, range and settling time written to it (see channelConfig.py)
+    dropRate        - the chance a stream sample is skipped (comes back as -9999.0 like on the real device)
+    failRate        - the chance a command fails with LJMError
+
+streams are paced on the computer's clock like the real device is on its own: eStreamRead waits until "scansPerRead"
+scans would have been taken, and if the reads fall behind the scans pile up in the backlog it reports.
+"""
+
+import time
+from abc import ABC, abstractmethod
+from math import pi
+import numpy as np
+from conversions import cvdResistance, Rfixed, excitation
+
+# what the LJM library puts in place of a sample the device had to skip
+skippedSample = -9999.0
+
+# roughly how long a T7 takes to sample one input in command/response mode at each resolution index, in us (index 0
+# is the default, 8), and the settling time it picks for each range when AIN#_SETTLING_US is 0
+sampleTimes = {1: 40, 2: 40, 3: 50, 4: 50, 5: 60, 6: 110, 7: 170, 8: 450, 9: 3500, 10: 13400, 11: 66200, 12: 159000}
+autoSettling = {10: 10, 1: 10, 0.1: 100, 0.01: 1000}
+
+
+class LJMError(Exception):
+    pass
+
+
+class Signal(ABC):
+
+    """
+    Base class of the signal generators. voltage(t) takes an array of times in seconds since the device was opened
+    and returns the voltage at each one.
+    """
+
+    def __init__(self, noise: float = 0, seed: int = None):
+        self.noise = noise
+        self.random = np.random.default_rng(seed)
+
+    def voltage(self, t):
+        t = np.asarray(t, dtype=np.float64)
+        volts = self.clean(t)
+        if self.noise:
+            volts = volts + self.noise*self.random.standard_normal(t.shape)
+        return volts
+
+    @abstractmethod
+    def clean(self, t):
+        pass
+
+
+class ConstantSignal(Signal):
+
+    def __init__(self, volts: float, noise: float = 0, seed: int = None):
+        super().__init__(noise, seed)
+        self.volts = volts
+
+    def clean(self, t):
+        return np.full(t.shape, float(self.volts))
+
+
+class RtdSignal(Signal):
+
+    """
+    a PT100 in the divider the RTD inputs are wired to, at "tempC" degrees, swinging by "drift" degrees over "period"
+    seconds. "leadResistance" is the resistance of each wire, added to the element like the real 3 wire connection
+    """
+
+    def __init__(self, tempC: float = 22, drift: float = 0.5, period: float = 3600, leadResistance: float = 1.08, noise: float = 2e-5, seed: int = None):
+        super().__init__(noise, seed)
+        self.tempC = tempC
+        self.drift = drift
+        self.period = period
+        self.leadResistance = leadResistance
+
+    def clean(self, t):
+        temps = self.tempC + self.drift*np.sin(2*pi*t/self.period)
+        resistance = cvdResistance(temps) + 1.5*self.leadResistance
+        return excitation*Rfixed/(resistance + Rfixed)
+
+
+class IonPumpSignal(Signal):
+
+    """
+    the ion pump monitor voltage for "pressure" (in the units conversions.ionPumpPressure gives), with spikes arriving
+    at random on average "spikesPerHour" times an hour. each spike jumps up by "spikePressure" and dies away over about
+    "spikeLength" seconds. the default spike is well over the DAQ's spike threshold
+    """
+
+    def __init__(self, pressure: float = 1, spikesPerHour: float = 2, spikePressure: float = 2000, spikeLength: float = 20, noise: float = 0.01, seed: int = None):
+        super().__init__(noise, seed)
+        self.pressure = pressure
+        self.spikesPerHour = spikesPerHour
+        self.spikePressure = spikePressure
+        self.spikeLength = spikeLength
+
+        # start times of the spikes worked out so far, more are added as time goes on
+        self.spikes = []
+        self.until = 0.0
+
+    def spikesUpTo(self, t: float):
+        if self.spikesPerHour <= 0:
+            return
+        while self.until <= t:
+            self.until += self.random.exponential(3600/self.spikesPerHour)
+            self.spikes.append(self.until)
+
+    def clean(self, t):
+        pressure = np.full(t.shape, float(self.pressure))
+        if t.size:
+            self.spikesUpTo(float(t.max()))
+            first, last = float(t.min()), float(t.max())
+
+            # spikes that have died away are forgotten so the list doesn't grow for ever
+            self.spikes = [start for start in self.spikes if start + 5*self.spikeLength >= first]
+            for start in self.spikes:
+                # only the spikes that overlap these times
+                if start > last or start + 5*self.spikeLength < first:
+                    continue
+                after = t - start
+                live = after >= 0
+                pressure[live] += self.spikePressure*np.exp(-after[live]/self.spikeLength)
+
+        # the inverse of conversions.ionPumpPressure
+        return pressure/10**(-0.74)
+
+
+class MagSignal(Signal):
+
+    """
+    the magcheck output for a steady field of "field" Gauss, with "hum" Gauss of "frequency" Hz mains hum on top
+    """
+
+    def __init__(self, field: float = 0.5, hum: float = 0.02, frequency: float = 60, noise: float = 1e-3, seed: int = None):
+        super().__init__(noise, seed)
+        self.field = field
+        self.hum = hum
+        self.frequency = frequency
+
+    def clean(self, t):
+        return self.field + self.hum*np.sin(2*pi*self.frequency*t)
+
+
+class SimulatedLJM():
+
+    """
+    Stands in for the labjack ljm module, see the top of this file. "signals" maps input names ('AIN0', ...) to
+    signal generators.
+    """
+
+    LJMError = LJMError
+
+    def __init__(self, signals: dict = None, latency: float = 0.001, jitter: float = 0.0002, dropRate: float = 0, failRate: float = 0, seed: int = None,
+                 conversion: bool = True):
+        self.signals = dict(signals or {})
+        self.latency = latency
+        self.jitter = jitter
+        self.conversion = conversion
+        self.dropRate = dropRate
+        self.failRate = failRate
+        self.random = np.random.default_rng(seed)
+
+        self.registers = {}
+        self.opened = None
+        self.stream = None
+
+        # counts of what the device was asked to do, for checking a load test did what was expected
+        self.commands = 0
+        self.scans = 0
+        self.dropped = 0
+
+    #########################
+    # device
+    #########################
+
+    def openS(self, deviceType: str = 'T7', connectionType: str = 'ANY', identifier: str = 'ANY'):
+        self.opened = time.monotonic()
+        return 1
+
+    def close(self, handle: int):
+        self.eStreamStop(handle)
+        self.opened = None
+
+    def now(self):
+        return time.monotonic() - self.opened
+
+    def conversionTime(self, names: list):
+        """
+        seconds the device spends sampling the analog inputs in "names", from what was written to their registers
+        """
+        total = 0
+        for name in names:
+            if not name.startswith('AIN') or not name[3:].isdigit():
+                continue
+            resolution = int(self.registers.get(name + '_RESOLUTION_INDEX', 0)) or 8
+            settling = self.registers.get(name + '_SETTLING_US', 0) or autoSettling.get(self.registers.get(name + '_RANGE', 10), 10)
+            total += sampleTimes.get(resolution, sampleTimes[8]) + settling
+        return total/1e6
+
+    def command(self, extra: float = 0):
+        """
+        one command/response round trip: waits out the latency (and "extra" seconds the device is busy) and maybe fails
+        """
+        if self.opened is None:
+            raise LJMError('device is not open')
+        self.commands += 1
+
+        delay = self.latency + extra
+        if self.jitter:
+            delay += abs(self.random.normal(0, self.jitter))
+        if delay > 0:
+            time.sleep(delay)
+
+        if self.failRate and self.random.random() < self.failRate:
+            raise LJMError('simulated communication failure')
+
+    def read(self, names: list, t):
+        """
+        the voltage of every input in "names" at the times "t", one row per time
+        """
+        t = np.atleast_1d(np.asarray(t, dtype=np.float64))
+        columns = []
+        for name in names:
+            signal = self.signals.get(name)
+            columns.append(signal.voltage(t) if signal is not None else np.zeros(t.shape))
+        return np.column_stack(columns) if columns else np.zeros((len(t), 0))
+
+    #########################
+    # command/response
+    #########################
+
+    def eReadName(self, handle: int, name: str):
+        return self.eReadNames(handle, 1, [name])[0]
+
+    def eReadNames(self, handle: int, numFrames: int, names: list):
+        if self.stream is not None and any(name.startswith('AIN') for name in names):
+            raise LJMError('analog inputs can not be read while streaming')
+        self.command(self.conversionTime(names[:numFrames]) if self.conversion else 0)
+        return self.read(names[:numFrames], self.now())[0].tolist()
+
+    def eWriteName(self, handle: int, name: str, value: float):
+        self.eWriteNames(handle, 1, [name], [value])
+
+    def eWriteNames(self, handle: int, numFrames: int, names: list, values: list):
+        self.command()
+        self.registers.update(zip(names[:numFrames], values[:numFrames]))
+
+    def namesToAddresses(self, numFrames: int, names: list):
+        addresses = []
+        for name in names[:numFrames]:
+            if not name.startswith('AIN'):
+                raise LJMError('only analog inputs can be streamed by the simulated device, not %s' %name)
+            addresses.append(2*int(name[3:]))
+        # the analog inputs are 32 bit floats, type 3
+        return addresses, [3]*len(addresses)
+
+    #########################
+    # stream
+    #########################
+
+    def eStreamStart(self, handle: int, scansPerRead: int, numAddresses: int, scanList: list, scanRate: float):
+        if self.stream is not None:
+            raise LJMError('stream is already running')
+        self.command()
+        self.stream = {
+            'names': ['AIN%s' %(address//2) for address in scanList[:numAddresses]],
+            'scansPerRead': int(scansPerRead),
+            'scanRate': float(scanRate),
+            'start': self.now(),
+            'read': 0,
+        }
+        return float(scanRate)
+
+    def eStreamRead(self, handle: int):
+        """
+        waits until the next "scansPerRead" scans have been taken and returns them interleaved, the way the LJM
+        library does, along with the device and LJM backlogs in scans
+        """
+        stream = self.stream
+        if stream is None:
+            raise LJMError('stream is not running')
+
+        rate = stream['scanRate']
+        first = stream['read']
+        count = stream['scansPerRead']
+
+        ready = stream['start'] + (first + count)/rate
+        wait = ready - self.now()
+        if wait > 0:
+            time.sleep(wait)
+
+        t = stream['start'] + (first + np.arange(count))/rate
+        block = self.read(stream['names'], t)
+
+        if self.dropRate:
+            drop = self.random.random(block.shape) < self.dropRate
+            block[drop] = skippedSample
+            self.dropped += int(drop.sum())
+
+        stream['read'] += count
+        self.scans += count
+
+        backlog = max(0, int((self.now() - stream['start'])*rate) - stream['read'])
+        return block.ravel().tolist(), backlog, 0
+
+    def eStreamStop(self, handle: int):
+        self.stream = None
+
+
+def labSignals(AINT: list, AINP: list, AINM: list, seed: int = None):
+    """
+    signal generators that look like the lab setup: an RTD on every temperature input, an ion pump on every pressure
+    input and a magcheck on every magnetic input
+    """
+    random = np.random.default_rng(seed)
+    signals = {}
+    for sensor in AINT:
+        signals[sensor] = RtdSignal(tempC=random.uniform(20, 24), seed=random.integers(2**32))
+    for sensor in AINP:
+        signals[sensor] = IonPumpSignal(seed=random.integers(2**32))
+    for sensor in AINM:
+        signals[sensor] = MagSignal(seed=random.integers(2**32))
+    return signals
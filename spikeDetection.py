@@ -0,0 +1,263 @@
+"""
+Spike detection that looks at each new sample once, instead of going back over the whole history every tick.
+
+a detector bank checks every channel of a sensor type at once. it keeps just enough state in arrays to judge the next
+sample of each channel (the running mean it takes the slope of, the rolling mean and deviation it compares against,
+...) so checking a sample costs a few array operations no matter how long the windows are or how many channels there
+are. three kinds are included:
+
+    ThresholdBank   - the value goes above "high" (or below "low")
+    RateBank        - the smoothed value changes faster than "rate" per second, in either direction
+    ZScoreBank      - the value is more than "z" standard deviations away from the rolling mean
+
+all of them fire once when an excursion starts and then stay quiet until it is over: the value has to come back inside
+the trigger level by the hysteresis margin (and stay there for "rearm" seconds) before the channel can fire again, so
+one spike gives one event instead of one per tick.
+
+    bank = ThresholdBank(len(AIN), high=1000, hysteresis=50)
+    fired = bank.update(t, values)          # True for the channels where this sample starts a spike
+
+the channel pipeline (see channelPipeline.py) makes the banks of each sensor type from its SensorType and turns what
+they fire into SpikeEvents for its spike capture.
+"""
+
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from math import nan
+import numpy as np
+
+SpikeEvent = namedtuple('SpikeEvent', ['type', 'channel', 'detector', 'time', 'value'])
+
+
+class DetectorBank(ABC):
+
+    """
+    The firing and re-arming logic for "channels" channels at once. "hysteresis" and "rearm" can be a single value or
+    one per channel. subclasses implement measure(t, values), which returns how far past the trigger level each
+    channel's sample is (>= 0 means triggered, nan means not enough data yet) in the units of the hysteresis margin
+    """
+
+    name = 'detector'
+
+    def __init__(self, channels: int, hysteresis=0, rearm=0):
+        self.channels = int(channels)
+        self.hysteresis = np.broadcast_to(np.asarray(hysteresis, dtype=np.float64), self.channels)
+        self.rearm = np.broadcast_to(np.asarray(rearm, dtype=np.float64), self.channels)
+        self.armed = np.ones(self.channels, dtype=bool)
+        self.allArmed = True
+        self.quietSince = np.full(self.channels, nan)
+        self.none = np.zeros(self.channels, dtype=bool)
+        self.none.flags.writeable = False
+
+    def update(self, t: float, values):
+        """
+        takes the next sample of every channel, "t" in seconds. returns a boolean array, True for the channels where
+        this sample starts a new excursion
+        """
+        level = self.measure(t, values)
+
+        # nearly every sample: nothing is waiting to re-arm and nothing reached its trigger level (nan never does)
+        if self.allArmed and not (level >= 0).any():
+            return self.none
+
+        valid = level == level
+        fired = valid & self.armed & (level >= 0)
+        waiting = valid & ~self.armed
+
+        # waits for the value to be back inside the trigger level by the hysteresis margin for "rearm" seconds
+        quiet = waiting & (level < -self.hysteresis)
+        self.quietSince[quiet & np.isnan(self.quietSince)] = t
+        self.quietSince[waiting & ~quiet] = nan
+        self.armed |= quiet & (t - self.quietSince >= self.rearm)
+
+        self.armed[fired] = False
+        self.quietSince[fired] = nan
+        self.allArmed = bool(self.armed.all())
+        return fired
+
+    @abstractmethod
+    def measure(self, t: float, values):
+        pass
+
+    def shift(self, seconds: float):
+        """
+        moves the times the bank remembers back by "seconds", for when the clock's origin is moved (at midnight) and
+        the times of new samples start over from 0
+        """
+        self.quietSince -= seconds
+
+    def reset(self):
+        self.armed[:] = True
+        self.allArmed = True
+        self.quietSince[:] = nan
+
+
+class ThresholdBank(DetectorBank):
+
+    """
+    fires when a channel reaches "high" or drops to "low", both are a value or one per channel (nan leaves that side out)
+    """
+
+    name = 'threshold'
+
+    def __init__(self, channels: int, high=nan, low=nan, hysteresis=0, rearm=0):
+        super().__init__(channels, hysteresis, rearm)
+        high = np.broadcast_to(np.asarray(high, dtype=np.float64), self.channels)
+        low = np.broadcast_to(np.asarray(low, dtype=np.float64), self.channels)
+        # a side that isn't used can never be reached
+        self.high = np.where(np.isnan(high), np.inf, high)
+        self.low = np.where(np.isnan(low), -np.inf, low)
+
+    def measure(self, t, values):
+        values = np.asarray(values, dtype=np.float64)
+        return np.fmax(values - self.high, self.low - values)
+
+
+class RateBank(DetectorBank):
+
+    """
+    fires when the mean of a channel's last "smoothing" samples changes by more than "rate" per second between two
+    samples, the mean is only used once the window is full so the slope isn't thrown off while it fills up. both can be
+    a value or one per channel. the means are kept as running sums over a 2D ring of the newest samples, which is summed
+    again from scratch every so often so rounding can't build up.
+    """
+
+    name = 'rate'
+
+    def __init__(self, channels: int, rate, smoothing=1, hysteresis=0, rearm=0):
+        super().__init__(channels, hysteresis, rearm)
+        self.rate = np.broadcast_to(np.asarray(rate, dtype=np.float64), self.channels)
+        self.smoothing = np.maximum(1, np.broadcast_to(np.asarray(smoothing, dtype=np.int64), self.channels))
+        self.rows = np.arange(self.channels)
+        self.window = np.zeros((self.channels, int(self.smoothing.max())))
+        self.clear()
+
+    def clear(self):
+        self.window[:] = 0
+        self.added = np.zeros(self.channels, dtype=np.int64)
+        self.sum = np.zeros(self.channels)
+        self.lastT = np.full(self.channels, nan)
+        self.lastMean = np.full(self.channels, nan)
+        self.sinceResync = 0
+
+    def measure(self, t, values):
+        values = np.asarray(values, dtype=np.float64)
+        present = values == values
+        slot = self.added % self.smoothing
+
+        # a slot that hasn't been filled yet is still 0, so it takes nothing off the sum
+        if present.all():
+            self.sum += values - self.window[self.rows, slot]
+            self.window[self.rows, slot] = values
+            self.added += 1
+        else:
+            self.sum += np.where(present, values - self.window[self.rows, slot], 0.0)
+            self.window[self.rows[present], slot[present]] = values[present]
+            self.added += present
+
+        self.sinceResync += 1
+        if self.sinceResync >= self.window.shape[1]:
+            self.resync()
+
+        mean = self.sum/self.smoothing
+        ready = present & (self.added >= self.smoothing)
+
+        # the first full window, or the clock started over, gives nan
+        with np.errstate(invalid='ignore', divide='ignore'):
+            level = np.where(ready & (t > self.lastT), np.abs((mean - self.lastMean)/(t - self.lastT)) - self.rate, nan)
+
+        if ready.all():
+            self.lastT[:] = t
+            self.lastMean[:] = mean
+        else:
+            self.lastT[ready] = t
+            self.lastMean[ready] = mean[ready]
+        return level
+
+    def shift(self, seconds: float):
+        super().shift(seconds)
+        self.lastT -= seconds
+
+    def resync(self):
+        used = np.arange(self.window.shape[1]) < self.smoothing[:, None]
+        full = self.added >= self.smoothing
+        self.sum = np.where(full, (self.window*used).sum(axis=1), self.sum)
+        self.sinceResync = 0
+
+    def reset(self):
+        super().reset()
+        self.clear()
+
+
+class ZScoreBank(DetectorBank):
+
+    """
+    fires when a channel's sample is more than "z" standard deviations from the mean of the "window" samples before it,
+    once there are at least "minSamples" of them. "z" can be a value or one per channel, the hysteresis is in standard
+    deviations. like RateBank the mean and deviation are running sums over a 2D ring of the newest samples, taken from
+    the window's own mean (which is moved every resync) so the sum of squares doesn't lose the small deviations of a
+    large value.
+    """
+
+    name = 'zscore'
+
+    def __init__(self, channels: int, z, window: int, minSamples: int = 10, hysteresis=0, rearm=0):
+        super().__init__(channels, hysteresis, rearm)
+        self.z = np.broadcast_to(np.asarray(z, dtype=np.float64), self.channels)
+        self.minSamples = max(2, int(minSamples))
+        self.rows = np.arange(self.channels)
+        self.window = np.zeros((self.channels, max(1, int(window))))
+        self.clear()
+
+    def clear(self):
+        self.window[:] = 0
+        self.added = np.zeros(self.channels, dtype=np.int64)
+        self.shift = np.full(self.channels, nan)
+        self.sum = np.zeros(self.channels)
+        self.squares = np.zeros(self.channels)
+        self.sinceResync = 0
+
+    def measure(self, t, values):
+        values = np.asarray(values, dtype=np.float64)
+        present = values == values
+        width = self.window.shape[1]
+
+        # the sample is judged against the window before it
+        count = np.minimum(self.added, width)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.sum/count
+            std = np.sqrt(np.maximum(self.squares - self.sum*mean, 0)/(count - 1))
+            level = np.where(present & (count >= self.minSamples) & (std > 0),
+                             np.abs(values - self.shift - mean)/std - self.z, nan)
+
+        # the first sample of a channel is where its sums are taken from until the next resync
+        new = present & np.isnan(self.shift)
+        if new.any():
+            self.shift[new] = values[new]
+
+        slot = self.added % width
+        leaving = present & (self.added >= width)
+        old = self.window[self.rows, slot] - self.shift
+        deviation = np.where(present, values - self.shift, 0.0)
+        self.sum += deviation - np.where(leaving, old, 0.0)
+        self.squares += deviation**2 - np.where(leaving, old**2, 0.0)
+        self.window[self.rows[present], slot[present]] = values[present]
+        self.added += present
+
+        self.sinceResync += 1
+        if self.sinceResync >= width:
+            self.resync()
+        return level
+
+    def resync(self):
+        count = np.minimum(self.added, self.window.shape[1])
+        used = np.arange(self.window.shape[1]) < count[:, None]
+        self.shift = np.where(count > 0, np.where(used, self.window, 0.0).sum(axis=1)/np.maximum(count, 1), self.shift)
+        deviations = np.where(used, self.window - self.shift[:, None], 0.0)
+        self.sum = deviations.sum(axis=1)
+        self.squares = (deviations**2).sum(axis=1)
+        self.sinceResync = 0
+
+    def reset(self):
+        super().reset()
+        self.clear()
@@ -1,12 +1,21 @@
-from labjack import ljm
+try:
+    from labjack import ljm
+except ImportError:
+    # without the LJM library the DAQ can still run on a stand-in backend, see the "backend" argument
+    ljm = None
 import sys
 import numpy as np
 from datetime import datetime, date
-from math import log, sqrt as ln, sqrt 
-from pandas import DataFrame
 import csv
-import os
-from threading import Thread, Timer
+from threading import Lock
+from conversions import RtdTable
+from rawArchive import RawArchive
+from ioWriter import IOWriter
+from dataFiles import SpikeCsvWriter
+from timeBase import TimeBase
+from channelPipeline import ChannelPipeline
+from instrumentation import profiler
+import channelConfig
 
 class DAQ():
 
@@ -15,408 +24,356 @@ class DAQ():
     this class is designed exclusivvely for converting voltages read from the labjack T7
     to values of temperature, magnetic field strength, and pressure.
 
-    the following functions "TData", "PData", and "MData" are all extremely similar in how they operate, 
-    they follow the following premise:
+    temperature, pressure and magnetics used to each have their own function (TData, PData and MData) doing the same
+    steps one sensor at a time. every sensor type now goes through one ChannelPipeline (see channelPipeline.py), which
+    does the following for all of the channels at once:
      - voltage of sensor is grabbed from the labjack and converted into its respective value
-     - the time of when the conversion took place is tracked in "timeData" list
-     - all sensor data are stored in a bundle of lists, where each list in the bundle corresponds to the
+     - the time of when the conversion took place is tracked in a "timeData" buffer, as int64 nanoseconds on one
+     monotonic clock shared by all three sensor types (see timeBase.py), taken when the voltages were read
+     - all sensor data are stored in a bundle of buffers, where each buffer in the bundle corresponds to the
      Data from ONE sensor
      - file lists are made in a similar way where it contains a bundle of sensor data, but it has been made so that
      filelists are only appended to once a minute, with the value appened being an average of data from the sensor
-     over that minute.
-     - the residual if statments are all meant ot regulate the size of each list so the code can run indefinetly without crashing
-     for example, to ensure smoothness, the lists containing the continuous data of the sensor will only contain a max of 15 min
-     of data at any time.
-
+     over that minute. the minimum, maximum and standard deviation over the minute are stored next to the average in
+     "<sensor> min", "<sensor> max" and "<sensor> std" columns, summed up in one go from the ring buffers when the
+     minute is over (see rollingStats.blockSummary), so nothing has to be done for them on every tick.
+     - the continuous data is kept in fixed size ring buffers (see ringBuffer.py) so the code can run indefinetly without crashing,
+     for example, to ensure smoothness, the buffers containing the continuous data of the sensor will only contain a max of 15 min
+     of data at any time. once a buffer is full the oldest value is overwritten instead of popping it off the front of a list.
+
+    startPipeline sets the pipeline up for the inputs of a run, then step reads and processes one tick (or streamStep
+    one stream block) and returns which sensor types got new data. the buffers are in pipeline.timeData, pipeline.Data
+    and pipeline.filelist by sensor type.
     """
 
     ###############################
     # INITIALIZATIONS FOR TEMP
     ###############################
 
-    timeDataT= []
-    filelistT1 = []
-    spikeTimeT = []
-    spikeThreadRunningT = True
+    # a temperature spike is when the 2 minute average changes by more than this many degrees a second
+    tempRate = 0.02
 
-    
-    
+    # the temperature spike check looks at the average over this many seconds
+    rateSmoothingT = 60*2
 
 
     ###############################
     # INITIALIZATIONS FOR PRESSURE
     ###############################
 
+    # a pressure spike is when the pressure reaches "threshold", it has to drop back below it by "thresholdHysteresis"
+    # before another one can be recorded
     threshold = 1000
-    
-    spikeTimeP = []
-    timeDataP = []
-    filelistP1 = []
-    
+    thresholdHysteresis = 50
 
 
     ###############################
-    # INITIALIZATIONS FOR MAGNETICS
+    # INITIALIZATIONS FOR EVERY TYPE
     ###############################
 
+    # when set, a sample more than "zScore" standard deviations from the mean of the "zScoreWindow" seconds before it is
+    # also a spike, on every sensor type (see spikeDetection.ZScoreBank). it has to come back within
+    # zScore - zScoreHysteresis deviations before that channel can fire again
+    zScore = None
+    zScoreWindow = 60
+    zScoreHysteresis = 1
+
+
+    ###############################
+    # INITIALIZATIONS FOR STREAMING
+    ###############################
 
-    timeDataM = []
-    filelistM1 = []
-    spikeThreadRunningP = True
+    # value the LJM library puts in place of a sample the device skipped (buffer overflow, etc.)
+    skippedSample = -9999.0
 
+    streaming = False
+    streamAIN = []
+    streamOrder = None
 
 
 
+    # how long each kind of history is kept for, in seconds
+    historyLength = 60*15
 
-    def __init__(self):
-        self.handle = ljm.openS("T7", "ANY", "ANY")
-        self.start=datetime.now()
 
-    def TData(self,AIN : dict, Data: dict, ResValues: dict, spikeData, derAvg: dict ,filelist: dict, fileBufferList: dict):
+    def __init__(self, tempPeriod: float = 1, pressPeriod: float = 1/3, magPeriod: float = 1, rtdTable: bool = False, writer: IOWriter = None, backend=None):
         """
-        This function grabs temperature from the RTD
-        by taking the recorded voltage from the RTD and using  
-        the "lineraized" relationship between the voltage that 
-        a PT100 RTD outputs and temeperature.
-            
-        This process is ran repeatedly on the GUI code. the function outputs 
-        four lists. the first tracks each second the code is being ran the second
-        is a list with as many lists as analog inputs being used with RTD's, storing 
-        temperature from each RTD in a seperate list, but all lists are bundled together
-        in 
-
-        The relationship between voltage and temperature for a PT100
-        can be found here https://blog.beamex.com/pt100-temperature-sensor#Pt100-sensors
+        opens the labjack and sets up the time histories. the periods are how often each sensor type gets sampled,
+        which decides how many samples the ring buffers need to hold (a sensor type with no period here is sampled
+        every tick, see startPipeline).
 
-        parameters are:
+        if "rtdTable" is True, RTD temperatures are looked up in a precomputed table (see conversions.RtdTable), which
+        is also correct below 0 C, instead of solving the Callendar Van-Dusen quadratic
+
+        spike files and the raw archive are written on the "writer" thread (see ioWriter.py), if none is given the DAQ
+        starts its own and stops it in stopRun
+
+        "backend" is the module (or object) the LJM calls go to, the labjack ljm module unless something that stands
+        in for it is given, for example to benchmark without a device (see benchmark_DAQ.py)
+        """
+        self.ljm = backend if backend is not None else ljm
+        if self.ljm is None:
+            raise ImportError('the LabJack LJM library (labjack-ljm) is not installed')
+
+        self.handle = self.ljm.openS("T7", "ANY", "ANY")
+        self.periods = {'Temp': tempPeriod, 'Pressure': pressPeriod, 'Mag': magPeriod}
+
+        # every sample is stamped from this clock, it starts over from 0 at midnight (see readScan)
+        self.clock = TimeBase()
+        self.stamp = 0
+        self.day = 0
+
+        # the ChannelPipeline of the run, made by startPipeline
+        self.pipeline = None
 
-         AIN - list of analog inputs connected to a RTD
+        self.rtdTable = RtdTable() if rtdTable else None
 
-         Data - list with as many empty lists at analog inputs used
+        # raw archives of every sample, by sensor type (see startArchive)
+        self.archives = {}
 
-         ResValues - list containing the resistence values each wire contributes at each input; this MUST correspond
-         exactly with the order of the list AIN
+        # the 1 second, 1 minute and 1 hour history of every sensor, by sensor type and then input
+        self.history = {'Temp': {}, 'Pressure': {}, 'Mag': {}}
 
-         filelist - list that will be used to write csv files contianing the data (uploads once a minute containing an average
-         of the data over that minute)
+        self.ownsWriter = writer is None
+        if writer is None:
+            writer = IOWriter()
+            writer.start()
+        self.writer = writer
+        if 'Spike' not in self.writer.sinks:
+            self.writer.addSink('Spike', SpikeCsvWriter())
 
-         list - a buffer list which will be used to create the averages needed in filelist
+        # every read from the device goes through this lock so only one thread is using the handle at a time
+        self.lock = Lock()
 
+        # the ChannelConfig each input was set up with by configureChannels
+        self.channels = {}
+
+    def readScan(self, AIN: list):
+        """
+        Reads every analog input in "AIN" with a single eReadNames call, so the device is only asked once per tick
+        no matter how many sensors are connected, instead of once per channel.
+
+        the time of the read is kept in "stamp" and every sample from this read is stamped with it, so the sensor
+        types line up. the first read after midnight moves the clock's origin to now, and the pipeline clears the
+        graphs when it sees the new day.
+
+        returns the voltages as a numpy array in the order of AIN
+        """
+        with self.lock:
+            if self.clock.rollover():
+                self.day += 1
+            timer = profiler.start()
+            start = self.clock.now()
+            voltages = self.ljm.eReadNames(self.handle, len(AIN), AIN)
+            # the middle of the read is the best guess at when the device sampled
+            self.stamp = (start + self.clock.now())//2
+            profiler.stop('acquire', timer, len(AIN))
+
+        return np.asarray(voltages, dtype=np.float64)
+
+    def readAll(self, AIN: list):
+        """
+        like readScan, but returns a dictionary of the voltage at each analog input
         """
+        return dict(zip(AIN, self.readScan(AIN).tolist()))
+
+    def startPipeline(self, AIN: dict, settings: dict = None, periods: dict = None):
+        """
+        sets up the ChannelPipeline for a run (see channelPipeline.py). "AIN" has the inputs of each sensor type
+        ({'Temp': AINT, 'Pressure': AINP, 'Mag': AINM}), "settings" anything a sensor type needs on top
+        ({'Temp': ResValues}) and "periods" the period of any sensor type that isn't one of the three given to
+        __init__, or should differ from it.
+
+        the fastest period is the tick, a slower sensor type is processed every so many ticks. the pipeline's spike
+        captures and staged samples from a run before are written out first
+        """
+        if self.pipeline is not None:
+            self.pipeline.close()
+
+        periods = {**self.periods, **(periods or {})}
+        used = [periods[type] for type, channels in AIN.items() if channels and type in periods]
+        self.tickPeriod = min(used) if used else min(self.periods.values())
+        every = {type: max(1, round(periods.get(type, self.tickPeriod)/self.tickPeriod)) for type in AIN}
 
+        self.pipeline = ChannelPipeline(self, AIN, self.tickPeriod, every, settings)
+        return self.pipeline
 
-        self.stop = datetime.now()
-        self.time = (self.stop-self.start).seconds + float((self.stop-self.start).microseconds)/1000000
-       
-        #stores the time this iteration of the loop was ran
-        self.timeDataT.append(self.time)
-        self.spikeTimeT.append(self.stop.strftime('%H:%M:%S'))
-
-        # initializes constants used in the Callendar Van-Durst equation
-        A = 3.9083e-3
-        B = -5.775e-7
-        Rfixed = 1000
-        Res0 = 100
-        
-        # For each input, convert the voltage received to temperature, storing them in seperate lists for each sensor
-        for sensor in AIN:
-            voltage = ljm.eReadName(self.handle,sensor)
-            Rtd = (Rfixed*(2.5-voltage))/voltage
-            Res = Rtd - ((3/2)*ResValues[sensor])
-            TempC = (-A+sqrt(A**2-4*B*(1-Res/Res0)))/(2*B)
-
-            # All lists dealing with acquiring data
-            Data[sensor].append(TempC)
-            spikeData[sensor].append(TempC)
-            #"fileBufferList" is a list that is used to average out data used in the file
-            fileBufferList[sensor].append(TempC)
-
-
-        # regulates the list to not store values longer then 15min
-        if self.time >= 60*15:
-            self.timeDataT.pop(0)
-            for sensor in Data.values():
-                sensor.pop(0)
-            
-
-        # appends data to file lists every minute
-        if self.stop.second == 0:
-            self.filelistT1.append(self.stop.strftime('%H:%M'))
-            for sensor in AIN:
-                #stores the averaged out values of list in filelist
-                filelist[sensor].append(
-                    round(sum(fileBufferList[sensor])/len(fileBufferList[sensor]),3)
-                    )
-
-        # this loop sets the size of the lists being written to the spike file as well as the list used to take derivatives
-        if self.time>= 60*2:
-            self.spikeTimeT.pop(0)      
-            for sensor in AIN:
-                
-                # the derAvg sensor sums up the all the data from the sensor in the previous 2 minutes, averages them out to clear out any noise,
-                # appends it, and then stores them into a list which will later take the derivative of this
-                derAvg[sensor].append(sum(spikeData[sensor])/len(spikeData[sensor]))
-
-                spikeData[sensor].pop(0)
-
-                # at any given time the list will only have 2 min worth of derivative Data
-                if self.time >= 4*60:
-                    derAvg[sensor].pop(0)
-
-                    
-
-        #sets size of fileBuffer list to only have a minute worth of Data
-        if self.time>= 60:
-            for sensor in fileBufferList.values():
-                sensor.pop(0)
-                    
- 
-        # since filelistx is only storing the minute each point is being appended to file list, at the beginning of the hour it must be reset, with file list as well
-        # this is because a new file gets created every hour
-        if self.stop.minute == 0 and self.stop.second==0:
-            self.filelistT1.clear()
-            for sensor in filelist.values():
-                sensor.clear()
-        
-        # Resets all graphical data at the beginning of the day
-        if (self.stop.hour, self.stop.minute, self.stop.second) == (0,0,0):
-            self.timeDataT.clear()
-            for sensor in Data.values():
-                sensor.clear()
-            self.start = datetime.now()
-
-
-        #function for checking spike is called here
-        self.derivativeFunction(spikeData,derAvg,AIN)
-        
-        return self.timeDataT, Data, self.filelistT1, filelist
-
-    def PData(self,AIN : dict, Data: dict, filelist: dict, fileBufferList: dict,spikeData : dict):
+    def step(self, tick: int):
+        """
+        reads every input of the pipeline once and processes it, "tick" counts the calls so slower sensor types are
+        only processed on their ticks. returns the sensor types that got new data this tick
+        """
+        voltages = self.readScan(self.pipeline.names)
+        return self.pipeline.tick(tick, self.stamp, voltages)
 
+    def streamStep(self):
+        """
+        reads the next block from a stream started with startStream and processes it. the pipeline should have been
+        started with every sensor type at the scan period (periods={type: 1/scanRate}), since a stream samples
+        every input on every scan. returns the sensor types that got new data and the device and LJM backlogs
         """
-        This class is used to convert the voltage given by the TP-020 Ion pump to a pressure. 
-        The analog input range of the Labjack must be kept at +-0.01V for the best resoltution.
-    
-        The class works by aquiring the voltage from the ion pump and using the linear relationship 
-        between voltage and current to find current. we then use the logarithmic relationship between 
-        current and pressure to find pressure.
-    
-        Similar to the DAQ, this process is ran repeatedly in the GUI code
+        if self.streamOrder is None:
+            raise ValueError('streamStep needs startPipeline to be called before startStream')
+        times, block, deviceBacklog, ljmBacklog = self.readStreamBlock()
+        if self.clock.rollover():
+            self.day += 1
+
+        stamps = self.streamStartEpochNs - self.clock.wallOriginNs + np.round(times*1e9).astype(np.int64)
+        if len(stamps):
+            self.stamp = int(stamps[-1])
+        return self.pipeline.block(stamps, block[:, self.streamOrder]), deviceBacklog, ljmBacklog
+
+    def startArchive(self, type: str, AIN: list, **kwargs):
+        """
+        starts writing every converted sample of a sensor type ('Temp', 'Pressure' or 'Mag') to the raw archive
+        (see rawArchive.py), not just the minute averages. any extra arguments are passed on to RawArchive.
+        """
+        if type in self.archives:
+            self.archives[type].close()
+        self.archives[type] = RawArchive(type, AIN, self.writer, **kwargs)
+
+
+
+    def configureChannels(self, plan: dict):
         """
-        
-        self.stop = datetime.now()
-        self.time = (self.stop-self.start).seconds + float((self.stop-self.start).microseconds)/1000000
-
-        #stores the time this iteration of the loop was ran        
-        self.timeDataP.append(self.time)        
-        self.spikeTimeP.append(self.stop.strftime('%H:%M:%S'))
-        
-        # For each input, convert the voltage received to pressure, storing them in seperate lists for each sensor
-        for sensor in AIN:
-            voltage = ljm.eReadName(self.handle,sensor)
-            pressure = (10**(-0.74))*(voltage)
-            Data[sensor].append(pressure)
-            # "fileBufferList" is a buffer list whos purpose is just to get an average of all the values inside it, to then store it in filelist
-            fileBufferList[sensor].append(pressure)
-
-            # this list is only used when a spike is recorded in the graph
-            
-            spikeData[sensor].append(pressure)
-            if pressure >= self.threshold:
-                spikeThread = Timer(60,self.storeSpike,args=[spikeData,self.spikeTimeP,AIN, 'Pressure'])
-                if self.spikeThreadRunningP == True:
-                    self.spikeThreadRunningP = False
-                    print('Pressure spike detected at %s!' %self.stop.strftime('%H:%M:%S'))
-
-                    spikeThread.start()
-
-        #print(len(spikeData[0]),len(self.spikeTime))
-
-        
-        # regulates the list to not store values longer then 15min                 
-        if self.time >= 60*15:
-            self.timeDataP.pop(0)
-            for sensor in Data.values():
-                sensor.pop(0)
-
-        # appends data to file lists every minute
-        if self.stop.second == 0:
-            self.filelistP1.append(self.stop.strftime('%H:%M'))
-            #stores the averaged out values of list in filelist
-            for sensor in AIN:
-                filelist[sensor].append(
-                    round(sum(fileBufferList[sensor])/len(fileBufferList[sensor]),1)
-                    
-                    )
-
-        #sets size of fileBuffer list to only have a minute worth of Data
-        if self.time>= 60:
-            for sensor in AIN:
-                fileBufferList[sensor].pop(0)
-
-        # since filelistx is only storing the minute each point is being appended to file list, at the beginning of the hour it must be reset, with file list as well
-        # this is because a new file gets created every hour
-        if self.stop.minute == 0 and self.stop.second==0:
-            self.filelistP1.clear()
-            for sensor in filelist.values():
-                sensor.clear()
-        
-        # Resets all graphical data at the beginning of the day
-        if (self.stop.hour, self.stop.minute, self.stop.second) == (0,0,0):
-            self.timeDataP.clear()
-            for sensor in Data.values():
-                sensor.clear()
-            self.start = datetime.now()
-
-
-
-        # stores spike data only up to 3 minutes
-        if self.time>= 60*3:
-            self.spikeTimeP.pop(0)
-            for sensor in spikeData.values():
-                sensor.pop(0)
-
-        # if a spike is recorded trigger a thread to store the data
-            
-        return self.timeDataP, Data, self.filelistP1, filelist
-
-    
-    def MData(self,AIN : list, Data: list, filelist: list, fileBufferList: list):
+        sets the range, resolution index, settling time and negative channel of every input in "plan" (input ->
+        ChannelConfig, see channelConfig.py) with one eWriteNames. this is done once when the run starts, in stream mode
+        the ranges and negative channels still apply but the stream's own resolution and settling are used
         """
-        This function converts analog input voltage into a Gaussian measurement. the correlation between
-        received voltage and field strength ois given on the magcheck-95, which states 1mV AC= 1mG
+        with self.lock:
+            channelConfig.apply(self.ljm, self.handle, plan)
+        self.channels = dict(plan)
 
-        this is also looped in the GUI to produce a graph
+    def profileChannel(self, channel: str, candidates: list, reads: int = 20):
         """
-        
-        #stores the time this iteration of the loop was ran
-        self.stop = datetime.now()
-        self.time = (self.stop-self.start).seconds + float((self.stop-self.start).microseconds)/1000000
-        self.timeDataM.append(self.time)
-        
-        # For each input, convert the voltage received to field strength, storing them in seperate lists for each sensor
-        for sensor in AIN:
-
-            voltage = ljm.eReadName(self.handle,sensor)
-            flux = voltage
-            Data[sensor].append(flux)
-
-            # "fileBufferList" is a buffer list whos purpose is just to get an average of all the values inside it, to then store it in filelist
-            fileBufferList[sensor].append(flux)
-
-           
-        #self.MagData.append(flux)
-
-        # regulates the list to not store values longer then 15min   
-        if self.time >= 60*15:
-            self.timeDataM.pop(0)
-            for sensor in Data.values():
-                sensor.pop(0)
-
-        # appends data to file lists every minute
-        if self.stop.second == 0:
-            self.filelistM1.append(self.stop.strftime('%H:%M'))
-            #stores the averaged out values of list in filelist
-            for sensor in AIN:
-                filelist[sensor].append(
-                    (round((sum(fileBufferList[sensor])/len(fileBufferList[sensor])),6))*1000
-                    )
-
-        #sets size of fileBuffer list to only have a minute worth of Data
-        if self.time>= 60:
-            for sensor in fileBufferList.values():
-                sensor.pop(0)
-
-        # since filelistx is only storing the minute each point is being appended to file list, at the beginning of the hour it must be reset, with file list as well
-        # this is because a new file gets created every hour
-        if self.stop.minute == 0 and self.stop.second==0:
-            self.filelistM1.clear()
-            for sensor in filelist.values():
-                sensor.clear()
-        
-        # Resets all graphical data at the beginning of the day
-        if (self.stop.hour, self.stop.minute, self.stop.second) == (0,0,0):
-            self.timeDataM.clear()
-            for sensor in Data.values():
-                sensor.clear()
-
-            self.start = datetime.now()
-
-        return self.timeDataM, Data, self.filelistM1, filelist
-
-    
-
-    def storeSpike(self,spikeData: dict, timeData: list, AIN: list, type: str):
+        measures what each ChannelConfig in "candidates" costs per read of "channel" (see channelConfig.profile), and
+        puts the channel back the way configureChannels set it
         """
-        This function is responsible for what happens when a spike is recorded, whether by value in the case of 
-        pressure, or by derivative in the case of temp. 
+        restore = self.channels.get(channel, channelConfig.ChannelConfig())
+        with self.lock:
+            return channelConfig.profile(self.ljm, self.handle, channel, candidates, reads, restore)
 
-        The function adds data to a spike folder and spikefile formatted in similar fashion to the fileWriter function in the GUI
-        but instead it logs data everysecond as apposed to every minute
-        
-        
+    def startStream(self, AIN: list = None, scanRate: float = 1000, scansPerRead: int = None):
         """
+        Starts the T7 in stream mode. instead of asking the device for each voltage with eReadName (one USB/Ethernet
+        round trip per channel per tick), the device samples every channel in "AIN" on its own clock and we
+        pull the samples out in blocks with readStream.
+
+        parameters are:
 
-        row = spikeData.copy()
+         AIN - list of every analog input to put in the scan list, normally AINT + AINP + AINM. if left out the
+         inputs of the pipeline are streamed
 
-        now = datetime.now()
+         scanRate - scans per second (one scan = one sample from every channel in AIN)
 
-        row.update({'Time': timeData.copy()})
+         scansPerRead - how many scans each call to readStream returns, defaults to a tenth of a second of data
 
-    
-        df = DataFrame(row)
+        returns the scan rate the device actually ended up using, which can differ slightly from the one asked for
+        """
+        if self.streaming:
+            self.stopStream()
+
+        if scansPerRead is None:
+            scansPerRead = max(1, int(scanRate/10))
+
+        # internal clock, no triggering, and let the device pick settling and resolution so the scan rate is honoured
+        names = ['STREAM_TRIGGER_INDEX', 'STREAM_CLOCK_SOURCE', 'STREAM_SETTLING_US', 'STREAM_RESOLUTION_INDEX']
+        self.ljm.eWriteNames(self.handle, len(names), names, [0, 0, 0, 0])
+
+        if AIN is None:
+            if self.pipeline is None:
+                raise ValueError('startStream needs a list of inputs when no pipeline has been started')
+            AIN = self.pipeline.names
+        self.streamAIN = list(AIN)
+        # where each input of the pipeline is in the scan list, for streamStep
+        self.streamOrder = None
+        if self.pipeline is not None:
+            missing = [sensor for sensor in self.pipeline.names if sensor not in self.streamAIN]
+            if missing:
+                raise ValueError('the scan list is missing inputs of the pipeline: %s' %', '.join(missing))
+            self.streamOrder = np.array([self.streamAIN.index(sensor) for sensor in self.pipeline.names], dtype=np.intp)
+        scanList = self.ljm.namesToAddresses(len(self.streamAIN), self.streamAIN)[0]
+
+        self.scanRate = self.ljm.eStreamStart(self.handle, scansPerRead, len(self.streamAIN), scanList, scanRate)
+        self.scansPerRead = scansPerRead
+        self.scanCount = 0
+        self.streamStart = datetime.now()
+        self.streamStartNs = self.clock.now()
+        self.streamStartEpochNs = self.clock.epochNs(self.streamStartNs)
+        self.streaming = True
+
+        print('Stream started at %s scans/s' %self.scanRate)
+        return self.scanRate
+
+    def readStreamBlock(self):
+        """
+        Grabs the next block of scans from a stream started with startStream. this blocks until "scansPerRead" scans
+        are available.
 
-        mypath = 'C:\\Users\\Bentim\\Documents\\TEM Data\\%s Data\\Spike Data\\%s' %(type,now.strftime('%b %d, %Y'))
-        if not os.path.exists(mypath):
-            os.makedirs(mypath)
-        
-        with open(mypath + '\\ %s Data at %s;%s .csv' %(type, now.strftime('%H'), now.strftime('%M')), 'w+') as csvfile:
-            df.to_csv(csvfile, index=False)
-  
+        the device hands back one flat list with the channels interleaved (AIN0, AIN2, AIN3, AIN0, AIN2, ...), so it is
+        reshaped into one row per scan, with a column for each input in the scan list.
 
-        print('Spike has been recorded')
+        since the samples are hardware timed, the time of each scan is worked out from the scan count and scan rate
+        instead of asking the computer clock, so the spacing between samples is exact.
 
+        returns:
 
-        if self.spikeThreadRunningP == False:
-            self.spikeThreadRunningP = True
-        if self.spikeThreadRunningT == False:
-            self.spikeThreadRunningT = True
+         times - numpy array of when each scan was taken, in seconds since the stream started
 
-    def derivativeFunction(self,spikeData, derAvg, AIN):
+         block - numpy array of voltages with one row per scan; skipped samples are nan
+
+         deviceBacklog, ljmBacklog - how many scans are still waiting on the device and in the LJM buffer, if these
+         keep growing the computer is not keeping up with the scan rate
         """
-        This function is used exclusively for temperature.
-        
-        the goal of this funciton is to take the derivatve of "derAvg" and depedning on its value 
-        it will pass the data from "spikeData" into the "storeSpike" function"""
-        for sensor in AIN:
-            if len(derAvg[sensor])>=3:
-                dydx = np.gradient(derAvg[sensor])
-                # find a way to delete data so that the same element in dydx doesnt keep triggering the spike funciton
+        timer = profiler.start()
+        aData, deviceBacklog, ljmBacklog = self.ljm.eStreamRead(self.handle)
+        profiler.stop('acquire', timer, len(aData))
 
-                if dydx[-1]>= 0.02 or dydx[-1]<=-0.02:
-                        spikeThread = Timer(60, self.storeSpike, args = [spikeData,self.spikeTimeT,AIN, 'Temp'])
-                        if self.spikeThreadRunningT == True:
-                            self.spikeThreadRunningT = False
-                            print('Temperature spike detected at %s!' %self.stop.strftime('%H:%M:%S'))
-                            spikeThread.start()
+        block = np.asarray(aData, dtype=np.float64).reshape(-1, len(self.streamAIN))
+        block[block == self.skippedSample] = np.nan
 
+        scans = block.shape[0]
+        times = (self.scanCount + np.arange(scans))/self.scanRate
+        self.scanCount += scans
 
+        return times, block, deviceBacklog, ljmBacklog
 
-    def stopRun(self):
+    def readStream(self):
         """
-        resets all time-related data, when used in conjunction with the stop run of the GUI, it will reset the graphs and their data
+        like readStreamBlock, but the block is split into a contiguous numpy array for each channel, returned as a
+        dictionary by input
         """
-        # FOR TEMP
-        self.timeDataT.clear()
-        #self.filelistT1.clear()
+        times, block, deviceBacklog, ljmBacklog = self.readStreamBlock()
 
+        # transposing and copying once gives each channel its own contiguous array
+        columns = np.ascontiguousarray(block.T)
+        Data = dict(zip(self.streamAIN, columns))
 
-        # FOR PRESSURE
-        self.timeDataP.clear()
-        #self.filelistP1.clear()
+        return times, Data, deviceBacklog, ljmBacklog
+
+    def stopStream(self):
+        """
+        stops stream mode, after this the channels can be read with eReadName again
+        """
+        if self.streaming:
+            self.streaming = False
+            self.ljm.eStreamStop(self.handle)
+            print('Stream stopped')
+
+    def stopRun(self):
+        """
+        resets all time-related data, when used in conjunction with the stop run of the GUI, it will reset the graphs and their data
+        """
+        self.stopStream()
 
-        # FOR MAG
-        self.timeDataM.clear()
-        #self.filelistM1.clear()
+        # spikes still collecting are written out with what they have, and the staged samples go to the archives
+        if self.pipeline is not None:
+            self.pipeline.close()
+            self.pipeline = None
 
+        for archive in self.archives.values():
+            archive.close()
+        self.archives.clear()
 
+        if self.ownsWriter:
+            self.writer.close()
@@ -0,0 +1,111 @@
+import gzip
+import os
+import time
+import pytest
+import archiveRotation
+from datetime import date, datetime, timedelta
+from archiveRotation import ArchiveRotator, openArchive, findArchive, archiveName
+
+
+def write(path: str, text: str):
+    with open(path, 'w', newline='') as file:
+        file.write(text)
+
+
+def read(path: str):
+    with openArchive(path) as file:
+        return file.read()
+
+
+def test_compress_keeps_the_csv(tmp_path):
+    path = str(tmp_path/'Temp at 3.csv')
+    write(path, 'AIN0,Time\r\n1.5,03:00\r\n1.6,03:01\r\n')
+
+    ArchiveRotator(str(tmp_path), pause=0).compress(path)
+
+    assert not os.path.exists(path)
+    assert findArchive(path) == path + '.gz'
+    assert archiveName(path + '.gz') == path
+    assert read(path) == 'AIN0,Time\r\n1.5,03:00\r\n1.6,03:01\r\n'
+
+
+def test_csv_written_after_compression_is_merged(tmp_path):
+    path = str(tmp_path/'Temp at 1.csv')
+    rotator = ArchiveRotator(str(tmp_path), pause=0)
+    write(path, 'AIN0,Time\r\n1.5,01:00\r\n')
+    rotator.compress(path)
+
+    # the writer opens the file again and starts it with the header
+    write(path, 'AIN0,Time\r\n1.7,01:58\r\n1.8,01:59\r\n')
+    rotator.compress(path)
+
+    assert not os.path.exists(path)
+    assert read(path) == 'AIN0,Time\r\n1.5,01:00\r\n1.7,01:58\r\n1.8,01:59\r\n'
+
+
+def test_csv_already_in_the_archive_is_removed(tmp_path):
+    path = str(tmp_path/'Temp at 1.csv')
+    write(path, 'AIN0,Time\r\n1.5,01:00\r\n')
+    with gzip.open(path + '.gz', 'wb') as output:
+        output.write(b'AIN0,Time\r\n1.5,01:00\r\n')
+
+    # a pass that stopped between the rename and removing the csv
+    ArchiveRotator(str(tmp_path), pause=0).compress(path)
+
+    assert not os.path.exists(path)
+    assert read(path) == 'AIN0,Time\r\n1.5,01:00\r\n'
+
+
+def test_only_closed_hours_are_compressed(tmp_path):
+    rotator = ArchiveRotator(str(tmp_path), grace=60, pause=0)
+    now = datetime.now()
+    earlier = now - timedelta(hours=2)
+    path = str(tmp_path/'x.csv')
+    write(path, '')
+
+    assert rotator.closed(earlier.date(), 'Temp at %s.csv' %earlier.hour, path, time.time())
+    assert not rotator.closed(now.date(), 'Temp at %s.csv' %now.hour, path, time.time())
+    assert not rotator.closed(now.date(), 'notes.csv', path, time.time())
+
+
+def test_rotate_goes_through_the_day_folders(tmp_path):
+    day = date.today() - timedelta(days=1)
+    folder = tmp_path/'Temp Data'/day.strftime('%b %d, %Y')
+    folder.mkdir(parents=True)
+    write(str(folder/'Temp at 5.csv'), 'AIN0,Time\r\n1.5,05:00\r\n')
+
+    rotator = ArchiveRotator(str(tmp_path), grace=0, pause=0)
+    assert rotator.rotate() == 1
+    assert os.listdir(folder) == ['Temp at 5.csv.gz']
+    assert rotator.stats()['compressed'] == 1
+
+
+def test_open_archive_reads_a_compressed_csv(tmp_path):
+    path = str(tmp_path/'Pressure at 7.csv')
+    with gzip.open(path + '.gz', 'wb') as output:
+        output.write(b'AIN3,Time\r\n0.001,07:00\r\n')
+
+    for name in (path, path + '.gz'):
+        with openArchive(name) as file:
+            assert file.read().splitlines() == ['AIN3,Time', '0.001,07:00']
+
+
+def test_open_archive_prefers_the_csv(tmp_path):
+    path = str(tmp_path/'Pressure at 7.csv')
+    write(path, 'AIN3,Time\r\n0.002,07:01\r\n')
+    with gzip.open(path + '.gz', 'wb') as output:
+        output.write(b'AIN3,Time\r\n')
+    assert read(path + '.gz') == 'AIN3,Time\r\n0.002,07:01\r\n'
+
+
+def test_open_archive_of_a_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        openArchive(str(tmp_path/'Pressure at 7.csv'))
+
+
+def test_open_archive_needs_zstandard_for_zst(tmp_path, monkeypatch):
+    path = str(tmp_path/'Pressure at 7.csv')
+    write(path + '.zst', '')
+    monkeypatch.setattr(archiveRotation, 'zstandard', None)
+    with pytest.raises(ImportError):
+        openArchive(path)
@@ -0,0 +1,152 @@
+import numpy as np
+import pytest
+from benchmark_DAQ import FakeLJM
+from streamTest_T7 import DAQ
+
+period = 10**9//3
+
+
+class Writer():
+
+    # stands in for an IOWriter, keeps what is submitted
+    def __init__(self):
+        self.sinks = {'Spike': None}
+        self.submitted = []
+
+    def addSink(self, name, sink):
+        self.sinks[name] = sink
+
+    def submit(self, name, item):
+        self.submitted.append((name, item))
+        return True
+
+
+@pytest.fixture
+def daq():
+    daq = DAQ(1/3, 1/3, 1/3, writer=Writer(), backend=FakeLJM({}))
+    # whole minutes, so the blocks below don't run into a new one
+    daq.clock.wallOriginNs = (daq.clock.wallOriginNs//(60*10**9))*60*10**9
+    return daq
+
+
+def spikes(daq):
+    return [item for name, item in daq.writer.submitted if name == 'Spike']
+
+
+def pressureBlock(scans, spikesAt=()):
+    # 0.005 V is about 0.001 Torr, 6000 V is over the 1000 threshold
+    voltages = np.full((scans, 1), 0.005)
+    voltages[list(spikesAt), 0] = 6000
+    return voltages
+
+
+def test_block_capture_keeps_every_scan(daq):
+    pipeline = daq.startPipeline({'Pressure': ['AIN3']})
+    stamps = np.arange(60, dtype=np.int64)*period + 10**9
+
+    pipeline.block(stamps[:20], pressureBlock(20, [5]))
+    # a second spike while the first is still being collected
+    pipeline.block(stamps[20:40], pressureBlock(20, [3]))
+    pipeline.block(stamps[40:], pressureBlock(20))
+    pipeline.close()
+
+    rows, = spikes(daq)
+    times = rows.columns['Time']
+    assert np.all(np.diff(times) == period)
+    assert times[0] == daq.clock.epochNs(stamps[0])
+    assert times[-1] == daq.clock.epochNs(stamps[-1])
+    assert len(rows.columns['AIN3']) == len(times)
+
+
+def test_block_pre_window_ends_at_trigger(daq):
+    pipeline = daq.startPipeline({'Pressure': ['AIN3']})
+    stamps = np.arange(300, dtype=np.int64)*period + 10**9
+
+    pipeline.block(stamps[:20], pressureBlock(20, [5]))
+    for start in range(20, 300, 20):
+        pipeline.block(stamps[start:start + 20], pressureBlock(20))
+    pipeline.close()
+
+    rows, = spikes(daq)
+    times = rows.columns['Time']
+    # scans 0-5 are the pre window and the 60 s post window (180 scans) starts after scan 5
+    assert list(times) == list(daq.clock.epochNs(stamps[:6 + 180]))
+    assert rows.columns['AIN3'][5] > 1000
+
+
+def test_tick_and_block_give_the_same_minute_rows(daq):
+    other = DAQ(1/3, 1/3, 1/3, writer=Writer(), backend=FakeLJM({}))
+    other.clock.wallOriginNs = daq.clock.wallOriginNs
+    AIN = {'Temp': ['AIN0'], 'Pressure': ['AIN3'], 'Mag': ['AIN2']}
+    ticked = daq.startPipeline(AIN, {'Temp': {'AIN0': 1.08}})
+    blocked = other.startPipeline(AIN, {'Temp': {'AIN0': 1.08}})
+
+    rng = np.random.default_rng(0)
+    scans = 3*60*3
+    stamps = np.arange(scans, dtype=np.int64)*period + 10**9*45
+    voltages = np.column_stack([2.255 + 0.001*rng.normal(size=scans), 0.005 + 0.0001*rng.normal(size=scans), 0.05 + 0.01*rng.normal(size=scans)])
+    voltages[100, 2] = np.nan
+
+    for tick in range(scans):
+        ticked.tick(tick, int(stamps[tick]), voltages[tick])
+    for start in range(0, scans, 50):
+        blocked.block(stamps[start:start + 50], voltages[start:start + 50])
+
+    for type in AIN:
+        assert len(ticked.filelist[type]['Time']) == 3
+        assert ticked.filelist[type] == blocked.filelist[type]
+
+
+def test_stream_needs_the_pipeline_inputs(daq):
+    with pytest.raises(ValueError):
+        daq.startStream()
+    daq.startStream(['AIN3'], scanRate=30)
+    with pytest.raises(ValueError):
+        daq.streamStep()
+    daq.stopStream()
+
+    daq.startPipeline({'Pressure': ['AIN3'], 'Temp': ['AIN0']})
+    with pytest.raises(ValueError):
+        daq.startStream(['AIN3'], scanRate=30)
+    assert not daq.streaming
+
+
+def test_minute_rows_are_scaled_then_rounded(daq):
+    pipeline = daq.startPipeline({'Pressure': ['AIN3'], 'Mag': ['AIN2']})
+    scans = 2*60*3
+    stamps = np.arange(scans, dtype=np.int64)*period + 10**9*30
+    # 504.207 and 504.307 mG, and pressures around 0.001 Torr
+    voltages = np.column_stack([0.005 + 0.0001*(np.arange(scans) % 2), 0.504207 + 0.0001*(np.arange(scans) % 2)])
+    pipeline.block(stamps, voltages)
+
+    rows = pipeline.filelist['Mag']
+    assert rows['AIN2 max'][0] == 504.307
+    assert rows['AIN2 min'][0] == 504.207
+    assert abs(rows['AIN2 std'][0] - 0.05) < 0.001
+    assert 0 < pipeline.filelist['Pressure']['AIN3 std'][0] < 0.001
+
+
+def test_zscore_option_adds_detectors_to_every_type(daq):
+    pipeline = daq.startPipeline({'Mag': ['AIN2']})
+    assert pipeline.banks[0].types[0].detectors == []
+
+    daq.zScore = 5
+    pipeline = daq.startPipeline({'Mag': ['AIN2'], 'Pressure': ['AIN3']})
+    names = {group.name: [detector.name for detector in group.detectors] for bank in pipeline.banks for group in bank.types}
+    assert names == {'Mag': ['zscore'], 'Pressure': ['threshold', 'zscore']}
+
+
+def test_new_day_moves_the_detector_times(daq):
+    pipeline = daq.startPipeline({'Pressure': ['AIN3']})
+    bank = pipeline.banks[0]
+    detector = bank.types[0].detectors[0]
+    pipeline.tick(0, 100*10**9, [6000])
+    pipeline.tick(1, 101*10**9, [0.005])
+    assert detector.quietSince[0] == 101
+
+    # what readScan does at midnight: the origin moves to now and the day goes up
+    daq.clock.originNs += 102*10**9
+    daq.clock.wallOriginNs += 102*10**9
+    daq.day += 1
+    pipeline.tick(2, 0, [0.005])
+    assert detector.quietSince[0] == -1
@@ -0,0 +1,106 @@
+import os
+from datetime import datetime
+from dataFiles import FileListTracker, HourlyCsvWriter, CsvRows, hourlyPath
+
+
+class FullWriter():
+
+    # an IOWriter whose queue is full for the first "drops" submits
+    def __init__(self, drops: int = 0):
+        self.drops = drops
+        self.batches = []
+
+    def submit(self, name, batch):
+        if self.drops:
+            self.drops -= 1
+            return False
+        self.batches.append(batch)
+        return True
+
+
+def fileList(rows: int):
+    return {'AIN0': list(range(rows)), 'Time': ['12:%02d' %minute for minute in range(rows)]}
+
+
+def test_tracker_sends_only_new_rows():
+    tracker = FileListTracker()
+    writer = FullWriter()
+    now = datetime(2026, 10, 18, 12, 5)
+
+    assert tracker.submit(writer, 'Temp', fileList(2), now)
+    assert not tracker.submit(writer, 'Temp', fileList(2), now)
+    assert tracker.submit(writer, 'Temp', fileList(3), now)
+
+    assert [batch.rows for batch in writer.batches] == [((0, '12:00'), (1, '12:01')), ((2, '12:02'),)]
+    assert [batch.first for batch in writer.batches] == [0, 2]
+
+
+def test_tracker_offers_dropped_rows_again():
+    tracker = FileListTracker()
+    writer = FullWriter(drops=2)
+    now = datetime(2026, 10, 18, 12, 5)
+
+    assert not tracker.submit(writer, 'Temp', fileList(1), now)
+    assert tracker.pending
+    assert not tracker.submit(writer, 'Temp', fileList(2), now)
+    assert tracker.submit(writer, 'Temp', fileList(2), now)
+    assert not tracker.pending
+
+    batch, = writer.batches
+    assert batch.first == 0
+    assert batch.rows == ((0, '12:00'), (1, '12:01'))
+
+
+def test_tracker_starts_over_for_a_new_hour():
+    tracker = FileListTracker()
+    writer = FullWriter()
+
+    tracker.submit(writer, 'Temp', fileList(3), datetime(2026, 10, 18, 12, 59))
+    tracker.submit(writer, 'Temp', fileList(1), datetime(2026, 10, 18, 13, 0))
+
+    assert writer.batches[-1].first == 0
+    assert writer.batches[-1].rows == ((0, '12:00'),)
+
+
+def read(path):
+    with open(path, newline='') as file:
+        return file.read().splitlines()
+
+
+def test_hourly_writer_appends_and_rotates(tmp_path):
+    root = str(tmp_path)
+    writer = HourlyCsvWriter('Temp', root)
+    header = ('AIN0', 'Time')
+    writer.write(CsvRows(datetime(2026, 10, 18, 12, 58), header, ((1, '12:58'),), 0))
+    writer.write(CsvRows(datetime(2026, 10, 18, 12, 59), header, ((2, '12:59'),), 1))
+    # the first row of the next hour goes in a new file
+    writer.write(CsvRows(datetime(2026, 10, 18, 13, 0), header, ((3, '13:00'),), 0))
+    writer.close()
+
+    assert read(hourlyPath('Temp', datetime(2026, 10, 18, 12), root)) == ['AIN0,Time', '1,12:58', '2,12:59']
+    assert read(hourlyPath('Temp', datetime(2026, 10, 18, 13), root)) == ['AIN0,Time', '3,13:00']
+
+
+def test_hourly_writer_carries_on_a_file_after_a_restart(tmp_path):
+    root = str(tmp_path)
+    now = datetime(2026, 10, 18, 12, 10)
+    header = ('AIN0', 'Time')
+    writer = HourlyCsvWriter('Temp', root)
+    writer.write(CsvRows(now, header, ((1, '12:10'),), 0))
+    writer.close()
+
+    writer = HourlyCsvWriter('Temp', root)
+    writer.write(CsvRows(now, header, ((2, '12:11'),), 0))
+    writer.close()
+    assert read(hourlyPath('Temp', now, root)) == ['AIN0,Time', '1,12:10', '2,12:11']
+    assert os.listdir(os.path.dirname(hourlyPath('Temp', now, root))) == ['Temp at 12.csv']
+
+
+def test_hourly_writer_rewrites_the_file_when_the_columns_change(tmp_path):
+    root = str(tmp_path)
+    now = datetime(2026, 10, 18, 12, 10)
+    writer = HourlyCsvWriter('Temp', root)
+    writer.write(CsvRows(now, ('AIN0', 'Time'), ((1, '12:10'),), 0))
+    writer.write(CsvRows(now, ('AIN0', 'AIN4', 'Time'), ((1, 5, '12:10'), (2, 6, '12:11')), 0))
+    writer.close()
+    assert read(hourlyPath('Temp', now, root)) == ['AIN0,AIN4,Time', '1,5,12:10', '2,6,12:11']
@@ -0,0 +1,95 @@
+from datetime import datetime
+import numpy as np
+from ringBuffer import RingBuffer
+from spikeDetection import SpikeEvent
+from eventCapture import EventCapture
+
+
+class Writer():
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, name, item):
+        self.submitted.append((name, item))
+        return True
+
+
+def history(samples):
+    timeData = RingBuffer(100, dtype=np.int64)
+    Data = {'AIN3': RingBuffer(100)}
+    for n in range(samples):
+        timeData.append(n)
+        Data['AIN3'].append(n)
+    return timeData, Data
+
+
+def spike(t, channel='AIN3'):
+    return SpikeEvent('Pressure', channel, 'threshold', t, 1000.0)
+
+
+def run(capture, timeData, Data, first, last):
+    for n in range(first, last):
+        timeData.append(n)
+        Data['AIN3'].append(n)
+        capture.append(n, [n])
+
+
+def test_capture_has_the_pre_and_post_windows():
+    writer = Writer()
+    capture = EventCapture('Pressure', ['AIN3'], 1, writer, pre=5, post=3)
+    timeData, Data = history(20)
+    capture.trigger([spike(19)], timeData, Data, lambda ns: ns, datetime(2024, 3, 4, 10, 30))
+    run(capture, timeData, Data, 20, 30)
+
+    (name, rows), = writer.submitted
+    assert name == 'Spike'
+    assert rows.columns['Time'].tolist() == list(range(15, 23))
+    assert rows.columns['AIN3'].tolist() == list(range(15, 23))
+    assert rows.now == datetime(2024, 3, 4, 10, 30)
+
+
+def test_a_spike_while_collecting_extends_the_event():
+    writer = Writer()
+    capture = EventCapture('Pressure', ['AIN3'], 1, writer, pre=5, post=3, maxPost=6)
+    timeData, Data = history(20)
+    capture.trigger([spike(19)], timeData, Data, lambda ns: ns, None)
+    run(capture, timeData, Data, 20, 22)
+    capture.trigger([spike(21, 'AIN4')], timeData, Data, lambda ns: ns, None)
+    assert not writer.submitted
+
+    # post window now runs 3 samples past the second spike
+    run(capture, timeData, Data, 22, 40)
+    (name, rows), = writer.submitted
+    assert rows.columns['Time'].tolist() == list(range(15, 25))
+    assert capture.captured == 1
+
+
+def test_extension_stops_at_max_post():
+    writer = Writer()
+    capture = EventCapture('Pressure', ['AIN3'], 1, writer, pre=2, post=3, maxPost=4)
+    timeData, Data = history(10)
+    capture.trigger([spike(9)], timeData, Data, lambda ns: ns, None)
+    for n in range(10, 30):
+        timeData.append(n)
+        Data['AIN3'].append(n)
+        capture.append(n, [n])
+        if capture.active is not None:
+            capture.trigger([spike(n)], timeData, Data, lambda ns: ns, None)
+
+    rows = writer.submitted[0][1]
+    assert rows.columns['Time'].tolist() == [8, 9, 10, 11, 12, 13]
+
+
+def test_skip_leaves_later_samples_out_of_the_pre_window():
+    writer = Writer()
+    capture = EventCapture('Pressure', ['AIN3'], 1, writer, pre=4, post=2)
+    timeData, Data = history(20)
+    # the spike was sample 17, samples 18 and 19 of the block are already in the buffers
+    capture.trigger([spike(17)], timeData, Data, lambda ns: ns, None, skip=2)
+    capture.append(18, [18])
+    capture.append(19, [19])
+
+    rows = writer.submitted[0][1]
+    assert rows.columns['Time'].tolist() == [14, 15, 16, 17, 18, 19]
+    assert rows.columns['AIN3'].tolist() == [14, 15, 16, 17, 18, 19]
@@ -0,0 +1,51 @@
+import time
+from threading import Event
+from ioWriter import IOWriter
+
+
+class SlowSink():
+
+    # a sink whose writes wait until "release" is set
+    def __init__(self):
+        self.release = Event()
+        self.closed = False
+
+    def write(self, record):
+        self.release.wait()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_close_sink_does_not_block_on_a_full_queue():
+    writer = IOWriter(maxsize=1)
+    sink = SlowSink()
+    writer.addSink('slow', sink)
+    writer.start()
+
+    writer.submit('slow', 1)
+    while writer.queue.qsize():
+        time.sleep(0.001)
+    assert writer.submit('slow', 2)
+
+    start = time.perf_counter()
+    assert not writer.closeSink('slow', timeout=0.05)
+    assert time.perf_counter() - start < 0.5
+    assert writer.stats()['errors'] == 1
+
+    sink.release.set()
+    assert writer.closeSink('slow')
+    writer.close(timeout=1)
+    assert sink.closed
+    assert 'slow' not in writer.sinks
+
+
+def test_close_sink_without_the_thread_closes_straight_away():
+    writer = IOWriter()
+    sink = SlowSink()
+    writer.addSink('slow', sink)
+    assert writer.closeSink('slow')
+    assert sink.closed
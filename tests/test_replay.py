@@ -0,0 +1,59 @@
+import os
+from datetime import date
+import numpy as np
+from dataFiles import dayFormat
+from replay import ArchiveIndex, Replay, epochNs, parseTimes
+
+day = date(2024, 3, 4)
+
+
+def write(path, header, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', newline='') as file:
+        file.write('\r\n'.join([','.join(header)] + [','.join(row) for row in rows]) + '\r\n')
+
+
+def archive(root):
+    folder = os.path.join(str(root), 'Pressure Data', day.strftime(dayFormat))
+    minutes = [('%.1f' %1.0, '%.6f' %0.1, '10:%02d' %minute) for minute in range(60)]
+    write(os.path.join(folder, 'Pressure at 10.csv'), ['AIN3', 'AIN3 std', 'Time'], minutes)
+
+    # two samples a second from 10:29:00 to 10:31:59
+    samples = [('500.0', '%02d:%02d:%02d' %(10, 29 + second//60, second % 60)) for second in range(180) for half in range(2)]
+    write(os.path.join(str(root), 'Pressure Data', 'Spike Data', day.strftime(dayFormat), ' Pressure Data at 10;30 .csv'), ['AIN3', 'Time'], samples)
+
+
+def test_minute_rows_are_left_out_where_a_spike_file_has_samples(tmp_path):
+    archive(tmp_path)
+    index = ArchiveIndex(str(tmp_path), day, day)
+    times, columns = index.rows('Pressure', epochNs(day, 9), epochNs(day, 11))
+
+    assert np.all(np.diff(times) > 0)
+    spike = (times >= epochNs(day, 10, 29)) & (times < epochNs(day, 10, 32))
+    assert np.all(columns['AIN3'][spike] == 500)
+    assert np.all(columns['AIN3'][~spike] == 1)
+    assert spike.sum() == 360 and (~spike).sum() == 57
+
+
+def test_replay_line_goes_forwards_around_a_spike(tmp_path):
+    archive(tmp_path)
+    replay = Replay(ArchiveIndex(str(tmp_path), day, day))
+    assert replay.seek(epochNs(day, 11)) == ['Pressure']
+    assert np.all(np.diff(replay.timeData['Pressure'].view()) > 0)
+
+
+def test_parse_times_of_an_hourly_file():
+    times = parseTimes(day, ['23:58', '23:59', '00:00'])
+    assert times.tolist() == [epochNs(day, 23, 58), epochNs(day, 23, 59), epochNs(date(2024, 3, 5))]
+
+
+def test_samples_sharing_a_second_are_spread_over_it():
+    times = parseTimes(day, ['10:00:00', '10:00:00', '10:00:00', '10:00:00', '10:00:01', '10:00:02', '10:00:02'], spread=True)
+    start = epochNs(day, 10)
+    assert (times - start).tolist() == [0, 250000000, 500000000, 750000000, 10**9, 2*10**9, 2*10**9 + 500000000]
+
+
+def test_spread_times_go_forwards_over_midnight():
+    times = parseTimes(day, ['23:59:59', '23:59:59', '00:00:00', '00:00:00'], spread=True)
+    assert np.all(np.diff(times) > 0)
+    assert times[2] == epochNs(date(2024, 3, 5))
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from ringBuffer import RingBuffer, RingBlock, alignedViews, samplesIn
+
+
+def test_append_keeps_the_newest_samples():
+    buffer = RingBuffer(4)
+    for value in range(6):
+        buffer.append(value)
+    assert buffer.view().tolist() == [2, 3, 4, 5]
+    assert (len(buffer), buffer.total, buffer[-1]) == (4, 6, 5)
+
+
+def test_extend_wraps_around_the_end():
+    buffer = RingBuffer(5)
+    buffer.extend([0, 1, 2])
+    buffer.extend([3, 4, 5, 6])
+    assert buffer.view().tolist() == [2, 3, 4, 5, 6]
+    assert buffer.end == 2
+    assert buffer.tail(3).tolist() == [4, 5, 6]
+
+    # the same as appending one at a time
+    other = RingBuffer(5)
+    for value in range(7):
+        other.append(value)
+    assert other.view().tolist() == buffer.view().tolist()
+
+
+def test_extend_longer_than_the_buffer():
+    buffer = RingBuffer(4)
+    buffer.append(-1)
+    buffer.extend(np.arange(10))
+    assert buffer.view().tolist() == [6, 7, 8, 9]
+    assert buffer.total == 11
+
+
+def test_clear_starts_a_new_generation():
+    buffer = RingBuffer(3)
+    buffer.extend([1, 2])
+    buffer.clear()
+    assert (len(buffer), buffer.total, buffer.generation) == (0, 0, 1)
+    buffer.append(7)
+    assert buffer.view().tolist() == [7]
+
+
+def test_samples_in():
+    assert samplesIn(60, 1/3) == 180
+    assert samplesIn(0.1, 1) == 1
+
+
+def test_aligned_views_leave_off_a_half_written_sample():
+    times = RingBuffer(4, dtype=np.int64)
+    values = RingBuffer(4)
+    for n in range(6):
+        times.append(n*10)
+        values.append(n)
+    # read between the two appends of a tick
+    times.append(60)
+
+    x, y = alignedViews(times, values)
+    assert x.tolist() == [30, 40, 50]
+    assert y.tolist() == [3, 4, 5]
+
+
+def test_aligned_views_of_empty_buffers():
+    x, y = alignedViews(RingBuffer(3, dtype=np.int64), RingBuffer(3))
+    assert len(x) == len(y) == 0
+
+
+def test_block_extend_wraps_around_like_a_ring_buffer():
+    block = RingBlock(2, 5)
+    scans = np.column_stack([np.arange(8), 100 + np.arange(8)])
+    block.extend(scans[:3])
+    block.append(scans[3])
+    block.extend(scans[4:])
+
+    assert block.tail(5).tolist() == [[3, 4, 5, 6, 7], [103, 104, 105, 106, 107]]
+    assert (block.count, block.total, block.end) == (5, 8, 3)
+
+    buffer = RingBuffer(5)
+    buffer.extend(scans[:, 1])
+    channel = block.channel(1)
+    assert channel.view().tolist() == buffer.view().tolist()
+    assert (channel.total, channel[-1]) == (8, 107)
+
+
+def test_block_channels_are_read_only():
+    block = RingBlock(1, 3)
+    block.extend(np.arange(10).reshape(-1, 1))
+    assert block.tail(3).tolist() == [[7, 8, 9]]
+    with pytest.raises(TypeError):
+        block.channel(0).append(1)
+    with pytest.raises(TypeError):
+        block.channel(0).clear()
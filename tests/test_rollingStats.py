@@ -0,0 +1,72 @@
+import numpy as np
+from rollingStats import RollingStats, TumblingStats, blockSummary
+
+
+def test_block_summary_of_every_row():
+    block = np.array([[1.0, 2.0, 3.0, 4.0], [10.0, 10.0, 10.0, 10.0]])
+    mean, low, high, std = blockSummary(block)
+    assert mean.tolist() == [2.5, 10]
+    assert low.tolist() == [1, 10]
+    assert high.tolist() == [4, 10]
+    assert np.allclose(std, [np.std([1, 2, 3, 4], ddof=1), 0])
+
+
+def test_block_summary_leaves_out_skipped_samples():
+    block = np.array([[1.0, np.nan, 3.0], [np.nan, np.nan, np.nan], [np.nan, 5.0, np.nan]])
+    mean, low, high, std = blockSummary(block)
+    assert mean[0] == 2 and low[0] == 1 and high[0] == 3
+    assert np.all(np.isnan([mean[1], low[1], high[1], std[1]]))
+    assert (mean[2], low[2], high[2], std[2]) == (5, 5, 5, 0)
+
+
+def test_block_summary_of_no_samples():
+    mean, low, high, std = blockSummary(np.zeros((2, 0)))
+    assert np.all(np.isnan(mean)) and np.all(np.isnan(std))
+
+
+def test_rolling_stats_follow_the_window():
+    rng = np.random.default_rng(2)
+    values = 20 + rng.normal(size=500)
+    stats = RollingStats(50)
+    for n, value in enumerate(values):
+        stats.append(value)
+        window = values[max(0, n - 49):n + 1]
+        assert stats.count == len(window)
+        assert np.isclose(stats.mean, window.mean())
+        assert stats.min == window.min() and stats.max == window.max()
+        if len(window) > 1:
+            assert np.isclose(stats.variance, window.var(ddof=1))
+    assert stats.view().tolist() == values[-50:].tolist()
+
+
+def test_rolling_stats_min_and_max_slide_out():
+    stats = RollingStats(3)
+    stats.extend([5, 1, 9, 2, 3, 4])
+    assert (stats.min, stats.max) == (2, 4)
+    stats.clear()
+    assert len(stats) == 0 and np.isnan(stats.min)
+
+
+def test_tumbling_stats_append_and_extend_agree():
+    rng = np.random.default_rng(3)
+    values = rng.normal(size=300)
+    one = TumblingStats()
+    for value in values:
+        one.append(value)
+    blocks = TumblingStats()
+    for start in range(0, 300, 70):
+        blocks.extend(values[start:start + 70])
+
+    assert one.count == blocks.count == 300
+    assert np.allclose(one.summary(), blocks.summary())
+    assert np.allclose(one.summary(), (values.mean(), values.min(), values.max(), values.std(ddof=1)))
+
+
+def test_tumbling_stats_reset_and_skipped_samples():
+    stats = TumblingStats()
+    assert np.all(np.isnan(stats.summary()))
+    stats.extend([1.0, np.nan, 3.0])
+    stats.append(np.nan)
+    assert stats.summary() == (2, 1, 3, np.sqrt(2))
+    stats.reset()
+    assert len(stats) == 0
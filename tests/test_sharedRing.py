@@ -0,0 +1,83 @@
+import os
+import numpy as np
+from ringBuffer import RingBuffer, RingBlock
+from sharedRing import SharedPublisher, SharedRingReader, ringName
+
+
+class Clock():
+
+    def epochNs(self, ns):
+        return ns + 10**18
+
+
+class Session():
+
+    # stands in for a daqDaemon Session with one pressure input
+    def __init__(self):
+        self.AIN = {'Pressure': ['AIN3']}
+        self.periods = {'Pressure': 0.01}
+        self.historyLength = 1
+        self.test = type('DAQ', (), {'clock': Clock()})()
+        self.listeners = []
+        self.timeData = RingBuffer(100, dtype=np.int64)
+        self.values = RingBlock(1, 100)
+        self.Data = {'AIN3': self.values.channel(0)}
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    def add(self, stamps):
+        self.timeData.extend(stamps)
+        self.values.extend(np.asarray(stamps, dtype=np.float64)[:, None])
+        for listener in self.listeners:
+            listener('Pressure', self.AIN['Pressure'], self.timeData, self.Data)
+
+
+def test_publisher_copies_every_new_row():
+    session = Session()
+    prefix = 'test_%s' %os.getpid()
+    publisher = SharedPublisher(session, prefix)
+    reader = SharedRingReader(ringName(prefix, 'Pressure'))
+    try:
+        session.add([1])
+        session.add(np.arange(2, 42))
+        session.add([42])
+        assert reader.refresh() == 42
+        assert reader.epochNs(reader.timeData.view()).tolist() == [10**18 + n for n in range(1, 43)]
+        assert reader.Data['AIN3'].view().tolist() == list(range(1, 43))
+
+        # more rows than the session keeps, only the newest are still in its buffers to publish
+        session.add(np.arange(43, 543))
+        assert reader.refresh() == 100
+        assert reader.Data['AIN3'].view()[-100:].tolist() == list(range(443, 543))
+
+        # the session started over
+        session.timeData.clear()
+        session.values.clear()
+        session.add([7, 8])
+        reader.refresh()
+        assert reader.Data['AIN3'].view().tolist() == [7, 8]
+    finally:
+        reader.close()
+        publisher.close()
+
+
+def test_retry_reports_the_rows_again():
+    session = Session()
+    prefix = 'retry_%s' %os.getpid()
+    publisher = SharedPublisher(session, prefix)
+    reader = SharedRingReader(ringName(prefix, 'Pressure'))
+    try:
+        session.add([1, 2, 3])
+        assert reader.refresh() == 3
+        assert reader.refresh() == 0
+        reader.retry()
+        assert reader.refresh() == 1
+        assert reader.refresh() == 0
+        assert reader.lost == 0
+    finally:
+        reader.close()
+        publisher.close()
@@ -0,0 +1,97 @@
+import numpy as np
+from spikeDetection import ThresholdBank, RateBank, ZScoreBank
+
+
+def test_zscore_fires_on_an_outlier_of_a_large_value():
+    rng = np.random.default_rng(1)
+    bank = ZScoreBank(2, z=6, window=100, hysteresis=1)
+    # 1e6 with a deviation of 1e-3, the sum of squares has to keep the deviation
+    values = 1e6 + 1e-3*rng.normal(size=(500, 2))
+    values[300, 1] += 0.02
+
+    fired = [np.flatnonzero(bank.update(t, row)).tolist() for t, row in enumerate(values)]
+    assert [(t, rows) for t, rows in enumerate(fired) if rows] == [(300, [1])]
+
+
+def test_zscore_waits_for_enough_samples_and_skips_missing_ones():
+    bank = ZScoreBank(1, z=3, window=20, minSamples=10)
+    for t in range(9):
+        assert not bank.update(t, [float(t % 2)]).any()
+    assert not bank.update(9, [np.nan]).any()
+    assert not bank.update(10, [100.0]).any()
+    for t in range(11, 40):
+        bank.update(t, [float(t % 2)])
+    assert bank.update(40, [100.0]).all()
+
+
+def test_zscore_window_slides():
+    bank = ZScoreBank(1, z=4, window=10, minSamples=5)
+    for t in range(30):
+        bank.update(t, [float(t % 2)])
+    # the window of the last 10 samples moved up by 1000, so that level is normal
+    for t in range(30, 45):
+        bank.update(t, [1000.0 + t % 2])
+    assert bank.measure(45, [1000.5])[0] < 0
+    assert bank.update(46, [0.5]).all()
+
+
+def test_threshold_fires_once_per_excursion():
+    bank = ThresholdBank(1, high=1000, hysteresis=50)
+    levels = [10, 1200, 1300, 980, 1100, 940, 1050]
+    fired = [bool(bank.update(t, [value])[0]) for t, value in enumerate(levels)]
+    # 980 is back under 1000 but not by the 50 of hysteresis, 940 is
+    assert fired == [False, True, False, False, False, False, True]
+
+
+def test_threshold_low_side_and_channels_on_their_own():
+    bank = ThresholdBank(2, high=[10, np.nan], low=[np.nan, -10])
+    assert bank.update(0, [11, -11]).tolist() == [True, True]
+    assert bank.update(1, [0, -20]).tolist() == [False, False]
+    assert bank.update(2, [20, 0]).tolist() == [True, False]
+    assert bank.update(3, [np.nan, -11]).tolist() == [False, True]
+
+
+def test_rearm_waits_for_the_value_to_stay_quiet():
+    bank = ThresholdBank(1, high=1, rearm=2)
+    assert bank.update(0, [2]).all()
+    # quiet for 1 second, then over again: not re-armed yet, and the wait starts over
+    assert not bank.update(1, [0]).any()
+    assert not bank.update(2, [2]).any()
+    assert not bank.update(3, [0]).any()
+    assert not bank.update(4, [0]).any()
+    assert not bank.allArmed
+    assert not bank.update(5, [0]).any()
+    assert bank.allArmed
+    assert bank.update(6, [2]).all()
+
+
+def test_reset_arms_every_channel():
+    bank = ThresholdBank(2, high=1)
+    bank.update(0, [2, 2])
+    bank.reset()
+    assert bank.update(1, [2, 0]).tolist() == [True, False]
+
+
+def test_rate_fires_on_the_smoothed_slope():
+    bank = RateBank(1, rate=0.5, smoothing=3)
+    values = [0, 0, 0, 0, 0, 3, 3, 3, 3, 3, 3]
+    fired = [bool(bank.update(t, [value])[0]) for t, value in enumerate(values)]
+    # the 3 sample mean goes 0, 1, 2, 3 and then stays, a slope of 1 a second for three samples
+    assert fired == [False]*5 + [True] + [False]*5
+
+
+def test_shift_keeps_the_rearm_wait_over_midnight():
+    bank = ThresholdBank(1, high=1, rearm=5)
+    assert bank.update(86390, [2]).all()
+    assert not bank.update(86398, [0]).any()
+    # the clock's origin moves to midnight, the next sample is 3 seconds into the new day
+    bank.shift(86400)
+    assert not bank.update(3, [0]).any()
+    assert bank.allArmed
+
+
+def test_shift_keeps_the_rate_slope():
+    bank = RateBank(1, rate=0.5, smoothing=1)
+    bank.update(86399, [0])
+    bank.shift(86400)
+    assert bank.update(0, [2]).all()
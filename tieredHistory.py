@@ -0,0 +1,165 @@
+"""
+Longer history at lower resolution, so a whole day or week can be graphed straight away from a fixed amount of memory.
+
+the Data ring buffers only hold the last 15 minutes of samples. next to them every sensor gets a TieredHistory, which
+rolls its samples up into buckets of 1 second, 1 minute and 1 hour, each with the mean, min and max of the samples in
+it. the finer a tier, the less time it covers:
+
+    1 second buckets    6 hours
+    1 minute buckets    8 days
+    1 hour buckets      1 year
+
+each tier is a set of ring buffers, so memory never grows, and a bucket is only added when it is complete: samples
+go into the 1 second bucket being filled, a finished second goes into the minute being filled, and so on. adding a
+sample costs a few additions no matter how long the tiers are.
+
+the times are nanoseconds since the epoch (the start of each bucket), so the history carries on over midnight when the
+15 minute buffers are cleared.
+"""
+
+from math import isnan, inf, nan
+import numpy as np
+from ringBuffer import RingBuffer
+
+
+class Rollup():
+
+    """
+    One tier: buckets "width" seconds wide, the newest "horizon" seconds of them are kept
+    """
+
+    def __init__(self, width: float, horizon: float):
+        self.width = width
+        self.widthNs = int(round(width*1e9))
+        self.horizon = horizon
+        capacity = max(1, int(round(horizon/width)))
+
+        self.time = RingBuffer(capacity, np.int64)
+        self.mean = RingBuffer(capacity)
+        self.low = RingBuffer(capacity)
+        self.high = RingBuffer(capacity)
+
+        # the bucket being filled
+        self.bucket = None
+        self.sum = 0.0
+        self.count = 0
+        self.min = inf
+        self.max = -inf
+
+    def add(self, stamp: int, total: float, count: int, low: float, high: float):
+        """
+        adds "count" samples adding up to "total" with lowest value "low" and highest "high", all taken at "stamp"
+        (nanoseconds since the epoch). returns the bucket that was completed, as the same five values, or None
+        """
+        bucket = stamp//self.widthNs
+        finished = None
+        if bucket != self.bucket:
+            finished = self.close()
+            self.bucket = bucket
+
+        self.sum += total
+        self.count += count
+        if low < self.min:
+            self.min = low
+        if high > self.max:
+            self.max = high
+        return finished
+
+    def close(self):
+        """
+        stores the bucket being filled and starts an empty one. returns it as (stamp, total, count, low, high)
+        """
+        if self.bucket is None:
+            return None
+
+        stamp = self.bucket*self.widthNs
+        finished = (stamp, self.sum, self.count, self.min, self.max)
+
+        self.time.append(stamp)
+        self.mean.append(self.sum/self.count if self.count else nan)
+        self.low.append(self.min if self.count else nan)
+        self.high.append(self.max if self.count else nan)
+
+        self.bucket = None
+        self.sum = 0.0
+        self.count = 0
+        self.min = inf
+        self.max = -inf
+        return finished
+
+    def snapshot(self):
+        """
+        returns copies of the times, means, mins and maxes of the stored buckets, oldest to newest. this can be called
+        from another thread while buckets are being added, the four arrays always line up
+        """
+        buffers = (self.time, self.mean, self.low, self.high)
+        stop = min(buffer.total for buffer in buffers)
+
+        # leaves off a bucket that some of the buffers already have and others don't yet
+        views = [buffer.view()[:len(buffer) - (buffer.total - stop)] for buffer in buffers]
+        n = min(len(view) for view in views)
+        return tuple(np.array(view[len(view) - n:]) for view in views)
+
+
+class TieredHistory():
+
+    """
+    The tiers of one sensor. "tiers" is a list of (width, horizon) in seconds, finest first.
+    """
+
+    tiers = ((1, 60*60*6), (60, 60*60*24*8), (60*60, 60*60*24*366))
+
+    def __init__(self, tiers=None):
+        self.rollups = [Rollup(width, horizon) for width, horizon in (tiers or self.tiers)]
+
+    def append(self, stamp: int, value: float):
+        """
+        adds one sample, "stamp" is nanoseconds since the epoch. nan (a skipped sample) is left out
+        """
+        if isnan(value):
+            return
+        self.merge(0, stamp, value, 1, value, value)
+
+    def extend(self, stamps, values):
+        """
+        adds a block of samples (for example from stream mode). the block is summed up per bucket of the finest tier
+        with numpy first, so only one bucket at a time goes through the tiers
+        """
+        stamps = np.asarray(stamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        keep = ~np.isnan(values)
+        stamps = stamps[keep]
+        values = values[keep]
+        if len(values) == 0:
+            return
+
+        buckets = stamps//self.rollups[0].widthNs
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+        totals = np.add.reduceat(values, starts)
+        counts = np.diff(np.append(starts, len(values)))
+        lows = np.minimum.reduceat(values, starts)
+        highs = np.maximum.reduceat(values, starts)
+
+        for group in zip(stamps[starts].tolist(), totals.tolist(), counts.tolist(), lows.tolist(), highs.tolist()):
+            self.merge(0, *group)
+
+    def merge(self, tier: int, stamp: int, total: float, count: int, low: float, high: float):
+        # each bucket a tier finishes goes into the next tier up
+        while tier < len(self.rollups):
+            finished = self.rollups[tier].add(stamp, total, count, low, high)
+            if finished is None:
+                return
+            stamp, total, count, low, high = finished
+            tier += 1
+
+    def select(self, span: float, columns: int):
+        """
+        picks the tier to graph "span" seconds on a plot "columns" pixels wide: the coarsest one that still has at
+        least one bucket per pixel, out of the ones that cover the whole span. if none cover it the longest is used
+        """
+        covering = [rollup for rollup in self.rollups if rollup.horizon >= span]
+        if not covering:
+            return self.rollups[-1]
+
+        fine = [rollup for rollup in covering if rollup.width <= span/max(1, columns)]
+        return fine[-1] if fine else covering[0]
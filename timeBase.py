@@ -0,0 +1,75 @@
+"""
+One clock for every sensor group.
+
+times are kept as int64 nanoseconds on the time.monotonic_ns() clock, counted from the clock's origin (the start of the
+run, or the last midnight). the monotonic clock never jumps when the computer's clock is adjusted, and since
+temperature, pressure and magnetics all take their time from the same read (see DAQ.readScan) their samples line up
+exactly.
+
+wall clock times are worked out from the origin only when they are needed, for file names and exported rows, instead of
+formatting a string for every sample:
+
+    clock.seconds(ns)          # seconds since the origin, for plotting
+    clock.epochNs(ns)          # nanoseconds since the epoch, for the raw archive and spike files
+    clock.wallTime(ns)         # datetime
+    formatTimes(epochNs)       # strings like '13:45:02', for writing out
+"""
+
+import time
+from datetime import datetime
+import numpy as np
+
+
+def formatTimes(epochNs, format: str = '%H:%M:%S'):
+    """
+    formats nanoseconds since the epoch (a single value or an array) as local wall clock strings
+    """
+    return [datetime.fromtimestamp(ns/1e9).strftime(format) for ns in np.atleast_1d(epochNs).tolist()]
+
+
+class TimeBase():
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        makes now the origin, times after this count up from 0 again
+        """
+        self.originNs = time.monotonic_ns()
+        self.wallOriginNs = time.time_ns()
+        self.day = datetime.fromtimestamp(self.wallOriginNs/1e9).date()
+
+    def now(self):
+        """
+        nanoseconds since the origin
+        """
+        return time.monotonic_ns() - self.originNs
+
+    def rollover(self):
+        """
+        moves the origin to now if the date has changed since the origin was set. returns True if it did, so the
+        histories can be cleared at the start of a new day
+        """
+        if datetime.fromtimestamp(self.epochNs(self.now())/1e9).date() == self.day:
+            return False
+        self.reset()
+        return True
+
+    def seconds(self, ns):
+        """
+        nanoseconds since the origin (a single value or an array) in seconds
+        """
+        return np.asarray(ns)/1e9
+
+    def epochNs(self, ns):
+        """
+        nanoseconds since the origin (a single value or an array) as nanoseconds since the epoch
+        """
+        return self.wallOriginNs + ns
+
+    def wallTime(self, ns: int):
+        """
+        nanoseconds since the origin as a datetime
+        """
+        return datetime.fromtimestamp(self.epochNs(ns)/1e9)